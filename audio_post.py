@@ -0,0 +1,67 @@
+import numpy as np
+
+from audio_utils import aparar_silencio, aplicar_fades, normalizar_loudness, reamostrar_polifasico
+
+
+class PosProcessamento:
+    """Tratamento aplicado uma única vez ao áudio sintetizado, antes de gravá-lo no cache
+
+    Na ordem: remove o silêncio das bordas, converte a taxa de amostragem,
+    normaliza o nível e aplica fades curtos. Cada opção faz parte da chave de
+    cache (`chave()`), então o mesmo texto com outro tratamento é outro áudio.
+    """
+
+    __slots__ = ("aparar", "loudness_db", "sample_rate", "fade_ms")
+
+    def __init__(self, aparar=False, loudness_db=None, sample_rate=None, fade_ms=0):
+        self.aparar = bool(aparar)
+        self.loudness_db = float(loudness_db) if loudness_db is not None else None  # None = sem normalização
+        self.sample_rate = int(sample_rate) if sample_rate else None  # None = taxa do modelo
+        self.fade_ms = float(fade_ms or 0)
+
+    def ativo(self):
+        return self.aparar or self.loudness_db is not None or self.sample_rate is not None or self.fade_ms > 0
+
+    def chave(self):
+        """Forma canônica das opções para a chave de cache ("" quando nada é aplicado)"""
+        if not self.ativo():
+            return ""
+        partes = []
+        if self.aparar:
+            partes.append("aparar")
+        if self.loudness_db is not None:
+            partes.append(f"loudness={self.loudness_db:g}")
+        if self.sample_rate is not None:
+            partes.append(f"sr={self.sample_rate}")
+        if self.fade_ms > 0:
+            partes.append(f"fade={self.fade_ms:g}")
+        return ";".join(partes)
+
+    def aplicar(self, audio, sample_rate):
+        """Retorna (amostras tratadas, taxa de amostragem)"""
+        audio = np.asarray(audio, dtype=np.float32)
+        if self.aparar:
+            audio = aparar_silencio(audio, sample_rate, limiar_db=-45.0, margem_ms=30)
+        if self.sample_rate is not None and self.sample_rate != sample_rate:
+            audio = reamostrar_polifasico(audio, sample_rate, self.sample_rate)
+            sample_rate = self.sample_rate
+        if self.loudness_db is not None:
+            audio = normalizar_loudness(audio, sample_rate, self.loudness_db)
+        if self.fade_ms > 0:
+            audio = aplicar_fades(audio, sample_rate, self.fade_ms)
+        return audio, sample_rate
+
+    def to_dict(self):
+        return {
+            "aparar": self.aparar,
+            "loudness_db": self.loudness_db,
+            "sample_rate": self.sample_rate,
+            "fade_ms": self.fade_ms
+        }
+
+    def __getstate__(self):
+        # Enviado aos processos de inferência junto com o pedido
+        return self.to_dict()
+
+    def __setstate__(self, estado):
+        self.__init__(**estado)
@@ -0,0 +1,298 @@
+import os
+import struct
+import threading
+
+import numpy as np
+import soundfile as sf
+
+
+def ler_wav(file_path):
+    """Lê um arquivo de áudio e retorna (amostras float32 mono, taxa de amostragem)"""
+    audio, sample_rate = sf.read(file_path, dtype='float32', always_2d=True)
+    return audio.mean(axis=1), sample_rate
+
+
+def caminho_temporario(file_path):
+    """Arquivo temporário exclusivo do processo/thread, renomeado para `file_path` ao final da escrita"""
+    return f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def duracao_audio(file_path):
+    """Duração do arquivo de áudio em segundos (lida apenas do cabeçalho)"""
+    return sf.info(file_path).duration
+
+
+def salvar_wav(file_path, audio, sample_rate):
+    """Salva amostras float32 como WAV PCM 16 bits (escrita atômica)"""
+    tmp_path = caminho_temporario(file_path)
+    sf.write(tmp_path, np.clip(audio, -1.0, 1.0), sample_rate, format='WAV', subtype='PCM_16')
+    os.replace(tmp_path, file_path)
+
+
+def silencio(duracao_ms, sample_rate):
+    """Retorna um trecho de silêncio com a duração informada"""
+    return np.zeros(int(sample_rate * duracao_ms / 1000), dtype=np.float32)
+
+
+def aparar_silencio(audio, sample_rate, limiar_db=-40.0, margem_ms=20):
+    """Remove o silêncio no início e no fim do áudio"""
+    if audio.size == 0:
+        return audio
+    limiar = 10 ** (limiar_db / 20) * np.max(np.abs(audio))
+    acima = np.flatnonzero(np.abs(audio) > limiar)
+    if acima.size == 0:
+        return audio[:0]
+    margem = int(sample_rate * margem_ms / 1000)
+    inicio = max(0, acima[0] - margem)
+    fim = min(audio.size, acima[-1] + margem + 1)
+    return audio[inicio:fim]
+
+
+def normalizar_rms(audio, alvo_db=-20.0):
+    """Ajusta o volume para que o RMS do áudio fique no nível alvo (dBFS)"""
+    if audio.size == 0:
+        return audio
+    rms = np.sqrt(np.mean(np.square(audio, dtype=np.float64)))
+    if rms < 1e-6:
+        return audio
+    ganho = 10 ** (alvo_db / 20) / rms
+    return (audio * ganho).astype(np.float32)
+
+
+def concatenar(segmentos, sample_rate, crossfade_ms=20):
+    """Concatena segmentos de áudio aplicando crossfade de potência constante entre eles"""
+    segmentos = [s for s in segmentos if s.size > 0]
+    if not segmentos:
+        return np.zeros(0, dtype=np.float32)
+
+    crossfade = int(sample_rate * crossfade_ms / 1000)
+    resultado = segmentos[0].astype(np.float32)
+    for segmento in segmentos[1:]:
+        n = min(crossfade, resultado.size, segmento.size)
+        if n == 0:
+            resultado = np.concatenate([resultado, segmento])
+            continue
+        t = np.linspace(0.0, np.pi / 2, n, dtype=np.float32)
+        mistura = resultado[-n:] * np.cos(t) + segmento[:n] * np.sin(t)
+        resultado = np.concatenate([resultado[:-n], mistura, segmento[n:]])
+    return resultado
+
+
+def reamostrar(audio, sample_rate_origem, sample_rate_destino):
+    """Converte o áudio para outra taxa de amostragem (interpolação linear)"""
+    if sample_rate_origem == sample_rate_destino or audio.size == 0:
+        return audio
+    n_destino = int(round(audio.size * sample_rate_destino / sample_rate_origem))
+    x_origem = np.arange(audio.size, dtype=np.float64) / sample_rate_origem
+    x_destino = np.arange(n_destino, dtype=np.float64) / sample_rate_destino
+    return np.interp(x_destino, x_origem, audio).astype(np.float32)
+
+
+def reamostrar_polifasico(audio, sample_rate_origem, sample_rate_destino):
+    """Converte o áudio para outra taxa com filtro polifásico (scipy), sem o aliasing da interpolação linear"""
+    if sample_rate_origem == sample_rate_destino or audio.size == 0:
+        return audio
+    try:
+        from scipy.signal import resample_poly
+    except ImportError:
+        return reamostrar(audio, sample_rate_origem, sample_rate_destino)
+    divisor = np.gcd(int(sample_rate_origem), int(sample_rate_destino))
+    return resample_poly(audio, sample_rate_destino // divisor, sample_rate_origem // divisor).astype(np.float32)
+
+
+def medir_loudness(audio, sample_rate, bloco_ms=400):
+    """Nível do áudio em dBFS, com as comportas do BS.1770 (sem a ponderação K)
+
+    A energia é medida em blocos; blocos abaixo de -70 dBFS e mais de 10 dB
+    abaixo da média são ignorados, então pausas e silêncio não puxam o nível
+    para baixo.
+    """
+    bloco = max(1, int(sample_rate * bloco_ms / 1000))
+    n_blocos = audio.size // bloco
+    if n_blocos == 0:
+        energias = np.mean(np.square(audio, dtype=np.float64), keepdims=True)
+    else:
+        energias = np.square(audio[:n_blocos * bloco], dtype=np.float64).reshape(n_blocos, bloco).mean(axis=1)
+    energias = energias[energias > 10 ** (-70 / 10)]
+    if energias.size == 0:
+        return None
+    energias = energias[energias > energias.mean() * 10 ** (-10 / 10)]
+    return 10 * np.log10(energias.mean())
+
+
+def normalizar_loudness(audio, sample_rate, alvo_db=-20.0, pico_db=-1.0):
+    """Ajusta o ganho para o nível alvo, sem deixar o pico passar de `pico_db`"""
+    if audio.size == 0:
+        return audio
+    nivel = medir_loudness(audio, sample_rate)
+    if nivel is None:
+        return audio
+    ganho = 10 ** ((alvo_db - nivel) / 20)
+    pico = np.max(np.abs(audio))
+    if pico * ganho > 10 ** (pico_db / 20):
+        ganho = 10 ** (pico_db / 20) / pico
+    return (audio * ganho).astype(np.float32)
+
+
+def aplicar_fades(audio, sample_rate, fade_ms=10):
+    """Aplica fade-in e fade-out curtos (meio cosseno) para evitar cliques nas bordas"""
+    n = min(int(sample_rate * fade_ms / 1000), audio.size // 2)
+    if n <= 0:
+        return audio
+    rampa = (0.5 - 0.5 * np.cos(np.linspace(0.0, np.pi, n, dtype=np.float32)))
+    audio = audio.astype(np.float32, copy=True)
+    audio[:n] *= rampa
+    audio[-n:] *= rampa[::-1]
+    return audio
+
+
+def gerar_chime(sample_rate, volume=0.3):
+    """Gera um aviso sonoro de duas notas ("ding-dong") para anteceder as chamadas"""
+    partes = []
+    for frequencia in (659.25, 523.25):  # Mi5 e Dó5
+        t = np.arange(int(sample_rate * 0.45), dtype=np.float32) / sample_rate
+        envelope = np.exp(-t * 6.0)
+        nota = np.sin(2 * np.pi * frequencia * t) + 0.3 * np.sin(4 * np.pi * frequencia * t)
+        partes.append((volume * envelope * nota / 1.3).astype(np.float32))
+    partes.append(silencio(150, sample_rate))
+    return np.concatenate(partes)
+
+
+# Formatos de saída suportados (codificados pelo libsndfile via soundfile)
+FORMATOS = {
+    "wav": {"format": "WAV", "subtype": "PCM_16", "extensao": ".wav", "media_type": "audio/wav"},
+    "ogg": {"format": "OGG", "subtype": "VORBIS", "extensao": ".ogg", "media_type": "audio/ogg",
+            "bitrate_min": 32, "bitrate_max": 256, "bitrate_padrao": 64},
+    "opus": {"format": "OGG", "subtype": "OPUS", "extensao": ".opus", "media_type": "audio/ogg",
+             "bitrate_min": 6, "bitrate_max": 256, "bitrate_padrao": 32},
+    "mp3": {"format": "MP3", "subtype": "MPEG_LAYER_III", "extensao": ".mp3", "media_type": "audio/mpeg",
+            "bitrate_min": 32, "bitrate_max": 320, "bitrate_padrao": 64},
+}
+
+# Taxas de amostragem aceitas pelo codificador Opus
+SAMPLE_RATES_OPUS = (8000, 12000, 16000, 24000, 48000)
+
+
+# O libsndfile rejeita o nível 1.0 no MP3 ("Error set compression level")
+NIVEL_COMPRESSAO_MAXIMO = 0.99
+
+
+def validar_bitrate(formato, bitrate_kbps):
+    """Lança ValueError se o bitrate estiver fora da faixa do codificador do formato"""
+    if bitrate_kbps is None or formato not in FORMATOS or formato == "wav":
+        return
+    info = FORMATOS[formato]
+    if not info["bitrate_min"] <= bitrate_kbps <= info["bitrate_max"]:
+        raise ValueError(f'bitrate de {formato} deve estar entre {info["bitrate_min"]} e {info["bitrate_max"]} kbps')
+
+
+def limitar_bitrate(formato, bitrate_kbps):
+    """Bitrate efetivo: o pedido dentro da faixa do codificador, ou o padrão do formato"""
+    info = FORMATOS[formato]
+    return min(max(bitrate_kbps or info["bitrate_padrao"], info["bitrate_min"]), info["bitrate_max"])
+
+
+def nivel_compressao(formato, bitrate_kbps):
+    """Converte o bitrate pedido no nível de compressão do libsndfile (0 = maior qualidade)
+
+    O libsndfile não recebe o bitrate diretamente: o nível de compressão é
+    distribuído linearmente na faixa de bitrates do codificador, então o
+    bitrate final é aproximado.
+    """
+    info = FORMATOS[formato]
+    bitrate = limitar_bitrate(formato, bitrate_kbps)
+    nivel = (info["bitrate_max"] - bitrate) / (info["bitrate_max"] - info["bitrate_min"])
+    return min(nivel, NIVEL_COMPRESSAO_MAXIMO)
+
+
+def salvar_audio(file_path, audio, sample_rate, formato="wav", bitrate_kbps=None):
+    """Salva o áudio em um dos FORMATOS com escrita atômica"""
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de áudio não suportado: {formato}")
+    if formato == "wav":
+        salvar_wav(file_path, audio, sample_rate)
+        return
+
+    info = FORMATOS[formato]
+    if formato == "opus" and sample_rate not in SAMPLE_RATES_OPUS:
+        audio = reamostrar(audio, sample_rate, 48000)
+        sample_rate = 48000
+
+    tmp_path = caminho_temporario(file_path)
+    try:
+        sf.write(
+            tmp_path,
+            np.clip(audio, -1.0, 1.0),
+            sample_rate,
+            format=info["format"],
+            subtype=info["subtype"],
+            compression_level=nivel_compressao(formato, bitrate_kbps)
+        )
+        os.replace(tmp_path, file_path)
+    finally:
+        # Em caso de erro do codificador, não deixar o temporário no cache
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def caminho_variante(wav_path, formato, bitrate_kbps=None):
+    """Caminho da versão codificada de um WAV, ao lado dele (ex: <chave>.64k.mp3)"""
+    if formato == "wav":
+        return wav_path
+    info = FORMATOS[formato]
+    # Bitrate já limitado: no máximo uma variante por bitrate válido
+    bitrate = limitar_bitrate(formato, bitrate_kbps)
+    return f"{os.path.splitext(wav_path)[0]}.{bitrate}k{info['extensao']}"
+
+
+def transcodificar(wav_path, formato, bitrate_kbps=None):
+    """Retorna a versão codificada do WAV, gerando-a apenas na primeira vez"""
+    output_path = caminho_variante(wav_path, formato, bitrate_kbps)
+    if output_path != wav_path and (
+            not os.path.exists(output_path) or os.path.getmtime(output_path) < os.path.getmtime(wav_path)):
+        audio, sample_rate = ler_wav(wav_path)
+        salvar_audio(output_path, audio, sample_rate, formato, limitar_bitrate(formato, bitrate_kbps))
+    return output_path
+
+
+def juntar_arquivos(componentes, output_path, prefixo=None, pausa_ms=300):
+    """Junta vários arquivos de áudio em um só, com uma pausa curta entre eles
+
+    `prefixo` é um arquivo opcional (ex: chime) tocado antes dos componentes.
+    """
+    partes = []
+    sample_rate = None
+    for path in componentes:
+        audio, sr = ler_wav(path)
+        if sample_rate is None:
+            sample_rate = sr
+        if partes:
+            partes.append(silencio(pausa_ms, sample_rate))
+        partes.append(reamostrar(audio, sr, sample_rate))
+
+    if sample_rate is None:
+        raise ValueError("Nenhum componente para juntar")
+
+    if prefixo:
+        audio, sr = ler_wav(prefixo)
+        partes.insert(0, reamostrar(audio, sr, sample_rate))
+
+    salvar_wav(output_path, np.concatenate(partes), sample_rate)
+    return output_path
+
+
+def pcm16(audio):
+    """Converte amostras float32 em bytes PCM 16 bits little-endian"""
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype('<i2').tobytes()
+
+
+def cabecalho_wav_stream(sample_rate, canais=1):
+    """Cabeçalho WAV para streaming, com tamanho de dados desconhecido (máximo)"""
+    bytes_por_amostra = 2
+    return b"".join([
+        b"RIFF", struct.pack("<I", 0xFFFFFFFF), b"WAVE",
+        b"fmt ", struct.pack("<IHHIIHH", 16, 1, canais, sample_rate,
+                             sample_rate * canais * bytes_por_amostra,
+                             canais * bytes_por_amostra, 16),
+        b"data", struct.pack("<I", 0xFFFFFFFF)
+    ])
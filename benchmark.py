@@ -0,0 +1,312 @@
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import requests
+
+CENARIOS = ("frio", "quente", "guiche", "estatico")
+
+# Métricas comparadas com --comparar: (caminho no resultado, maior é melhor)
+METRICAS_COMPARADAS = {
+    "p50_ms": (("latencia_ms", "p50"), False),
+    "p95_ms": (("latencia_ms", "p95"), False),
+    "vazao_rps": (("vazao_rps",), True),
+}
+
+_sessoes = threading.local()
+
+
+def _sessao():
+    # Uma sessão por thread, reaproveitando as conexões (keep-alive)
+    if not hasattr(_sessoes, "sessao"):
+        _sessoes.sessao = requests.Session()
+    return _sessoes.sessao
+
+
+def percentil(valores, p):
+    """Percentil `p` (0-100) com interpolação linear entre os valores ordenados"""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    posicao = (len(ordenados) - 1) * p / 100
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicao - inferior)
+
+
+def resumir(latencias, erros, duracao_s):
+    """Resumo de uma rodada: vazão, erros e percentis de latência em ms"""
+    ms = [latencia * 1000 for latencia in latencias]
+    return {
+        "requisicoes": len(latencias) + erros,
+        "erros": erros,
+        "duracao_s": round(duracao_s, 3),
+        "vazao_rps": round(len(latencias) / duracao_s, 2) if duracao_s else None,
+        "latencia_ms": {
+            "media": round(sum(ms) / len(ms), 2) if ms else None,
+            "min": round(min(ms), 2) if ms else None,
+            "p50": round(percentil(ms, 50), 2) if ms else None,
+            "p90": round(percentil(ms, 90), 2) if ms else None,
+            "p95": round(percentil(ms, 95), 2) if ms else None,
+            "p99": round(percentil(ms, 99), 2) if ms else None,
+            "max": round(max(ms), 2) if ms else None
+        }
+    }
+
+
+def rodar(requisicao, total, concorrencia):
+    """Executa `requisicao(i)` para i em 0..total-1 com a concorrência pedida e mede cada uma"""
+    latencias = []
+    erros = []
+    lock = threading.Lock()
+
+    def medir(i):
+        inicio = time.perf_counter()
+        try:
+            requisicao(i)
+        except Exception as e:
+            with lock:
+                erros.append(str(e))
+            return
+        latencia = time.perf_counter() - inicio
+        with lock:
+            latencias.append(latencia)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        list(executor.map(medir, range(total)))
+    resumo = resumir(latencias, len(erros), time.perf_counter() - inicio)
+    if erros:
+        resumo["exemplo_erro"] = erros[0]
+    return resumo
+
+
+def falar(url, corpo):
+    """POST /falar; lança exceção se a síntese falhar"""
+    resposta = _sessao().post(f"{url}/falar", json=corpo, timeout=600)
+    resposta.raise_for_status()
+    dados = resposta.json()
+    if dados.get("status") != "ok":
+        raise RuntimeError(dados.get("mensagem", "erro na síntese"))
+    return dados
+
+
+def buscar(url):
+    """GET de um arquivo de áudio, lendo o corpo inteiro"""
+    resposta = _sessao().get(url, timeout=60)
+    resposta.raise_for_status()
+    return resposta.content
+
+
+def cenario_frio(url, rodada, total, concorrencia):
+    # Textos inéditos: toda requisição passa pelo modelo
+    return rodar(lambda i: falar(url, {"texto": f"Teste de desempenho {rodada}, frase número {i}."}),
+                 total, concorrencia)
+
+
+def cenario_quente(url, rodada, total, concorrencia):
+    # O mesmo texto: depois da primeira síntese, todas são acertos de cache
+    corpo = {"texto": f"Teste de desempenho {rodada} com áudio em cache."}
+    falar(url, corpo)
+    return rodar(lambda i: falar(url, corpo), total, concorrencia)
+
+
+def cenario_guiche(url, rodada, total, concorrencia, senhas=20, guiches=5):
+    # Chamadas combinando senhas e guichês já gerados (reuso dos componentes)
+    def corpo(i):
+        return {"senha": f"Senha {rodada[:4]} {i % senhas}", "guiche": f"Guichê {i % guiches}",
+                "anuncio_unico": True}
+
+    for i in range(max(senhas, guiches)):
+        falar(url, corpo(i))
+    return rodar(lambda i: falar(url, corpo(i)), total, concorrencia)
+
+
+def cenario_estatico(url, rodada, total, concorrencia):
+    # Download do arquivo de áudio já gerado
+    audio_url = falar(url, {"texto": f"Teste de desempenho {rodada} para download."})["url"]
+    return rodar(lambda i: buscar(audio_url), total, concorrencia)
+
+
+FUNCOES_CENARIOS = {
+    "frio": cenario_frio,
+    "quente": cenario_quente,
+    "guiche": cenario_guiche,
+    "estatico": cenario_estatico,
+}
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def iniciar_servidor(engine, stub_rtf, timeout_s, args_servidor):
+    """Inicia o servidor em um diretório temporário (cache isolado) e aguarda o /readyz"""
+    diretorio = os.path.dirname(os.path.abspath(__file__))
+    pasta = tempfile.mkdtemp(prefix="tts_benchmark_")
+    porta = porta_livre()
+    env = dict(os.environ)
+    env["TTS_ENGINE"] = engine
+    env["TTS_STUB_RTF"] = str(stub_rtf)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [diretorio, env.get("PYTHONPATH")]))
+
+    log = open(os.path.join(pasta, "servidor.log"), "w")
+    processo = subprocess.Popen(
+        [sys.executable, os.path.join(diretorio, "run_server.py"), "--host", "127.0.0.1", "--port", str(porta)]
+        + args_servidor,
+        cwd=pasta, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    url = f"http://127.0.0.1:{porta}"
+
+    limite = time.time() + timeout_s
+    while time.time() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError(f"O servidor encerrou ao iniciar; veja {log.name}")
+        try:
+            if requests.get(f"{url}/readyz", timeout=2).status_code == 200:
+                return processo, url, pasta
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    processo.terminate()
+    raise RuntimeError(f"O servidor não ficou pronto em {timeout_s}s; veja {log.name}")
+
+
+def commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _valor(resultado, caminho):
+    for chave in caminho:
+        if resultado is None:
+            return None
+        resultado = resultado.get(chave)
+    return resultado
+
+
+def comparar(base, atual, tolerancia):
+    """Compara dois relatórios; retorna (linhas da comparação, há regressão)"""
+    linhas = []
+    regressao = False
+    for cenario, niveis in atual["resultados"].items():
+        for concorrencia, resultado in niveis.items():
+            anterior = base.get("resultados", {}).get(cenario, {}).get(concorrencia)
+            if anterior is None:
+                continue
+            for nome, (caminho, maior_melhor) in METRICAS_COMPARADAS.items():
+                antes = _valor(anterior, caminho)
+                depois = _valor(resultado, caminho)
+                if not antes or depois is None:
+                    continue
+                variacao = (depois - antes) / antes
+                piorou = variacao < -tolerancia if maior_melhor else variacao > tolerancia
+                regressao = regressao or piorou
+                linhas.append({"cenario": cenario, "concorrencia": int(concorrencia), "metrica": nome,
+                               "antes": antes, "depois": depois, "variacao_pct": round(variacao * 100, 1),
+                               "regressao": piorou})
+    return linhas, regressao
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de latência e vazão da TTS API")
+    parser.add_argument("--url", type=str, default=None,
+                        help="URL de um servidor já em execução (padrão: inicia um servidor temporário)")
+    parser.add_argument("--engine", type=str, default="stub", choices=["stub", "xtts"],
+                        help="Motor do servidor temporário: stub (sem modelo) ou xtts (modelo real)")
+    parser.add_argument("--stub-rtf", type=float, default=0.05,
+                        help="Fator de tempo real simulado pelo motor stub")
+    parser.add_argument("--cenarios", type=str, default=",".join(CENARIOS),
+                        help=f"Cenários separados por vírgula ({', '.join(CENARIOS)})")
+    parser.add_argument("--concorrencia", type=str, default="1,4,16",
+                        help="Níveis de concorrência separados por vírgula")
+    parser.add_argument("--requisicoes", type=int, default=50,
+                        help="Requisições por cenário e nível de concorrência")
+    parser.add_argument("--timeout-inicio", type=float, default=600,
+                        help="Tempo máximo, em segundos, para o servidor temporário ficar pronto")
+    parser.add_argument("--args-servidor", type=str, default="",
+                        help="Argumentos extras do run_server.py (ex: \"--inference-workers 2\")")
+    parser.add_argument("--saida", type=str, default=None,
+                        help="Arquivo onde gravar o relatório JSON")
+    parser.add_argument("--comparar", type=str, default=None,
+                        help="Relatório JSON anterior; encerra com código 1 se houver regressão")
+    parser.add_argument("--tolerancia", type=float, default=0.10,
+                        help="Variação aceita antes de considerar regressão (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    cenarios = [c.strip() for c in args.cenarios.split(",") if c.strip()]
+    for cenario in cenarios:
+        if cenario not in FUNCOES_CENARIOS:
+            parser.error(f"Cenário inválido: {cenario}")
+    niveis = [int(n) for n in args.concorrencia.split(",") if n.strip()]
+
+    processo = None
+    url = args.url.rstrip("/") if args.url else None
+    if url is None:
+        print(f"Iniciando servidor temporário (engine={args.engine})...", file=sys.stderr)
+        processo, url, pasta = iniciar_servidor(args.engine, args.stub_rtf, args.timeout_inicio,
+                                                args.args_servidor.split())
+        print(f"Servidor pronto em {url} (cache em {pasta})", file=sys.stderr)
+
+    try:
+        modelo = requests.get(f"{url}/readyz", timeout=10).json()
+        resultados = {}
+        for cenario in cenarios:
+            resultados[cenario] = {}
+            for concorrencia in niveis:
+                # Identificador novo a cada rodada para que os textos "frios" nunca estejam em cache
+                rodada = uuid.uuid4().hex[:8]
+                resultado = FUNCOES_CENARIOS[cenario](url, rodada, args.requisicoes, concorrencia)
+                resultados[cenario][str(concorrencia)] = resultado
+                print(f"{cenario:>8} c={concorrencia:<3} p50={resultado['latencia_ms']['p50']}ms "
+                      f"p95={resultado['latencia_ms']['p95']}ms {resultado['vazao_rps']} req/s "
+                      f"erros={resultado['erros']}", file=sys.stderr)
+    finally:
+        if processo is not None:
+            processo.terminate()
+            processo.wait(timeout=30)
+
+    relatorio = {
+        "data": datetime.now(timezone.utc).isoformat(),
+        "commit": commit_atual(),
+        "url": args.url,
+        "engine": args.engine if args.url is None else None,
+        "stub_rtf": args.stub_rtf if args.url is None and args.engine == "stub" else None,
+        "modelo": modelo,
+        "requisicoes": args.requisicoes,
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "resultados": resultados
+    }
+
+    regressao = False
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f:
+            relatorio["comparacao"], regressao = comparar(json.load(f), relatorio, args.tolerancia)
+        for linha in relatorio["comparacao"]:
+            if linha["regressao"]:
+                print(f"REGRESSÃO {linha['cenario']} c={linha['concorrencia']} {linha['metrica']}: "
+                      f"{linha['antes']} -> {linha['depois']} ({linha['variacao_pct']:+}%)", file=sys.stderr)
+
+    texto_relatorio = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    print(texto_relatorio)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            f.write(texto_relatorio)
+    sys.exit(1 if regressao else 0)
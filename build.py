@@ -19,6 +19,24 @@ def main():
     # Arquivos e pastas para incluir no pacote
     files_to_include = [
         "main.py",
+        "speaker_latents.py",
+        "reference_registry.py",
+        "audio_utils.py",
+        "audio_post.py",
+        "phrase_bank.py",
+        "ticket_prefetch.py",
+        "job_queue.py",
+        "cache_store.py",
+        "cache_eviction.py",
+        "cache_stats.py",
+        "cache_layout.py",
+        "cache_migrate.py",
+        "hot_audio.py",
+        "inference_pool.py",
+        "cpu_accel.py",
+        "tts_backends.py",
+        "metrics.py",
+        "structured_log.py",
         "run_server.py",
         "requirements.txt",
         "README.md",
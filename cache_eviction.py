@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+
+from cache_layout import NAO_MIGRADOS_DIR, listar_audios
+from structured_log import obter_logger
+
+log = obter_logger("cache")
+
+
+POLITICAS = ("lru", "lfu")
+
+
+class CacheSweeper:
+    """Descarte de áudios do cache por tamanho máximo e idade.
+
+    Roda periodicamente em segundo plano usando os acessos e datas do índice
+    de cache. Senhas e guichês com muitos acessos ficam fixados e nunca são
+    descartados por tamanho ou idade. Os áudios deixados pela migração em
+    `nao_migrados` contam no tamanho e são descartados pela data do arquivo;
+    os caminhos em `excluir` (ex: o aviso sonoro) nunca são descartados.
+    """
+
+    def __init__(self, cache_index, diretorios, max_bytes=0, ttl_s=0, politica="lru",
+                 intervalo_s=300, pin_hits=10, tipos_fixaveis=("senha", "guiche"), extensoes=(".wav",),
+                 ao_descartar=None, excluir=()):
+        if politica not in POLITICAS:
+            raise ValueError(f"Política de descarte inválida: {politica}")
+        self.cache_index = cache_index
+        self.diretorios = diretorios  # {tipo: diretório}
+        self.max_bytes = max_bytes  # 0 = sem limite
+        self.ttl_s = ttl_s  # 0 = sem limite de idade
+        self.politica = politica
+        self.intervalo_s = intervalo_s
+        self.pin_hits = pin_hits
+        self.tipos_fixaveis = tipos_fixaveis
+        self.extensoes = extensoes
+        self.ao_descartar = ao_descartar  # (caminho) -> None, para cada arquivo removido
+        self.excluir = {os.path.normpath(p) for p in excluir}
+
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+        self.execucoes = 0
+        self.total_descartados = 0
+        self.total_bytes_descartados = 0
+        self.ultima_execucao = None
+
+    def iniciar(self):
+        """Inicia a varredura periódica em segundo plano"""
+        if self._thread is None and (self.max_bytes or self.ttl_s):
+            self._thread = threading.Thread(target=self._loop, name="cache-sweeper", daemon=True)
+            self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+
+    def _loop(self):
+        while not self._parar.wait(self.intervalo_s):
+            try:
+                self.varrer()
+            except Exception as e:
+                log.error("Erro na varredura do cache", erro=str(e))
+
+    def _listar_arquivos(self):
+        arquivos = []
+        origens = []
+        for tipo, diretorio in self.diretorios.items():
+            origens.append((tipo, listar_audios(diretorio, self.extensoes)))
+            arquivados = os.path.join(diretorio, NAO_MIGRADOS_DIR)
+            if os.path.isdir(arquivados):
+                origens.append((NAO_MIGRADOS_DIR, listar_audios(arquivados, self.extensoes, shards=False)))
+        for tipo, itens in origens:
+            for item in itens:
+                if os.path.normpath(item.path) in self.excluir:
+                    continue
+                try:
+                    stat = item.stat()
+                except FileNotFoundError:
+                    continue
+                arquivos.append({
+                    "path": item.path,
+                    "tipo": tipo,
+                    "key": os.path.splitext(item.name)[0],
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime
+                })
+        return arquivos
+
+    def varrer(self):
+        """Executa uma varredura e retorna o resumo dos arquivos descartados"""
+        with self._lock:
+            inicio = time.time()
+            arquivos = self._listar_arquivos()
+
+            # Metadados do índice, por caminho ou pela chave (nome do arquivo)
+            entradas = self.cache_index.entradas()
+            por_path = {e["path"]: e for e in entradas if e["path"]}
+            por_key = {e["key"]: e for e in entradas}
+
+            candidatos = []
+            total_bytes = 0
+            for arquivo in arquivos:
+                entrada = None
+                if arquivo["tipo"] != NAO_MIGRADOS_DIR:  # Os arquivados já saíram do índice
+                    entrada = por_path.get(arquivo["path"]) or por_key.get(arquivo["key"])
+                arquivo["index_key"] = entrada["key"] if entrada else None
+                arquivo["hits"] = entrada["hits"] if entrada else 0
+                arquivo["last_access"] = (entrada and entrada["last_access"]) or arquivo["mtime"]
+                total_bytes += arquivo["size"]
+
+                fixado = arquivo["tipo"] in self.tipos_fixaveis and arquivo["hits"] >= self.pin_hits
+                if not fixado:
+                    candidatos.append(arquivo)
+
+            descartar = []
+
+            # 1. Idade: descarta o que não é acessado há mais que o TTL
+            if self.ttl_s:
+                limite = inicio - self.ttl_s
+                descartar.extend(a for a in candidatos if a["last_access"] < limite)
+
+            # 2. Tamanho: descarta pela política até voltar abaixo do limite
+            restante = total_bytes - sum(a["size"] for a in descartar)
+            if self.max_bytes and restante > self.max_bytes:
+                ja_descartados = {a["path"] for a in descartar}
+                if self.politica == "lfu":
+                    ordem = sorted(candidatos, key=lambda a: (a["hits"], a["last_access"]))
+                else:
+                    ordem = sorted(candidatos, key=lambda a: a["last_access"])
+                for arquivo in ordem:
+                    if restante <= self.max_bytes:
+                        break
+                    if arquivo["path"] in ja_descartados:
+                        continue
+                    descartar.append(arquivo)
+                    restante -= arquivo["size"]
+
+            bytes_descartados = 0
+            keys = []
+            for arquivo in descartar:
+                try:
+                    os.remove(arquivo["path"])
+                except FileNotFoundError:
+                    pass
+                if self.ao_descartar is not None:
+                    self.ao_descartar(arquivo["path"])
+                bytes_descartados += arquivo["size"]
+                if arquivo["index_key"]:
+                    keys.append(arquivo["index_key"])
+            if keys:
+                self.cache_index.remover_varios(keys)
+
+            self.execucoes += 1
+            self.total_descartados += len(descartar)
+            self.total_bytes_descartados += bytes_descartados
+            self.ultima_execucao = {
+                "quando": inicio,
+                "duracao_s": round(time.time() - inicio, 3),
+                "arquivos": len(arquivos),
+                "descartados": len(descartar),
+                "bytes_descartados": bytes_descartados,
+                "bytes_restantes": restante
+            }
+            if descartar:
+                log.info("Arquivos descartados do cache", arquivos=len(descartar), bytes=bytes_descartados)
+            return self.ultima_execucao
+
+    def estatisticas(self):
+        return {
+            "politica": self.politica,
+            "max_mb": round(self.max_bytes / (1024 * 1024), 2) if self.max_bytes else None,
+            "ttl_horas": round(self.ttl_s / 3600, 2) if self.ttl_s else None,
+            "intervalo_s": self.intervalo_s,
+            "pin_hits": self.pin_hits,
+            "execucoes": self.execucoes,
+            "total_descartados": self.total_descartados,
+            "total_mb_descartados": round(self.total_bytes_descartados / (1024 * 1024), 2),
+            "ultima_execucao": self.ultima_execucao
+        }
@@ -0,0 +1,81 @@
+import hashlib
+import json
+import os
+import re
+import unicodedata
+
+# Versão do esquema de chaves; muda quando a forma de calcular a chave muda
+VERSAO_CHAVE = 2
+
+_ESPACOS = re.compile(r"\s+")
+_SHARD = re.compile(r"^[0-9a-f]{2}$")
+
+# Subdiretório de cada diretório do cache com os áudios que a migração não pôde mover
+NAO_MIGRADOS_DIR = "nao_migrados"
+
+
+def normalizar_texto(texto):
+    """Forma canônica do texto para a chave: Unicode NFC e espaços colapsados"""
+    return _ESPACOS.sub(" ", unicodedata.normalize("NFC", texto or "")).strip()
+
+
+def chave_audio(texto, language, speaker, speed, reference_hash=None, modelo=None, pos=None):
+    """Chave de cache de um áudio sintetizado
+
+    Cobre tudo o que muda o áudio gerado: texto, idioma, falante, velocidade,
+    hash do arquivo de referência, versão do modelo e pós-processamento
+    (`pos`, só quando há algum, então os áudios sem tratamento mantêm a
+    chave). Os campos são serializados em JSON (UTF-8), então nenhum
+    separador dentro do texto produz a mesma chave de outro pedido.
+    """
+    campos = [
+        VERSAO_CHAVE,
+        normalizar_texto(texto),
+        (language or "").lower(),
+        speaker or "",
+        f"{float(speed):g}",
+        reference_hash or "",
+        modelo or ""
+    ]
+    if pos:
+        campos.append(pos)
+    serializado = json.dumps(campos, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(serializado.encode("utf-8")).hexdigest()[:40]
+
+
+def caminho_shard(diretorio, chave, extensao=".wav"):
+    """Caminho do arquivo da chave em dois níveis de subdiretórios (ex: ab/cd/abcd....wav)
+
+    Mantém cada diretório com poucos arquivos mesmo com milhões de áudios no cache.
+    """
+    return os.path.join(diretorio, chave[:2], chave[2:4], f"{chave}{extensao}")
+
+
+def garantir_diretorio(file_path):
+    """Cria o subdiretório do arquivo antes de gravá-lo"""
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+
+def caminho_relativo(file_path, diretorio):
+    """Caminho do arquivo relativo ao diretório, com "/" (para URLs)"""
+    return os.path.relpath(file_path, diretorio).replace(os.sep, "/")
+
+
+def listar_audios(diretorio, extensoes=(".wav",), shards=True):
+    """Arquivos de áudio do diretório: os da raiz (layout antigo) e os dos subdiretórios de shard"""
+    with os.scandir(diretorio) as itens:
+        subdiretorios = []
+        for item in itens:
+            if item.name.endswith(extensoes) and item.is_file():
+                yield item
+            elif shards and _SHARD.match(item.name) and item.is_dir():
+                subdiretorios.append(item.path)
+
+    for shard in subdiretorios:
+        with os.scandir(shard) as subshards:
+            caminhos = [item.path for item in subshards if _SHARD.match(item.name) and item.is_dir()]
+        for caminho in caminhos:
+            with os.scandir(caminho) as itens:
+                for item in itens:
+                    if item.name.endswith(extensoes) and item.is_file():
+                        yield item
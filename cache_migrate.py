@@ -0,0 +1,170 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+
+from cache_layout import NAO_MIGRADOS_DIR, caminho_shard, garantir_diretorio, listar_audios
+
+# Versões codificadas ao lado do WAV: <nome>.<bitrate>k.<extensão>
+_VARIANTE = re.compile(r"^(.*)\.\d+k(\.\w+)$")
+
+# Senhas e guichês da primeira versão, fora do índice: <texto em minúsculas com "_">_<idioma>.wav
+_COMPONENTE_ANTIGO = re.compile(r"^(.+)_([a-z]{2}(?:-[a-z]{2})?)$")
+
+
+def chave_antiga(texto, language, speaker, speed, engine=None):
+    """Chave MD5 do layout antigo (sem arquivo de referência)"""
+    key_parts = [texto, language, str(speaker) if speaker else "None", str(speed)]
+    if engine:
+        key_parts.append(f"engine_{engine}")
+    return hashlib.md5("_".join(key_parts).encode('utf-8')).hexdigest()
+
+
+def _variantes(diretorio, extensoes):
+    # {nome do WAV sem extensão: [nomes das versões codificadas]}
+    variantes = {}
+    for item in listar_audios(diretorio, extensoes, shards=False):
+        encontrado = _VARIANTE.match(item.name)
+        if encontrado and not item.name.endswith(".wav"):
+            variantes.setdefault(encontrado.group(1), []).append(item.name)
+    return variantes
+
+
+def _mover(origem, destino):
+    # Se o destino já existe (gerado no layout novo), ele é mantido
+    if os.path.exists(destino):
+        os.remove(origem)
+    else:
+        garantir_diretorio(destino)
+        os.replace(origem, destino)
+
+
+def _destino_texto(main, entrada, stem):
+    """Nova chave de um texto, se a chave antiga corresponder aos metadados do índice"""
+    motores = [None] + [engine for engine in ("stub", "piper", main.TTS_FALLBACK_ENGINE) if engine]
+    for engine in motores:
+        if chave_antiga(entrada["texto"], entrada["language"], entrada["speaker"], entrada["speed"], engine) == stem:
+            nova = main.generate_cache_key(entrada["texto"], entrada["language"], entrada["speaker"],
+                                           entrada["speed"], engine=engine)
+            return nova, caminho_shard(main.CACHE_DIR, nova), None
+    # Chaves com arquivo de referência não podem ser recalculadas (o arquivo não está no índice)
+    return None
+
+
+def _destino_componente_antigo(main, tipo, diretorio, stem):
+    """Nova chave de uma senha ou guichê com o nome da primeira versão (ex: senha_22_pt.wav)
+
+    O nome guarda apenas o texto em minúsculas e o idioma; esses áudios eram
+    gerados com o falante padrão do idioma e velocidade 1.0. A primeira letra
+    volta a ser maiúscula, como nos pedidos ("Senha 22", "Guichê 2").
+    """
+    encontrado = _COMPONENTE_ANTIGO.match(stem)
+    if not encontrado:
+        return None
+    slug, language = encontrado.groups()
+    texto = slug.replace("_", " ")
+    texto = texto[:1].upper() + texto[1:]
+    speaker = main.DEFAULT_SPEAKERS.get(language, main.DEFAULT_SPEAKERS["default"])
+    path = main.caminho_componente(diretorio, texto, language, speaker, 1.0)
+    return path, path, (texto, language, speaker, 1.0, tipo)
+
+
+def _arquivar(diretorio, nomes):
+    # Fora da raiz, o aviso de layout antigo do servidor deixa de aparecer
+    destino = os.path.join(diretorio, NAO_MIGRADOS_DIR)
+    os.makedirs(destino, exist_ok=True)
+    for nome in nomes:
+        os.replace(os.path.join(diretorio, nome), os.path.join(destino, nome))
+
+
+def migrar(main, simular=False, remover_nao_migrados=False):
+    """Move os áudios da raiz dos diretórios do cache para o layout com shards
+
+    Os áudios que não podem ser migrados vão para o subdiretório
+    `nao_migrados` (ou são removidos com `remover_nao_migrados`). Retorna o
+    resumo da migração. Com `simular`, nada é alterado.
+    """
+    entradas = main.cache_index.entradas()
+    por_path = {os.path.normpath(e["path"]): e for e in entradas if e["path"]}
+    por_key = {e["key"]: e for e in entradas}
+
+    resumo = {"migrados": 0, "variantes": 0, "nao_migrados": 0, "removidos": 0, "arquivados": 0,
+              "exemplos_nao_migrados": []}
+    diretorios = (("texto", main.CACHE_DIR), ("senha", main.SENHA_DIR),
+                  ("guiche", main.GUICHE_DIR), ("anuncio", main.ANUNCIO_DIR))
+    for tipo, diretorio in diretorios:
+        variantes = _variantes(diretorio, main.EXTENSOES_AUDIO)
+        for item in list(listar_audios(diretorio, (".wav",), shards=False)):
+            if item.path == main.CHIME_FILE:
+                continue
+            stem = os.path.splitext(item.name)[0]
+            entrada = por_path.get(os.path.normpath(item.path)) or por_key.get(stem)
+
+            destino = None
+            if entrada and entrada["texto"] and entrada["language"] and entrada["speed"] is not None:
+                if tipo == "texto":
+                    destino = _destino_texto(main, entrada, stem)
+                elif tipo in ("senha", "guiche"):
+                    path = main.caminho_componente(diretorio, entrada["texto"], entrada["language"],
+                                                   entrada["speaker"], entrada["speed"])
+                    destino = (path, path, None)
+            elif entrada is None and tipo in ("senha", "guiche"):
+                destino = _destino_componente_antigo(main, tipo, diretorio, stem)
+            # Chamadas montadas antigas não são migradas: são refeitas por junção, sem o modelo
+
+            if destino is None:
+                resumo["nao_migrados"] += 1
+                if len(resumo["exemplos_nao_migrados"]) < 10:
+                    resumo["exemplos_nao_migrados"].append(item.path)
+                if simular:
+                    continue
+                nomes = [item.name] + variantes.get(stem, [])
+                if remover_nao_migrados:
+                    for nome in nomes:
+                        os.remove(os.path.join(diretorio, nome))
+                    resumo["removidos"] += 1
+                else:
+                    _arquivar(diretorio, nomes)
+                    resumo["arquivados"] += 1
+                if entrada:
+                    main.cache_index.remover(entrada["key"])
+                continue
+
+            nova_key, novo_path, registro = destino
+            resumo["migrados"] += 1
+            resumo["variantes"] += len(variantes.get(stem, []))
+            if simular:
+                continue
+            novo_stem = os.path.splitext(novo_path)[0]
+            for nome in variantes.get(stem, []):
+                _mover(os.path.join(diretorio, nome), novo_stem + nome[len(stem):])
+            _mover(item.path, novo_path)
+            if entrada:
+                main.cache_index.renomear(entrada["key"], nova_key, novo_path)
+            elif registro:
+                texto, language, speaker, speed, tipo_registro = registro
+                main.cache_index.registrar(novo_path, texto, language, speaker, speed, novo_path, tipo=tipo_registro)
+
+    if not simular:
+        main.cache_index.flush()
+        main.cache_stats.reconciliar()
+    return resumo
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Migra o cache de áudio para o layout com shards e chaves completas (execute com o servidor parado)")
+    parser.add_argument("--simular", action="store_true",
+                        help="Apenas mostra o que seria migrado, sem alterar nada")
+    parser.add_argument("--remover-nao-migrados", action="store_true",
+                        help="Remove os áudios que não podem ser migrados (sem metadados no índice, "
+                             "com arquivo de referência ou chamadas montadas) em vez de movê-los "
+                             "para o subdiretório nao_migrados")
+    args = parser.parse_args()
+
+    # Importado aqui para usar as mesmas chaves e diretórios do servidor (o modelo não é carregado)
+    import main
+    resumo = migrar(main, simular=args.simular, remover_nao_migrados=args.remover_nao_migrados)
+    print(json.dumps(resumo, ensure_ascii=False, indent=2))
+    main.cache_index.fechar()
@@ -0,0 +1,193 @@
+import json
+import os
+import threading
+import time
+
+from cache_layout import listar_audios
+from structured_log import obter_logger
+
+log = obter_logger("cache")
+
+
+# Faixas dos histogramas de idade (limite em segundos, rótulo)
+FAIXAS_IDADE = ((3600, "ate_1h"), (86400, "ate_1d"), (7 * 86400, "ate_7d"), (30 * 86400, "ate_30d"))
+
+
+def _faixa(idade_s):
+    for limite, rotulo in FAIXAS_IDADE:
+        if idade_s <= limite:
+            return rotulo
+    return "mais_30d"
+
+
+def _histograma():
+    histograma = {rotulo: 0 for _, rotulo in FAIXAS_IDADE}
+    histograma["mais_30d"] = 0
+    return histograma
+
+
+def _mb(valor):
+    return round(valor / (1024 * 1024), 2)
+
+
+def _resumo(arquivos, size, hits=0, geracoes=0):
+    return {
+        "entries": arquivos,
+        "size_mb": _mb(size),
+        "hits": hits,
+        "geracoes": geracoes,
+        "taxa_acerto": round(hits / (hits + geracoes), 3) if hits + geracoes else None
+    }
+
+
+class CacheStats:
+    """Estatísticas do cache para GET /cache sem percorrer os diretórios a cada pedido.
+
+    Arquivos e bytes por tipo, idioma e falante são mantidos pelo índice de
+    cache a cada áudio gravado ou descartado. A reconciliação periódica em
+    segundo plano confere os diretórios: corrige tamanhos, remove do índice
+    entradas sem arquivo, conta os arquivos fora do índice (como as versões
+    codificadas) e calcula os histogramas de idade. O resultado fica no
+    índice, compartilhado entre os processos.
+    """
+
+    def __init__(self, cache_index, diretorios, intervalo_s=600, extensoes=(".wav",)):
+        self.cache_index = cache_index
+        self.diretorios = diretorios  # {tipo: diretório}
+        self.intervalo_s = intervalo_s
+        self.extensoes = extensoes
+
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+
+    def iniciar(self):
+        """Inicia a reconciliação periódica (a primeira logo em seguida) em segundo plano"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="cache-stats", daemon=True)
+            self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+
+    def _loop(self):
+        espera = 0
+        while not self._parar.wait(espera):
+            espera = self.intervalo_s
+            # Com vários workers, basta um reconciliar a cada intervalo
+            ultima = self._ultima_reconciliacao()
+            if ultima and time.time() - ultima["quando"] < self.intervalo_s * 0.9:
+                continue
+            try:
+                self.reconciliar()
+            except Exception as e:
+                log.error("Erro na reconciliação das estatísticas do cache", erro=str(e))
+
+    def _ultima_reconciliacao(self):
+        valor = self.cache_index.meta("reconciliacao")
+        return json.loads(valor) if valor else None
+
+    def reconciliar(self):
+        """Confere o índice com os arquivos em disco e retorna o resumo da reconciliação"""
+        with self._lock:
+            inicio = time.time()
+            # Entradas lidas antes da varredura: as gravadas durante ela ficam para a próxima
+            entradas = self.cache_index.tamanhos()
+            por_path = {os.path.normpath(path): (key, size) for key, path, size, _, _ in entradas if path}
+            por_key = {key: (key, size) for key, path, size, _, _ in entradas if not path}
+
+            vistas = set()
+            corrigir = []
+            fora_do_indice = {}
+            arquivos = 0
+            for tipo, diretorio in self.diretorios.items():
+                fora = fora_do_indice.setdefault(tipo, {"entries": 0, "bytes": 0})
+                for item in listar_audios(diretorio, self.extensoes):
+                    try:
+                        size = item.stat().st_size
+                    except FileNotFoundError:
+                        continue
+                    arquivos += 1
+                    entrada = (por_path.get(os.path.normpath(item.path))
+                               or por_key.get(os.path.splitext(item.name)[0]))
+                    if entrada is None:
+                        fora["entries"] += 1
+                        fora["bytes"] += size
+                        continue
+                    key, size_indice = entrada
+                    vistas.add(key)
+                    if size_indice != size:
+                        corrigir.append((key, size))
+
+            # Entradas cujo arquivo sumiu de um dos diretórios monitorados
+            monitorados = tuple(os.path.normpath(diretorio) + os.sep for diretorio in self.diretorios.values())
+            ausentes = [key for key, path, _, _, _ in entradas
+                        if path and key not in vistas and os.path.normpath(path).startswith(monitorados)]
+
+            if corrigir:
+                self.cache_index.atualizar_tamanhos(corrigir)
+            if ausentes:
+                self.cache_index.remover_varios(ausentes)
+
+            idade = _histograma()
+            sem_acesso = _histograma()
+            for key, _, _, created, last_access in entradas:
+                if key in vistas:
+                    idade[_faixa(inicio - (created or inicio))] += 1
+                    sem_acesso[_faixa(inicio - (last_access or created or inicio))] += 1
+
+            resumo = {
+                "quando": inicio,
+                "duracao_s": round(time.time() - inicio, 3),
+                "arquivos": arquivos,
+                "tamanhos_corrigidos": len(corrigir),
+                "entradas_removidas": len(ausentes),
+                "fora_do_indice": fora_do_indice,
+                "idade": idade,
+                "sem_acesso": sem_acesso
+            }
+            self.cache_index.definir_meta("reconciliacao", json.dumps(resumo))
+            if corrigir or ausentes:
+                log.info("Estatísticas do cache reconciliadas", tamanhos_corrigidos=len(corrigir),
+                         entradas_removidas=len(ausentes), duracao_s=resumo["duracao_s"])
+            return resumo
+
+    def estatisticas(self):
+        """Totais por tipo, idioma e falante, taxa de acerto e idade dos áudios"""
+        agregados = self.cache_index.agregados()
+        reconciliacao = self._ultima_reconciliacao() or {}
+        fora_do_indice = reconciliacao.get("fora_do_indice", {})
+
+        dimensoes = {"tipo": {}, "language": {}, "speaker": {}}
+        for linha in agregados:
+            dimensoes[linha["dimensao"]][linha["valor"] or "desconhecido"] = linha
+
+        resultado = {}
+        total_arquivos = 0
+        total_bytes = 0
+        for tipo in self.diretorios:
+            linha = dimensoes["tipo"].get(tipo, {})
+            fora = fora_do_indice.get(tipo, {})
+            arquivos = linha.get("arquivos", 0) + fora.get("entries", 0)
+            size = linha.get("bytes", 0) + fora.get("bytes", 0)
+            resultado[f"{tipo}_entries"] = arquivos
+            resultado[f"{tipo}_size_mb"] = _mb(size)
+            total_arquivos += arquivos
+            total_bytes += size
+        resultado["total_entries"] = total_arquivos
+        resultado["total_size_mb"] = _mb(total_bytes)
+
+        def detalhar(dimensao):
+            return {valor: _resumo(l["arquivos"], l["bytes"], l["hits"], l["geracoes"])
+                    for valor, l in sorted(dimensoes[dimensao].items())}
+
+        resultado["por_tipo"] = detalhar("tipo")
+        resultado["por_idioma"] = detalhar("language")
+        resultado["por_falante"] = detalhar("speaker")
+        resultado["idade"] = reconciliacao.get("idade")
+        resultado["sem_acesso"] = reconciliacao.get("sem_acesso")
+        resultado["reconciliacao"] = {
+            chave: reconciliacao.get(chave)
+            for chave in ("quando", "duracao_s", "arquivos", "tamanhos_corrigidos", "entradas_removidas", "fora_do_indice")
+        }
+        return resultado
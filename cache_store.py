@@ -0,0 +1,324 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from structured_log import obter_logger
+
+log = obter_logger("cache")
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    tipo TEXT NOT NULL DEFAULT 'texto',
+    texto TEXT,
+    language TEXT,
+    speaker TEXT,
+    speed REAL,
+    path TEXT,
+    hits INTEGER NOT NULL DEFAULT 0,
+    created REAL,
+    last_access REAL,
+    size INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_cache_language ON cache(language);
+CREATE INDEX IF NOT EXISTS idx_cache_speaker ON cache(speaker);
+CREATE INDEX IF NOT EXISTS idx_cache_created ON cache(created);
+CREATE INDEX IF NOT EXISTS idx_cache_last_access ON cache(last_access);
+CREATE TABLE IF NOT EXISTS meta (
+    chave TEXT PRIMARY KEY,
+    valor TEXT
+);
+CREATE TABLE IF NOT EXISTS estatisticas (
+    dimensao TEXT NOT NULL,
+    valor TEXT NOT NULL,
+    arquivos INTEGER NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    hits INTEGER NOT NULL DEFAULT 0,
+    geracoes INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimensao, valor)
+);
+"""
+
+# Arquivos e bytes por tipo, idioma e falante mantidos pelo próprio SQLite a
+# cada entrada criada, alterada ou removida (também entre processos)
+_SOMAR = """
+    INSERT INTO estatisticas (dimensao, valor, arquivos, bytes) VALUES
+        ('tipo', NEW.tipo, 1, COALESCE(NEW.size, 0)),
+        ('language', COALESCE(NEW.language, ''), 1, COALESCE(NEW.size, 0)),
+        ('speaker', COALESCE(NEW.speaker, ''), 1, COALESCE(NEW.size, 0))
+    ON CONFLICT(dimensao, valor) DO UPDATE SET
+        arquivos = arquivos + 1,
+        bytes = bytes + excluded.bytes;
+"""
+_SUBTRAIR = """
+    UPDATE estatisticas SET arquivos = arquivos - 1, bytes = bytes - COALESCE(OLD.size, 0)
+    WHERE (dimensao = 'tipo' AND valor = OLD.tipo)
+       OR (dimensao = 'language' AND valor = COALESCE(OLD.language, ''))
+       OR (dimensao = 'speaker' AND valor = COALESCE(OLD.speaker, ''));
+"""
+TRIGGERS = (
+    f"CREATE TRIGGER IF NOT EXISTS estatisticas_insert AFTER INSERT ON cache BEGIN {_SOMAR} END",
+    f"CREATE TRIGGER IF NOT EXISTS estatisticas_delete AFTER DELETE ON cache BEGIN {_SUBTRAIR} END",
+    f"CREATE TRIGGER IF NOT EXISTS estatisticas_update AFTER UPDATE OF tipo, language, speaker, size ON cache "
+    f"BEGIN {_SUBTRAIR} {_SOMAR} END",
+)
+
+# Recalcula as estatísticas a partir das entradas (índices criados antes delas)
+RECALCULAR_ESTATISTICAS = """
+INSERT INTO estatisticas (dimensao, valor, arquivos, bytes)
+SELECT 'tipo', tipo, COUNT(*), COALESCE(SUM(size), 0) FROM cache GROUP BY tipo
+UNION ALL
+SELECT 'language', COALESCE(language, ''), COUNT(*), COALESCE(SUM(size), 0) FROM cache GROUP BY 2
+UNION ALL
+SELECT 'speaker', COALESCE(speaker, ''), COUNT(*), COALESCE(SUM(size), 0) FROM cache GROUP BY 2
+"""
+
+# Acessos (hits) e gerações acumulados por tipo, idioma e falante
+UPSERT_ACESSOS = """
+INSERT INTO estatisticas (dimensao, valor, hits, geracoes) VALUES (?, ?, ?, ?)
+ON CONFLICT(dimensao, valor) DO UPDATE SET
+    hits = hits + excluded.hits,
+    geracoes = geracoes + excluded.geracoes
+"""
+
+# Soma os acessos acumulados em memória aos já gravados (ou cria a entrada)
+UPSERT_HITS = """
+INSERT INTO cache (key, tipo, texto, language, speaker, speed, path, hits, created, last_access, size)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(key) DO UPDATE SET
+    hits = hits + excluded.hits,
+    last_access = MAX(COALESCE(last_access, 0), excluded.last_access)
+"""
+
+# Entrada de um áudio recém-gerado: substitui a anterior (sem apagar a linha, para os gatilhos)
+UPSERT_ENTRADA = """
+INSERT INTO cache (key, tipo, texto, language, speaker, speed, path, hits, created, last_access, size)
+VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?, ?, ?)
+ON CONFLICT(key) DO UPDATE SET
+    tipo = excluded.tipo,
+    texto = excluded.texto,
+    language = excluded.language,
+    speaker = excluded.speaker,
+    speed = excluded.speed,
+    path = excluded.path,
+    hits = 1,
+    created = excluded.created,
+    last_access = excluded.last_access,
+    size = excluded.size
+"""
+
+COLUNAS = ("key", "tipo", "texto", "language", "speaker", "speed", "path", "hits", "created", "last_access", "size")
+
+
+def _arquivo(path, agora):
+    """(data de criação, tamanho) do arquivo, ou (agora, None) se ele não existir"""
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError):
+        return agora, None
+    return stat.st_ctime, stat.st_size
+
+
+def _dimensoes(tipo, language, speaker):
+    return (("tipo", tipo), ("language", language or ""), ("speaker", speaker or ""))
+
+
+class CacheIndex:
+    """Índice de metadados do cache de áudio em SQLite (modo WAL).
+
+    As gravações são transacionais e seguras entre processos. Os acessos
+    (hits) ficam acumulados em memória e são gravados em lote periodicamente,
+    em vez de reescrever o índice inteiro a cada requisição.
+    """
+
+    def __init__(self, db_path, flush_interval=5.0):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._migrar()
+        self._lock = threading.Lock()
+        self._hits_pendentes = {}
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._flush_periodico, name="cache-index-flush", daemon=True)
+        self._thread.start()
+
+    def _migrar(self):
+        # Índices criados antes das estatísticas: coluna de tamanho e totais iniciais
+        with self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            colunas = {linha[1] for linha in self._conn.execute("PRAGMA table_info(cache)")}
+            if "size" not in colunas:
+                self._conn.execute("ALTER TABLE cache ADD COLUMN size INTEGER")
+            for trigger in TRIGGERS:
+                self._conn.execute(trigger)
+            if not self._conn.execute("SELECT 1 FROM meta WHERE chave = 'estatisticas'").fetchone():
+                self._conn.execute("DELETE FROM estatisticas")
+                self._conn.execute(RECALCULAR_ESTATISTICAS)
+                self._conn.execute("INSERT INTO meta (chave, valor) VALUES ('estatisticas', ?)", (str(time.time()),))
+
+    def importar_json(self, json_path):
+        """Importa o antigo cache_index.json (apenas uma vez)"""
+        if not os.path.exists(json_path) or self.meta("json_importado"):
+            return 0
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                entradas = json.load(f)
+        except Exception as e:
+            log.warning("Não foi possível importar o índice JSON", arquivo=json_path, erro=str(e))
+            entradas = {}
+
+        linhas = [
+            (key, "texto", e.get("texto"), e.get("language"), e.get("speaker"), e.get("speed"),
+             None, e.get("hits", 0), e.get("created"), e.get("created"), None)
+            for key, e in entradas.items()
+        ]
+        with self._lock:
+            with self._conn:
+                # Transação exclusiva: com vários processos iniciando juntos, só um importa
+                self._conn.execute("BEGIN IMMEDIATE")
+                if self._conn.execute("SELECT 1 FROM meta WHERE chave = 'json_importado'").fetchone():
+                    return 0
+                self._conn.executemany(UPSERT_HITS, linhas)
+                self._conn.execute("INSERT OR REPLACE INTO meta (chave, valor) VALUES ('json_importado', ?)",
+                                   (str(time.time()),))
+        log.info("Índice de cache importado", arquivo=json_path, entradas=len(linhas))
+        return len(linhas)
+
+    def registrar(self, key, texto, language, speaker, speed, path, tipo="texto"):
+        """Registra (ou substitui) a entrada de um áudio recém-gerado"""
+        agora = time.time()
+        created, size = _arquivo(path, agora)
+        with self._lock:
+            self._hits_pendentes.pop(key, None)
+            with self._conn:
+                self._conn.execute(UPSERT_ENTRADA, (key, tipo, texto, language, speaker, speed, path,
+                                                    created, agora, size))
+                self._conn.executemany(UPSERT_ACESSOS, [(dimensao, valor, 0, 1)
+                                                        for dimensao, valor in _dimensoes(tipo, language, speaker)])
+
+    def registrar_hit(self, key, texto, language, speaker, speed, path, tipo="texto"):
+        """Contabiliza um acesso em memória; gravado no próximo flush"""
+        agora = time.time()
+        with self._lock:
+            pendente = self._hits_pendentes.get(key)
+            if pendente is None:
+                created, size = _arquivo(path, agora)
+                self._hits_pendentes[key] = [key, tipo, texto, language, speaker, speed, path, 1, created, agora, size]
+            else:
+                pendente[7] += 1
+                pendente[9] = agora
+
+    def flush(self):
+        """Grava em lote os acessos acumulados"""
+        with self._lock:
+            if not self._hits_pendentes:
+                return 0
+            linhas = [tuple(linha) for linha in self._hits_pendentes.values()]
+            self._hits_pendentes = {}
+            acessos = {}
+            for linha in linhas:
+                for dimensao in _dimensoes(linha[1], linha[3], linha[4]):
+                    acessos[dimensao] = acessos.get(dimensao, 0) + linha[7]
+            with self._conn:
+                self._conn.executemany(UPSERT_HITS, linhas)
+                self._conn.executemany(UPSERT_ACESSOS, [(dimensao, valor, hits, 0)
+                                                        for (dimensao, valor), hits in acessos.items()])
+        return len(linhas)
+
+    def get(self, key):
+        """Retorna a entrada de uma chave (incluindo acessos ainda não gravados)"""
+        self.flush()
+        with self._lock:
+            linha = self._conn.execute(
+                f"SELECT {', '.join(COLUNAS)} FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        return dict(zip(COLUNAS, linha)) if linha else None
+
+    def entradas(self):
+        """Retorna todas as entradas do índice (após gravar os acessos pendentes)"""
+        self.flush()
+        with self._lock:
+            linhas = self._conn.execute(f"SELECT {', '.join(COLUNAS)} FROM cache").fetchall()
+        return [dict(zip(COLUNAS, linha)) for linha in linhas]
+
+    def agregados(self):
+        """Arquivos, bytes, acessos e gerações por tipo, idioma e falante (sem percorrer as entradas)"""
+        with self._lock:
+            linhas = self._conn.execute(
+                "SELECT dimensao, valor, arquivos, bytes, hits, geracoes FROM estatisticas").fetchall()
+        return [dict(zip(("dimensao", "valor", "arquivos", "bytes", "hits", "geracoes"), linha)) for linha in linhas]
+
+    def tamanhos(self):
+        """(key, path, size, created, last_access) de todas as entradas, para a reconciliação com o disco"""
+        with self._lock:
+            return self._conn.execute("SELECT key, path, size, created, last_access FROM cache").fetchall()
+
+    def atualizar_tamanhos(self, tamanhos):
+        """Corrige o tamanho registrado das entradas: [(key, size), ...]"""
+        with self._lock:
+            with self._conn:
+                self._conn.executemany("UPDATE cache SET size = ? WHERE key = ?",
+                                       [(size, key) for key, size in tamanhos])
+
+    def renomear(self, key, nova_key, path):
+        """Muda a chave e o caminho de uma entrada (se a nova chave já existir, a antiga é removida)"""
+        with self._lock:
+            self._hits_pendentes.pop(key, None)
+            with self._conn:
+                if nova_key != key and self._conn.execute("SELECT 1 FROM cache WHERE key = ?", (nova_key,)).fetchone():
+                    self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                else:
+                    self._conn.execute("UPDATE cache SET key = ?, path = ? WHERE key = ?", (nova_key, path, key))
+
+    def remover_varios(self, keys):
+        with self._lock:
+            for key in keys:
+                self._hits_pendentes.pop(key, None)
+            with self._conn:
+                self._conn.executemany("DELETE FROM cache WHERE key = ?", [(key,) for key in keys])
+
+    def remover(self, key):
+        with self._lock:
+            self._hits_pendentes.pop(key, None)
+            with self._conn:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def limpar(self):
+        """Remove todas as entradas do índice"""
+        with self._lock:
+            self._hits_pendentes = {}
+            with self._conn:
+                self._conn.execute("DELETE FROM cache")
+                self._conn.execute("DELETE FROM estatisticas")
+
+    def fechar(self):
+        """Grava os acessos pendentes e encerra o índice"""
+        self._parar.set()
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def meta(self, chave):
+        """Valor gravado com `definir_meta` (compartilhado entre os processos)"""
+        with self._lock:
+            linha = self._conn.execute("SELECT valor FROM meta WHERE chave = ?", (chave,)).fetchone()
+        return linha[0] if linha else None
+
+    def definir_meta(self, chave, valor):
+        with self._lock:
+            with self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO meta (chave, valor) VALUES (?, ?)", (chave, valor))
+
+    def _flush_periodico(self):
+        while not self._parar.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                log.error("Erro ao gravar o índice de cache", erro=str(e))
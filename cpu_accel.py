@@ -0,0 +1,261 @@
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+import torch
+
+from structured_log import obter_logger
+
+log = obter_logger("cpu")
+
+
+# Frases usadas para comparar o modo acelerado com o fp32
+FRASES_PADRAO = [
+    ("Senha 42, guichê 7.", "pt"),
+    ("Atenção: o atendimento preferencial está disponível no caixa 3.", "pt"),
+    ("Por favor, aguarde a sua vez na sala de espera.", "pt"),
+    ("Ticket number 128, please go to counter 5.", "en"),
+]
+
+
+def configurar_threads(intra=0, inter=0):
+    """Define as threads do torch: `intra` por operação e `inter` entre operações (0 = padrão)
+
+    As threads entre operações só podem ser alteradas antes do primeiro
+    trabalho paralelo do torch; depois disso a alteração é ignorada.
+    """
+    if intra:
+        torch.set_num_threads(intra)
+    if inter:
+        try:
+            torch.set_num_interop_threads(inter)
+        except RuntimeError as e:
+            log.warning("Não foi possível definir as threads entre operações", erro=str(e))
+
+
+def _conv1d_para_linear(modulo):
+    """Troca as camadas Conv1D do GPT-2 (transformers) por nn.Linear equivalentes
+
+    O GPT do XTTS usa Conv1D nas camadas de atenção e MLP, que a quantização
+    dinâmica não reconhece; como nn.Linear elas passam a ser quantizadas.
+    """
+    try:
+        from transformers.pytorch_utils import Conv1D
+    except ImportError:
+        return 0
+
+    convertidas = 0
+    for nome, filho in list(modulo.named_children()):
+        if isinstance(filho, Conv1D):
+            entrada, saida = filho.weight.shape
+            linear = torch.nn.Linear(entrada, saida, bias=filho.bias is not None)
+            linear.weight.data = filho.weight.data.t().contiguous()
+            if filho.bias is not None:
+                linear.bias.data = filho.bias.data
+            setattr(modulo, nome, linear)
+            convertidas += 1
+        else:
+            convertidas += _conv1d_para_linear(filho)
+    return convertidas
+
+
+def quantizar_int8(modulo):
+    """Quantização dinâmica int8 das camadas lineares do módulo (no lugar); retorna quantas foram quantizadas"""
+    lineares = sum(1 for m in modulo.modules() if type(m) is torch.nn.Linear)
+    if lineares:
+        torch.ao.quantization.quantize_dynamic(modulo, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return lineares
+
+
+def acelerar_modelo(model, compilar=False):
+    """Aplica o modo acelerado de CPU ao modelo XTTS e retorna o resumo do que foi feito
+
+    Quantiza em int8 as camadas lineares do GPT e do decodificador HiFi-GAN
+    (as convoluções continuam em fp32) e, opcionalmente, compila o
+    decodificador com torch.compile.
+    """
+    inicio = time.time()
+    model.eval()
+    resumo = {"modo": "int8", "conv1d_convertidas": 0, "lineares_quantizadas": {}, "compilado": False}
+
+    gpt = getattr(model, "gpt", None)
+    if gpt is not None:
+        resumo["conv1d_convertidas"] = _conv1d_para_linear(gpt)
+        resumo["lineares_quantizadas"]["gpt"] = quantizar_int8(gpt)
+
+    decoder = getattr(model, "hifigan_decoder", None)
+    if decoder is not None:
+        resumo["lineares_quantizadas"]["hifigan_decoder"] = quantizar_int8(decoder)
+        if compilar:
+            waveform_decoder = getattr(decoder, "waveform_decoder", None)
+            try:
+                if waveform_decoder is None:
+                    raise RuntimeError("decodificador sem waveform_decoder")
+                decoder.waveform_decoder = torch.compile(waveform_decoder)
+                resumo["compilado"] = True
+            except Exception as e:
+                log.warning("torch.compile indisponível para o decodificador", erro=str(e))
+
+    resumo["duracao_s"] = round(time.time() - inicio, 2)
+    log.info("Modo acelerado de CPU aplicado", duracao_s=resumo["duracao_s"],
+             lineares_quantizadas=resumo["lineares_quantizadas"])
+    return resumo
+
+
+class MedidorRTF:
+    """Fator de tempo real (tempo de síntese / duração do áudio) das sínteses feitas"""
+
+    def __init__(self, modo="fp32"):
+        self.modo = modo
+        self._lock = threading.Lock()
+        self._sinteses = 0
+        self._segundos_sintese = 0.0
+        self._segundos_audio = 0.0
+        self._ultimo = None
+
+    def registrar(self, segundos_sintese, segundos_audio):
+        if segundos_audio <= 0:
+            return
+        with self._lock:
+            self._sinteses += 1
+            self._segundos_sintese += segundos_sintese
+            self._segundos_audio += segundos_audio
+            self._ultimo = segundos_sintese / segundos_audio
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "modo": self.modo,
+                "sinteses": self._sinteses,
+                "rtf_medio": round(self._segundos_sintese / self._segundos_audio, 3) if self._segundos_audio else None,
+                "rtf_ultimo": round(self._ultimo, 3) if self._ultimo is not None else None,
+                "segundos_audio": round(self._segundos_audio, 2)
+            }
+
+
+def espectro_medio_db(audio, sample_rate, janela=1024):
+    """Espectro médio de longo prazo em dB (não depende do alinhamento entre duas sínteses)"""
+    if len(audio) < janela:
+        audio = np.pad(audio, (0, janela - len(audio)))
+    passo = janela // 2
+    quadros = np.lib.stride_tricks.sliding_window_view(audio, janela)[::passo] * np.hanning(janela)
+    potencia = np.mean(np.abs(np.fft.rfft(quadros, axis=1)) ** 2, axis=0)
+    return 10 * np.log10(potencia + 1e-10)
+
+
+def comparar_qualidade(referencia, teste, sample_rate):
+    """Diferenças entre o áudio fp32 (referência) e o acelerado"""
+    def rms_db(audio):
+        return 20 * np.log10(np.sqrt(np.mean(audio ** 2)) + 1e-10)
+
+    return {
+        "duracao_relativa": round(len(teste) / max(len(referencia), 1), 3),
+        "rms_delta_db": round(float(rms_db(teste) - rms_db(referencia)), 2),
+        "espectro_delta_db": round(float(np.mean(np.abs(
+            espectro_medio_db(teste, sample_rate) - espectro_medio_db(referencia, sample_rate)))), 2)
+    }
+
+
+def medir(sintetizar, frases, pasta, rotulo, repeticoes=1):
+    """Sintetiza as frases e retorna (RTF de cada frase, áudios gerados)"""
+    from audio_utils import ler_wav
+
+    resultados = []
+    audios = []
+    for i, (texto, language) in enumerate(frases):
+        file_path = os.path.join(pasta, f"{rotulo}_{i}.wav")
+        tempos = []
+        for _ in range(repeticoes):
+            # Mesma semente nos dois modos para comparações mais justas
+            torch.manual_seed(i)
+            inicio = time.perf_counter()
+            sintetizar(texto, file_path, language)
+            tempos.append(time.perf_counter() - inicio)
+        audio, sample_rate = ler_wav(file_path)
+        duracao = len(audio) / sample_rate
+        resultados.append({"texto": texto, "duracao_audio_s": round(duracao, 2),
+                           "rtf": round(min(tempos) / duracao, 3) if duracao else None})
+        audios.append((audio, sample_rate))
+    return resultados, audios
+
+
+def _rtf_total(resultados):
+    validos = [r for r in resultados if r["rtf"] is not None]
+    if not validos:
+        return None
+    return round(sum(r["rtf"] * r["duracao_audio_s"] for r in validos) / sum(r["duracao_audio_s"] for r in validos), 3)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara o modo acelerado de CPU (int8) com o modelo fp32")
+    parser.add_argument("--frases", type=str, default=None,
+                        help="Arquivo JSON com uma lista de [texto, idioma] (padrão: frases de exemplo)")
+    parser.add_argument("--repeticoes", type=int, default=2,
+                        help="Sínteses por frase; vale o menor tempo")
+    parser.add_argument("--compile", action="store_true",
+                        help="Também compila o decodificador com torch.compile")
+    parser.add_argument("--salvar-audios", type=str, default=None,
+                        help="Diretório onde guardar os áudios fp32 e int8 para ouvir")
+    parser.add_argument("--saida", type=str, default=None,
+                        help="Arquivo onde gravar o relatório JSON")
+    args = parser.parse_args()
+
+    frases = FRASES_PADRAO
+    if args.frases:
+        with open(args.frases, 'r', encoding='utf-8') as f:
+            frases = [tuple(frase) for frase in json.load(f)]
+
+    # O modelo é carregado em fp32 e acelerado depois da primeira medição
+    os.environ["TTS_CPU_ACELERADO"] = "0"
+    import main
+    if main.TTS_ENGINE != "xtts":
+        parser.error("O modo acelerado de CPU se aplica apenas ao motor xtts (TTS_ENGINE)")
+    main.carregar_modelo()
+    if main.device != "cpu":
+        print(f"Aviso: o modelo está em {main.device}; o modo acelerado é pensado para CPU")
+
+    def sintetizar(texto, file_path, language):
+        speaker = main.DEFAULT_SPEAKERS.get(language, main.DEFAULT_SPEAKERS["default"])
+        main.sintetizar_arquivo(texto, file_path, language, 1.0, speaker=speaker)
+
+    pasta = args.salvar_audios or tempfile.mkdtemp(prefix="cpu_accel_")
+    if not os.path.exists(pasta):
+        os.makedirs(pasta)
+
+    # Aquecimento fora da medição
+    main.aquecer_modelo()
+    fp32, audios_fp32 = medir(sintetizar, frases, pasta, "fp32", args.repeticoes)
+
+    resumo = acelerar_modelo(main.backend.model, compilar=args.compile)
+    main.aquecer_modelo()
+    int8, audios_int8 = medir(sintetizar, frases, pasta, "int8", args.repeticoes)
+
+    qualidade = [comparar_qualidade(ref, teste, sr) for (ref, sr), (teste, _) in zip(audios_fp32, audios_int8)]
+    rtf_fp32 = _rtf_total(fp32)
+    rtf_int8 = _rtf_total(int8)
+    relatorio = {
+        "device": main.device,
+        "threads": torch.get_num_threads(),
+        "threads_entre_operacoes": torch.get_num_interop_threads(),
+        "aceleracao": resumo,
+        "fp32": {"rtf": rtf_fp32, "frases": fp32},
+        "int8": {"rtf": rtf_int8, "frases": int8},
+        "ganho_velocidade": round(rtf_fp32 / rtf_int8, 2) if rtf_fp32 and rtf_int8 else None,
+        "qualidade": {
+            "duracao_relativa_media": round(float(np.mean([q["duracao_relativa"] for q in qualidade])), 3),
+            "rms_delta_db_medio": round(float(np.mean([q["rms_delta_db"] for q in qualidade])), 2),
+            "espectro_delta_db_medio": round(float(np.mean([q["espectro_delta_db"] for q in qualidade])), 2),
+            "frases": qualidade
+        },
+        "audios": pasta
+    }
+
+    texto_relatorio = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    print(texto_relatorio)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            f.write(texto_relatorio)
@@ -0,0 +1,167 @@
+import hashlib
+import mimetypes
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from starlette.responses import FileResponse, Response
+
+mimetypes.add_type("audio/wav", ".wav")
+mimetypes.add_type("audio/ogg", ".ogg")
+mimetypes.add_type("audio/ogg", ".opus")
+mimetypes.add_type("audio/mpeg", ".mp3")
+
+
+class _Entrada:
+    __slots__ = ("path", "dados", "etag", "size", "mtime_ns", "media_type", "validado")
+
+    def __init__(self, path, dados, etag, size, mtime_ns, media_type):
+        self.path = path
+        self.dados = dados  # None para arquivos grandes demais para a memória
+        self.etag = etag
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.media_type = media_type
+        self.validado = time.monotonic()
+
+
+class HotAudioCache:
+    """Cache em memória dos áudios mais acessados.
+
+    Guarda o conteúdo dos arquivos (limitado pelo total de bytes, com descarte
+    LRU) e o ETag forte de cada um. Uma entrada só volta a consultar o disco
+    depois de `revalidar_s` segundos, para detectar arquivos alterados ou removidos.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_arquivo_bytes=4 * 1024 * 1024, revalidar_s=5.0):
+        self.max_bytes = max_bytes
+        self.max_arquivo_bytes = max_arquivo_bytes
+        self.revalidar_s = revalidar_s
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path):
+        """Retorna a entrada se estiver em memória e validada recentemente (sem acesso ao disco)"""
+        with self._lock:
+            entrada = self._entradas.get(path)
+            if entrada is None or time.monotonic() - entrada.validado > self.revalidar_s:
+                return None
+            self._entradas.move_to_end(path)
+            self.hits += 1
+            return entrada
+
+    def carregar(self, path):
+        """Valida a entrada no disco, relendo o arquivo apenas se ele mudou
+
+        Lança FileNotFoundError se o arquivo não existir mais.
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.invalidar(path)
+            raise
+
+        with self._lock:
+            entrada = self._entradas.get(path)
+            if entrada is not None and entrada.mtime_ns == stat.st_mtime_ns and entrada.size == stat.st_size:
+                entrada.validado = time.monotonic()
+                self._entradas.move_to_end(path)
+                self.hits += 1
+                return entrada
+            self.misses += 1
+
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if stat.st_size > self.max_arquivo_bytes:
+            # Grande demais para a memória: servido do disco, com ETag pelos metadados
+            etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+            return _Entrada(path, None, etag, stat.st_size, stat.st_mtime_ns, media_type)
+
+        with open(path, 'rb') as f:
+            dados = f.read()
+        etag = f'"{hashlib.md5(dados).hexdigest()}"'
+        entrada = _Entrada(path, dados, etag, len(dados), stat.st_mtime_ns, media_type)
+
+        with self._lock:
+            antiga = self._entradas.pop(path, None)
+            if antiga is not None:
+                self._bytes -= antiga.size
+            self._entradas[path] = entrada
+            self._bytes += entrada.size
+            while self._bytes > self.max_bytes and self._entradas:
+                _, descartada = self._entradas.popitem(last=False)
+                self._bytes -= descartada.size
+        return entrada
+
+    def invalidar(self, path):
+        """Remove um arquivo da memória (ex: após ser regenerado)"""
+        with self._lock:
+            entrada = self._entradas.pop(path, None)
+            if entrada is not None:
+                self._bytes -= entrada.size
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "arquivos": len(self._entradas),
+                "size_mb": round(self._bytes / (1024 * 1024), 2),
+                "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+def _intervalo(range_header, size):
+    """Interpreta um cabeçalho Range com um único intervalo ("bytes=inicio-fim")"""
+    unidade, _, intervalo = range_header.partition("=")
+    if unidade.strip() != "bytes" or "," in intervalo:
+        return None
+    inicio, _, fim = intervalo.strip().partition("-")
+    if inicio == "":
+        # Sufixo: últimos N bytes
+        if not fim.isdigit() or int(fim) == 0:
+            return None
+        return max(0, size - int(fim)), size - 1
+    if not inicio.isdigit() or (fim and not fim.isdigit()):
+        return None
+    inicio = int(inicio)
+    fim = min(int(fim), size - 1) if fim else size - 1
+    if inicio > fim:
+        return None
+    return inicio, fim
+
+
+def resposta_audio(entrada, request, cache_control):
+    """Monta a resposta HTTP para a entrada: 304, 206 (Range) ou 200"""
+    headers = {
+        "ETag": entrada.etag,
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes"
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and entrada.etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    if entrada.dados is None:
+        return FileResponse(entrada.path, media_type=entrada.media_type, headers=headers)
+
+    range_header = request.headers.get("range")
+    if range_header:
+        intervalo = _intervalo(range_header, entrada.size)
+        if intervalo is None:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{entrada.size}"})
+        inicio, fim = intervalo
+        headers["Content-Range"] = f"bytes {inicio}-{fim}/{entrada.size}"
+        return Response(entrada.dados[inicio:fim + 1], status_code=206,
+                        media_type=entrada.media_type, headers=headers)
+
+    return Response(entrada.dados, media_type=entrada.media_type, headers=headers)
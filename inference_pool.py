@@ -0,0 +1,388 @@
+import multiprocessing
+import os
+import queue
+import secrets
+import threading
+import time
+import uuid
+from multiprocessing.managers import BaseManager
+
+from structured_log import obter_logger
+
+log = obter_logger("pool")
+
+
+# Variáveis de ambiente com que o servidor HTTP encontra o pool de inferência
+ENV_ENDERECO = "TTS_POOL_ENDERECO"
+ENV_CHAVE = "TTS_POOL_CHAVE"
+ENV_PROCESSOS = "TTS_POOL_PROCESSOS"
+
+
+def dividir_cpus(processos):
+    """Divide os núcleos disponíveis em grupos contíguos, um por processo
+
+    Retorna None para cada processo quando não há núcleos suficientes (ou o
+    sistema não permite fixar a afinidade).
+    """
+    if not hasattr(os, "sched_getaffinity"):
+        return [None] * processos
+    cpus = sorted(os.sched_getaffinity(0))
+    if len(cpus) < processos:
+        return [None] * processos
+    tamanho = len(cpus) // processos
+    return [cpus[i * tamanho:(i + 1) * tamanho] for i in range(processos)]
+
+
+def _processo_inferencia(indice, cpus, torch_threads, pedidos, respostas):
+    """Processo com uma cópia do modelo: executa os pedidos da fila, um de cada vez"""
+    # Threads e afinidade definidos antes de importar o torch
+    os.environ.pop(ENV_ENDERECO, None)
+    os.environ["TTS_TORCH_THREADS"] = str(torch_threads)
+    os.environ["OMP_NUM_THREADS"] = str(torch_threads)
+    os.environ["MKL_NUM_THREADS"] = str(torch_threads)
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+
+    try:
+        import main
+        main.carregar_modelo()
+        if main.TTS_WARMUP:
+            main.aquecer_modelo()
+        respostas.put(("pronto", indice, {
+            "sample_rate": main.backend.sample_rate,
+            "speakers": main.available_speakers,
+            "memoria_bytes": main.backend.memoria_bytes
+        }))
+    except Exception as e:
+        respostas.put(("falhou", indice, str(e)))
+        return
+
+    while True:
+        pedido = pedidos.get()
+        if pedido is None:
+            break
+        pedido_id, tipo, kwargs = pedido
+        respostas.put(("iniciado", pedido_id, indice))
+        try:
+            if tipo == "stream":
+                main.sintetizar_stream(emitir=lambda audio: respostas.put(("trecho", pedido_id, audio)), **kwargs)
+            elif tipo == "latentes":
+                main.obter_latentes(**kwargs)
+            else:
+                main.sintetizar_arquivo(**kwargs)
+            respostas.put(("ok", pedido_id, None))
+        except Exception as e:
+            respostas.put(("erro", pedido_id, str(e)))
+
+
+class _Pedido:
+    __slots__ = ("id", "tipo", "chave", "kwargs", "concluido", "trechos", "erro", "processo")
+
+    def __init__(self, tipo, chave, kwargs):
+        self.id = uuid.uuid4().hex
+        self.tipo = tipo
+        self.chave = chave
+        self.kwargs = kwargs
+        self.concluido = threading.Event()
+        self.trechos = queue.Queue()
+        self.erro = None
+        self.processo = None
+
+
+class Despachante:
+    """Pool de processos de inferência, cada um com sua cópia do modelo.
+
+    Cada processo fica fixado em um grupo de núcleos com um número controlado
+    de threads do torch e consome uma fila compartilhada de pedidos. Pedidos
+    com a mesma chave (o arquivo de saída) em andamento são agrupados, mesmo
+    vindos de servidores HTTP diferentes. Um processo que morre é reiniciado
+    e o pedido que ele executava falha.
+    """
+
+    def __init__(self, processos, torch_threads=None):
+        self._ctx = multiprocessing.get_context("spawn")
+        self._pedidos = self._ctx.Queue()
+        self._respostas = self._ctx.Queue()
+        self._lock = threading.Lock()
+        self._pendentes = {}  # id -> _Pedido
+        self._em_andamento = {}  # chave -> _Pedido
+        self._executando = {}  # índice do processo -> _Pedido
+        self._streams = {}  # id -> _Pedido, até o cliente ler o último trecho
+        self._concluidos = 0
+        self._coalescidos = 0
+        self._parando = False
+
+        cpus_cpu = os.cpu_count() or 1
+        self._processos = []
+        for indice, cpus in enumerate(dividir_cpus(processos)):
+            threads = torch_threads or (len(cpus) if cpus else max(1, cpus_cpu // processos))
+            self._processos.append({
+                "cpus": cpus,
+                "threads": threads,
+                "status": "carregando",
+                "erro": None,
+                "processo": None,
+                "reinicios": 0,
+                "memoria_bytes": None
+            })
+            self._iniciar_processo(indice)
+
+        self.sample_rate = None
+        self.speakers = []
+        threading.Thread(target=self._receber, name="pool-respostas", daemon=True).start()
+
+    def _iniciar_processo(self, indice):
+        info = self._processos[indice]
+        processo = self._ctx.Process(
+            target=_processo_inferencia,
+            args=(indice, info["cpus"], info["threads"], self._pedidos, self._respostas),
+            name=f"inferencia-{indice}",
+            daemon=True
+        )
+        processo.start()
+        info["processo"] = processo
+        info["status"] = "carregando"
+        log.info("Processo de inferência iniciado", processo=indice, pid=processo.pid,
+                 cpus=info["cpus"] or "todas", threads=info["threads"])
+
+    def _receber(self):
+        ultima_verificacao = time.monotonic()
+        while True:
+            if time.monotonic() - ultima_verificacao >= 1.0:
+                self._verificar_processos()
+                ultima_verificacao = time.monotonic()
+            try:
+                tipo, alvo, dados = self._respostas.get(timeout=1.0)
+            except queue.Empty:
+                continue
+
+            if tipo == "pronto":
+                self.sample_rate = dados["sample_rate"]
+                self.speakers = dados["speakers"]
+                self._processos[alvo]["status"] = "pronto"
+                self._processos[alvo]["memoria_bytes"] = dados.get("memoria_bytes")
+                log.info("Processo de inferência pronto", processo=alvo)
+                continue
+            if tipo == "falhou":
+                self._processos[alvo]["status"] = "erro"
+                self._processos[alvo]["erro"] = dados
+                log.error("Processo de inferência falhou ao carregar o modelo", processo=alvo, erro=dados)
+                continue
+
+            with self._lock:
+                pedido = self._pendentes.get(alvo)
+            if pedido is None:
+                continue
+            if tipo == "iniciado":
+                pedido.processo = dados
+                with self._lock:
+                    self._executando[dados] = pedido
+            elif tipo == "trecho":
+                pedido.trechos.put(dados)
+            else:
+                self._finalizar(pedido, dados if tipo == "erro" else None)
+
+    def _verificar_processos(self):
+        # Reinicia processos que morreram (ex: falta de memória) e falha o pedido em execução
+        if self._parando:
+            return
+        for indice, info in enumerate(self._processos):
+            if info["status"] == "erro" or info["processo"].is_alive():
+                continue
+            log.error("Processo de inferência encerrou inesperadamente", processo=indice,
+                      codigo=info["processo"].exitcode)
+            with self._lock:
+                pedido = self._executando.get(indice)
+            if pedido is not None:
+                self._finalizar(pedido, "O processo de inferência encerrou durante a síntese")
+            info["reinicios"] += 1
+            self._iniciar_processo(indice)
+
+    def _finalizar(self, pedido, erro):
+        with self._lock:
+            self._pendentes.pop(pedido.id, None)
+            if pedido.processo is not None and self._executando.get(pedido.processo) is pedido:
+                del self._executando[pedido.processo]
+            if pedido.chave and self._em_andamento.get(pedido.chave) is pedido:
+                del self._em_andamento[pedido.chave]
+            self._concluidos += 1
+        pedido.erro = erro
+        pedido.concluido.set()
+
+    def _enviar(self, tipo, chave, kwargs):
+        with self._lock:
+            if chave:
+                pedido = self._em_andamento.get(chave)
+                if pedido is not None:
+                    self._coalescidos += 1
+                    return pedido
+            pedido = _Pedido(tipo, chave, kwargs)
+            self._pendentes[pedido.id] = pedido
+            if chave:
+                self._em_andamento[chave] = pedido
+        self._pedidos.put((pedido.id, tipo, kwargs))
+        return pedido
+
+    def executar(self, tipo, chave, kwargs):
+        """Executa um pedido ("arquivo" ou "latentes") e aguarda a conclusão"""
+        pedido = self._enviar(tipo, chave, kwargs)
+        pedido.concluido.wait()
+        if pedido.erro:
+            raise RuntimeError(pedido.erro)
+
+    def iniciar_stream(self, kwargs):
+        """Inicia uma síntese em streaming e retorna o id para buscar os trechos"""
+        pedido = self._enviar("stream", None, kwargs)
+        with self._lock:
+            self._streams[pedido.id] = pedido
+        return pedido.id
+
+    def proximos_trechos(self, pedido_id, timeout=0.1):
+        """Retorna (trechos disponíveis, terminou) de uma síntese em streaming"""
+        with self._lock:
+            pedido = self._streams.get(pedido_id)
+        if pedido is None:
+            return [], True
+        trechos = []
+        try:
+            trechos.append(pedido.trechos.get(timeout=timeout))
+            while True:
+                trechos.append(pedido.trechos.get_nowait())
+        except queue.Empty:
+            pass
+        terminou = pedido.concluido.is_set() and pedido.trechos.empty()
+        if terminou:
+            with self._lock:
+                self._streams.pop(pedido_id, None)
+        if terminou and pedido.erro:
+            raise RuntimeError(pedido.erro)
+        return trechos, terminou
+
+    def info(self):
+        """Estado dos processos e da fila do pool"""
+        status = [p["status"] for p in self._processos]
+        if "carregando" in status:
+            geral = "carregando"
+        elif "pronto" in status:
+            geral = "pronto"
+        else:
+            geral = "erro"
+        with self._lock:
+            pendentes = len(self._pendentes)
+            executando = len(self._executando)
+        return {
+            "status": geral,
+            "sample_rate": self.sample_rate,
+            "speakers": self.speakers,
+            "processos": [
+                {"status": p["status"], "pid": p["processo"].pid, "cpus": p["cpus"], "threads": p["threads"],
+                 "reinicios": p["reinicios"], "erro": p["erro"], "memoria_bytes": p["memoria_bytes"]}
+                for p in self._processos
+            ],
+            "fila": pendentes - executando,
+            "executando": executando,
+            "concluidos": self._concluidos,
+            "coalescidos": self._coalescidos
+        }
+
+    def parar(self):
+        """Encerra os processos de inferência"""
+        self._parando = True
+        for _ in self._processos:
+            self._pedidos.put(None)
+        for info in self._processos:
+            info["processo"].join(timeout=5)
+            if info["processo"].is_alive():
+                info["processo"].terminate()
+
+
+class _ServidorManager(BaseManager):
+    pass
+
+
+class _ClienteManager(BaseManager):
+    pass
+
+
+def iniciar_pool(processos, torch_threads=None):
+    """Inicia o pool e o expõe aos servidores HTTP locais
+
+    Retorna (despachante, endereço, chave); o endereço e a chave são passados
+    aos workers do uvicorn pelas variáveis de ambiente do pool.
+    """
+    despachante = Despachante(processos, torch_threads)
+    chave = secrets.token_hex(16)
+
+    _ServidorManager.register("despachante", callable=lambda: despachante)
+    manager = _ServidorManager(address=("127.0.0.1", 0), authkey=chave.encode("ascii"))
+    servidor = manager.get_server()
+    threading.Thread(target=servidor.serve_forever, name="pool-servidor", daemon=True).start()
+
+    host, porta = servidor.address
+    return despachante, f"{host}:{porta}", chave
+
+
+class PoolCliente:
+    """Acesso do servidor HTTP ao pool de inferência (sem carregar o modelo)"""
+
+    def __init__(self, endereco, chave):
+        host, _, porta = endereco.rpartition(":")
+        _ClienteManager.register("despachante")
+        manager = _ClienteManager(address=(host, int(porta)), authkey=chave.encode("ascii"))
+        manager.connect()
+        self._despachante = manager.despachante()
+        self.sample_rate = None
+        self.speakers = []
+        self.memoria_bytes = None  # Soma dos pesos do modelo em todos os processos
+
+    def aguardar_pronto(self, intervalo_s=1.0):
+        """Aguarda os processos carregarem o modelo e retorna o estado do pool"""
+        while True:
+            info = self.info()
+            if info["status"] == "pronto":
+                self.sample_rate = info["sample_rate"]
+                self.speakers = info["speakers"]
+                self.memoria_bytes = sum(p["memoria_bytes"] or 0 for p in info["processos"])
+                return info
+            if info["status"] == "erro":
+                erros = "; ".join(p["erro"] for p in info["processos"] if p["erro"])
+                raise RuntimeError(f"Nenhum processo de inferência carregou o modelo: {erros}")
+            time.sleep(intervalo_s)
+
+    def info(self):
+        return self._despachante.info()
+
+    def sintetizar(self, texto, file_path, language, speed, speaker=None, reference_file=None, pos=None):
+        """Sintetiza em um dos processos, que grava o WAV em `file_path`"""
+        self._despachante.executar("arquivo", os.path.abspath(file_path), {
+            "texto": texto,
+            "file_path": file_path,
+            "language": language,
+            "speed": speed,
+            "speaker": speaker,
+            "reference_file": reference_file,
+            "pos": pos
+        })
+
+    def latentes(self, speaker=None, reference_file=None):
+        """Calcula os latentes do falante em um dos processos (ficam salvos em disco para os demais)"""
+        chave = f"latentes_{reference_file or speaker}"
+        self._despachante.executar("latentes", chave, {"speaker": speaker, "reference_file": reference_file})
+
+    def stream(self, emitir, texto, file_path, language, speed, speaker=None, reference_file=None, pos=None):
+        """Sintetiza em streaming em um dos processos, entregando os trechos a `emitir`"""
+        pedido_id = self._despachante.iniciar_stream({
+            "texto": texto,
+            "file_path": file_path,
+            "language": language,
+            "speed": speed,
+            "speaker": speaker,
+            "reference_file": reference_file,
+            "pos": pos
+        })
+        while True:
+            trechos, terminou = self._despachante.proximos_trechos(pedido_id)
+            for audio in trechos:
+                emitir(audio)
+            if terminou:
+                break
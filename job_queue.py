@@ -0,0 +1,301 @@
+import contextvars
+import itertools
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+# Prioridades da fila de inferências (menor valor executa primeiro)
+PRIORIDADE_NORMAL = 0
+PRIORIDADE_BAIXA = 10
+
+
+class _Tarefa:
+    __slots__ = ("chave", "funcao", "args", "kwargs", "future", "enfileirado", "contexto", "prioridade", "iniciada")
+
+    def __init__(self, chave, funcao, args, kwargs, future, prioridade):
+        self.chave = chave
+        self.funcao = funcao
+        self.args = args
+        self.kwargs = kwargs
+        self.future = future
+        self.enfileirado = time.time()
+        # Contexto de quem agendou (id da requisição nos logs da inferência)
+        self.contexto = contextvars.copy_context()
+        self.prioridade = prioridade
+        self.iniciada = False
+
+
+class InferenceScheduler:
+    """Agendador das inferências do modelo.
+
+    Limita o número de inferências simultâneas à capacidade real do modelo e
+    agrupa pedidos idênticos em andamento: quem pede a mesma chave enquanto ela
+    está na fila ou executando recebe o mesmo Future, sem nova inferência.
+
+    Tarefas de baixa prioridade (pré-geração) só começam quando não há pedidos
+    normais na fila. Um pedido normal que encontra a mesma chave aguardando em
+    baixa prioridade a promove, sem esperar atrás das demais pré-gerações.
+    """
+
+    def __init__(self, max_concorrentes=1):
+        self.max_concorrentes = max_concorrentes
+        self._fila = queue.PriorityQueue()
+        self._sequencia = itertools.count()
+        self._em_andamento = {}
+        self._lock = threading.Lock()
+        self._na_fila = {PRIORIDADE_NORMAL: 0, PRIORIDADE_BAIXA: 0}
+        self._executando = 0
+        self._concluidas = 0
+        self._coalescidas = 0
+        self._promovidas = 0
+        self._iniciadas_normais = 0
+        self._espera_total = 0.0
+        self._espera_maxima = 0.0
+
+        for i in range(max_concorrentes):
+            threading.Thread(target=self._worker, name=f"inferencia-{i}", daemon=True).start()
+
+    def submit(self, chave, funcao, *args, **kwargs):
+        """Agenda `funcao` para a chave e retorna um Future (compartilhado se já houver um em andamento)"""
+        return self._agendar(chave, funcao, args, kwargs, PRIORIDADE_NORMAL)
+
+    def submit_baixa_prioridade(self, chave, funcao, *args, **kwargs):
+        """Agenda `funcao` para quando não houver pedidos normais aguardando"""
+        return self._agendar(chave, funcao, args, kwargs, PRIORIDADE_BAIXA)
+
+    def executar(self, chave, funcao, *args, **kwargs):
+        """Agenda e aguarda o resultado"""
+        return self.submit(chave, funcao, *args, **kwargs).result()
+
+    def _agendar(self, chave, funcao, args, kwargs, prioridade):
+        with self._lock:
+            tarefa = self._em_andamento.get(chave)
+            if tarefa is not None:
+                self._coalescidas += 1
+                if prioridade < tarefa.prioridade and not tarefa.iniciada:
+                    # Reenfileirada na nova prioridade; a entrada antiga é ignorada pelo worker
+                    self._na_fila[tarefa.prioridade] -= 1
+                    self._na_fila[prioridade] += 1
+                    tarefa.prioridade = prioridade
+                    tarefa.enfileirado = time.time()
+                    self._promovidas += 1
+                    self._fila.put((prioridade, next(self._sequencia), tarefa))
+                return tarefa.future
+            tarefa = _Tarefa(chave, funcao, args, kwargs, Future(), prioridade)
+            self._em_andamento[chave] = tarefa
+            self._na_fila[prioridade] += 1
+            self._fila.put((prioridade, next(self._sequencia), tarefa))
+        return tarefa.future
+
+    def _worker(self):
+        while True:
+            prioridade, _, tarefa = self._fila.get()
+            with self._lock:
+                if tarefa.iniciada or tarefa.prioridade != prioridade:
+                    continue
+                tarefa.iniciada = True
+                self._na_fila[prioridade] -= 1
+                self._executando += 1
+                if prioridade == PRIORIDADE_NORMAL:
+                    espera = time.time() - tarefa.enfileirado
+                    self._iniciadas_normais += 1
+                    self._espera_total += espera
+                    self._espera_maxima = max(self._espera_maxima, espera)
+
+            resultado = None
+            erro = None
+            try:
+                resultado = tarefa.contexto.run(tarefa.funcao, *tarefa.args, **tarefa.kwargs)
+            except BaseException as e:
+                erro = e
+            finally:
+                with self._lock:
+                    self._executando -= 1
+                    self._concluidas += 1
+                    self._em_andamento.pop(tarefa.chave, None)
+
+            if erro is not None:
+                tarefa.future.set_exception(erro)
+            else:
+                tarefa.future.set_result(resultado)
+
+    def estatisticas(self):
+        """Profundidade da fila, inferências em execução e tempos de espera
+
+        `fila` e os tempos de espera contam apenas os pedidos normais; as
+        pré-gerações aguardando aparecem em `fila_baixa_prioridade`.
+        """
+        with self._lock:
+            return {
+                "fila": self._na_fila[PRIORIDADE_NORMAL],
+                "fila_baixa_prioridade": self._na_fila[PRIORIDADE_BAIXA],
+                "executando": self._executando,
+                "max_concorrentes": self.max_concorrentes,
+                "concluidas": self._concluidas,
+                "coalescidas": self._coalescidas,
+                "promovidas": self._promovidas,
+                "espera_media_s": round(self._espera_total / self._iniciadas_normais, 3) if self._iniciadas_normais else 0.0,
+                "espera_maxima_s": round(self._espera_maxima, 3)
+            }
+
+
+class FilaCheia(Exception):
+    """O executor já tem o máximo de pedidos pendentes"""
+
+
+class ExecutorLimitado:
+    """Executor com threads próprias e limite de pedidos pendentes.
+
+    Os pedidos que precisam do modelo aguardam aqui, fora do threadpool do
+    servidor, então não ocupam as threads usadas pelos acertos de cache e
+    pelos arquivos estáticos. Acima de `max_pendentes` (em execução + na
+    fila), `submit` lança FilaCheia em vez de enfileirar.
+    """
+
+    def __init__(self, max_workers, max_pendentes, nome="executor"):
+        self.max_workers = max_workers
+        self.max_pendentes = max_pendentes
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=nome)
+        self._lock = threading.Lock()
+        self._pendentes = 0
+        self._aceitos = 0
+        self._rejeitados = 0
+
+    def submit(self, funcao, *args, **kwargs):
+        """Agenda `funcao` no contexto de quem chamou e retorna um Future, ou lança FilaCheia"""
+        with self._lock:
+            if self._pendentes >= self.max_pendentes:
+                self._rejeitados += 1
+                raise FilaCheia(f"{self._pendentes} pedidos aguardando o modelo, tente novamente em instantes")
+            self._pendentes += 1
+            self._aceitos += 1
+        try:
+            future = self._executor.submit(contextvars.copy_context().run, funcao, *args, **kwargs)
+        except BaseException:
+            self._liberar(None)
+            raise
+        future.add_done_callback(self._liberar)
+        return future
+
+    def verificar_vagas(self, quantidade):
+        """Lança FilaCheia se não houver lugar para mais `quantidade` pedidos pendentes"""
+        with self._lock:
+            if self._pendentes + quantidade > self.max_pendentes:
+                self._rejeitados += 1
+                raise FilaCheia(f"{self._pendentes} pedidos aguardando o modelo, tente novamente em instantes")
+
+    def _liberar(self, _future):
+        with self._lock:
+            self._pendentes -= 1
+
+    def pendentes(self):
+        with self._lock:
+            return self._pendentes
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "pendentes": self._pendentes,
+                "max_pendentes": self.max_pendentes,
+                "workers": self.max_workers,
+                "aceitos": self._aceitos,
+                "rejeitados": self._rejeitados
+            }
+
+    def parar(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class Job:
+    """Pedido assíncrono de síntese acompanhado via GET /jobs/{id}"""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = "pendente"
+        self.criado = time.time()
+        self.iniciado = None
+        self.finalizado = None
+        self.resultado = None
+        self.erro = None
+
+    def to_dict(self):
+        agora = time.time()
+        return {
+            "id": self.id,
+            "status": self.status,
+            "criado": self.criado,
+            "espera_s": round((self.iniciado or agora) - self.criado, 3),
+            "duracao_s": round((self.finalizado or agora) - self.iniciado, 3) if self.iniciado else None,
+            "resultado": self.resultado,
+            "erro": self.erro
+        }
+
+
+class JobRegistry:
+    """Executa pedidos de síntese em segundo plano e guarda seu estado
+
+    Acima de `max_pendentes` jobs não finalizados (0 = sem limite), `criar`
+    lança FilaCheia em vez de aceitar o job.
+    """
+
+    def __init__(self, max_workers=4, max_historico=1000, max_pendentes=0):
+        self.max_historico = max_historico
+        self.max_pendentes = max_pendentes
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._pendentes = 0
+
+    def criar(self, funcao, *args, **kwargs):
+        """Cria um job que executa `funcao` em segundo plano, ou lança FilaCheia"""
+        job = Job()
+        with self._lock:
+            if self.max_pendentes and self._pendentes >= self.max_pendentes:
+                raise FilaCheia(f"{self._pendentes} jobs aguardando, tente novamente em instantes")
+            self._pendentes += 1
+            self._jobs[job.id] = job
+            self._descartar_antigos()
+        self._executor.submit(contextvars.copy_context().run, self._executar, job, funcao, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def pendentes(self):
+        """Quantidade de jobs ainda não finalizados"""
+        with self._lock:
+            return self._pendentes
+
+    def _executar(self, job, funcao, args, kwargs):
+        job.status = "executando"
+        job.iniciado = time.time()
+        try:
+            job.resultado = funcao(*args, **kwargs)
+            # processar_fala devolve erros no corpo da resposta em vez de lançar exceção
+            if isinstance(job.resultado, dict) and job.resultado.get("status") == "error":
+                job.erro = job.resultado.get("mensagem")
+                job.status = "erro"
+            else:
+                job.status = "concluido"
+        except Exception as e:
+            job.erro = str(e)
+            job.status = "erro"
+        finally:
+            job.finalizado = time.time()
+            with self._lock:
+                self._pendentes -= 1
+
+    def _descartar_antigos(self):
+        # Remove os jobs finalizados mais antigos além do limite do histórico
+        excedente = len(self._jobs) - self.max_historico
+        for job_id in list(self._jobs.keys()):
+            if excedente <= 0:
+                break
+            if self._jobs[job_id].status in ("concluido", "erro"):
+                del self._jobs[job_id]
+                excedente -= 1
@@ -1,26 +1,42 @@
+import time
+INICIO_PROCESSO = time.time()
+
 import torch
+import anyio
+import asyncio
 import os
 import numpy as np
 import hashlib
 import json
+import re
+import threading
+from contextlib import asynccontextmanager
+from functools import partial
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import FileResponse
-from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel, Field, validator, field_validator
-from typing import Optional
-from TTS.api import TTS as TTSObject
-from torch.serialization import add_safe_globals
-from TTS.tts.configs.xtts_config import XttsConfig
-from TTS.tts.models.xtts import XttsAudioConfig, XttsArgs
-from TTS.config.shared_configs import BaseDatasetConfig
-
-# Adicionar todas as classes conhecidas aos globais seguros
-add_safe_globals([
-    XttsConfig, 
-    XttsAudioConfig, 
-    BaseDatasetConfig,
-    XttsArgs
-])
+from fastapi.responses import FileResponse, StreamingResponse, JSONResponse, Response
+from pydantic import BaseModel, Field, validator, field_validator, model_validator
+from typing import Optional, List
+from phrase_bank import PhraseBank
+from audio_post import PosProcessamento
+from ticket_prefetch import TicketPrefetcher
+from audio_utils import (caminho_temporario, duracao_audio, gerar_chime, salvar_wav, juntar_arquivos, ler_wav, silencio, pcm16,
+                         cabecalho_wav_stream, reamostrar_polifasico, transcodificar, validar_bitrate, FORMATOS)
+from job_queue import ExecutorLimitado, FilaCheia, InferenceScheduler, JobRegistry
+from cache_store import CacheIndex
+from cache_eviction import CacheSweeper
+from cache_stats import CacheStats
+from cache_layout import chave_audio, caminho_shard, caminho_relativo, garantir_diretorio, listar_audios
+from reference_registry import ReferenceRegistry, ReferenciaInvalida, ReferenciaMuitoGrande, hash_arquivo
+from hot_audio import HotAudioCache, resposta_audio
+from inference_pool import PoolCliente, ENV_ENDERECO, ENV_CHAVE, ENV_PROCESSOS
+from cpu_accel import configurar_threads, MedidorRTF
+from tts_backends import criar_backend, ler_vozes_piper
+from structured_log import configurar_logs, obter_logger
+import metrics
+
+# Logs estruturados (TTS_LOG_NIVEL e TTS_LOG_FORMATO), com o id da requisição
+configurar_logs()
+log = obter_logger("api")
 
 # Modificar diretamente o comportamento do torch.load
 original_torch_load = torch.load
@@ -50,30 +66,144 @@ if not os.path.exists(SENHA_DIR):
 if not os.path.exists(GUICHE_DIR):
     os.makedirs(GUICHE_DIR)
 
-# JSON para registro de metadados do cache
+# Diretório para os latentes de condicionamento pré-calculados dos falantes
+LATENTS_DIR = os.path.join(CACHE_DIR, "latents")
+LATENTS_MAX_MEMORIA = 32  # Quantidade máxima de falantes mantidos em memória
+
+# Áudios de referência enviados uma vez por POST /referencias e usados pelo `reference_id`
+REFERENCIAS_DIR = os.path.join(CACHE_DIR, "referencias")
+REFERENCIA_MAX_MB = float(os.environ.get("TTS_REFERENCIA_MAX_MB", "20"))
+referencias = ReferenceRegistry(REFERENCIAS_DIR, max_bytes=int(REFERENCIA_MAX_MB * 1024 * 1024))
+
+# Banco de peças pré-renderizadas (palavras e números) e chamadas montadas a partir dele
+BANCO_DIR = os.path.join(CACHE_DIR, "banco")
+ANUNCIO_DIR = os.path.join(CACHE_DIR, "anuncio")
+
+# Aviso sonoro tocado antes das chamadas (gerado automaticamente se não existir)
+CHIME_FILE = os.path.join(CACHE_DIR, "chime.wav")
+
+# Extensões de todos os formatos de áudio gerados (WAV e versões codificadas)
+EXTENSOES_AUDIO = tuple(info["extensao"] for info in FORMATOS.values())
+
+# Pool de processos de inferência iniciado pelo run_server.py (--inference-workers)
+POOL_ENDERECO = os.environ.get(ENV_ENDERECO)
+POOL_CHAVE = os.environ.get(ENV_CHAVE, "")
+
+# Threads do torch neste processo, por operação e entre operações (0 = padrão do torch)
+TORCH_THREADS = int(os.environ.get("TTS_TORCH_THREADS", "0"))
+TORCH_INTEROP_THREADS = int(os.environ.get("TTS_TORCH_INTEROP_THREADS", "0"))
+
+# Modo acelerado de CPU: quantização int8 e, opcionalmente, torch.compile do decodificador
+CPU_ACELERADO = os.environ.get("TTS_CPU_ACELERADO", "0") == "1"
+TORCH_COMPILE = os.environ.get("TTS_TORCH_COMPILE", "0") == "1"
+
+# Inferências simultâneas suportadas pelo modelo carregado (1 por instância do XTTS)
+MAX_INFERENCIAS = int(os.environ.get("TTS_MAX_INFERENCIAS", os.environ.get(ENV_PROCESSOS, "1")))
+# Threads que processam os pedidos assíncronos de POST /jobs
+JOBS_WORKERS = int(os.environ.get("TTS_JOBS_WORKERS", "4"))
+# Jobs não finalizados a partir dos quais POST /jobs recebe 429
+JOBS_MAX_PENDENTES = int(os.environ.get("TTS_JOBS_MAX_PENDENTES", "256"))
+
+# Próximas senhas de cada sequência pré-geradas com o modelo ocioso (0 = desativado)
+SENHA_ANTECIPAR = int(os.environ.get("TTS_SENHA_ANTECIPAR", "3"))
+
+# Pedidos que precisam do modelo aguardam em threads próprias, fora do threadpool do servidor;
+# acima de TTS_SINTESE_FILA_MAX pendentes, novos pedidos recebem 429
+SINTESE_WORKERS = int(os.environ.get("TTS_SINTESE_WORKERS", "32"))
+SINTESE_FILA_MAX = int(os.environ.get("TTS_SINTESE_FILA_MAX", "64"))
+# Threads para os acertos de cache e a leitura/gravação de arquivos das rotas assíncronas
+IO_THREADS = int(os.environ.get("TTS_IO_THREADS", "16"))
+
+# Cache em memória dos áudios mais acessados
+HOT_AUDIO_MAX_MB = float(os.environ.get("TTS_HOT_AUDIO_MAX_MB", "64"))
+HOT_AUDIO_REVALIDAR_S = float(os.environ.get("TTS_HOT_AUDIO_REVALIDAR_S", "5"))
+AUDIO_CACHE_CONTROL = f"public, max-age={int(os.environ.get('TTS_AUDIO_MAX_AGE_S', '3600'))}"
+
+# Pós-processamento padrão dos áudios gerados, aplicado antes de gravar no cache
+# (cada pedido pode mudar as opções em `pos`)
+POS_APARAR = os.environ.get("TTS_POS_APARAR", "0") == "1"
+POS_NORMALIZAR = os.environ.get("TTS_POS_NORMALIZAR", "0") == "1"
+POS_LOUDNESS_DB = float(os.environ.get("TTS_POS_LOUDNESS_DB", "-20"))
+POS_SAMPLE_RATE = int(os.environ.get("TTS_POS_SAMPLE_RATE", "0"))  # 0 = taxa do modelo
+POS_FADE_MS = float(os.environ.get("TTS_POS_FADE_MS", "0"))
+
+# Pausa inserida entre frases no streaming
+PAUSA_ENTRE_FRASES_MS = 300
+
+# Índice de metadados do cache (SQLite); os acessos são gravados em lote
+CACHE_INDEX_DB = os.path.join(CACHE_DIR, "cache_index.db")
+CACHE_INDEX_FLUSH_S = float(os.environ.get("TTS_INDICE_FLUSH_S", "5"))
+cache_index = CacheIndex(CACHE_INDEX_DB, CACHE_INDEX_FLUSH_S)
+
+# Índice antigo em JSON, importado uma única vez para o SQLite
 CACHE_INDEX_FILE = os.path.join(CACHE_DIR, "cache_index.json")
-if os.path.exists(CACHE_INDEX_FILE):
-    try:
-        with open(CACHE_INDEX_FILE, 'r', encoding='utf-8') as f:
-            cache_index = json.load(f)
-    except:
-        cache_index = {}
-else:
-    cache_index = {}
-
-def save_cache_index():
-    """Salva o índice de cache no arquivo JSON"""
-    with open(CACHE_INDEX_FILE, 'w', encoding='utf-8') as f:
-        json.dump(cache_index, f, ensure_ascii=False, indent=2)
+cache_index.importar_json(CACHE_INDEX_FILE)
+
+# Descarte automático do cache (0 = desativado)
+CACHE_MAX_MB = float(os.environ.get("TTS_CACHE_MAX_MB", "0"))
+CACHE_TTL_HORAS = float(os.environ.get("TTS_CACHE_TTL_HORAS", "0"))
+CACHE_POLITICA = os.environ.get("TTS_CACHE_POLITICA", "lru")  # "lru" ou "lfu"
+CACHE_SWEEP_S = float(os.environ.get("TTS_CACHE_SWEEP_S", "300"))
+CACHE_PIN_HITS = int(os.environ.get("TTS_CACHE_PIN_HITS", "10"))  # Senhas/guichês com mais acessos nunca são descartados
+
+def esquecer_descartado(file_path):
+    """Remove da memória um arquivo descartado pela varredura do cache"""
+    hot_audio.invalidar(os.path.normpath(file_path))
+    # Uma senha descartada volta a ser pré-gerada quando a sequência for chamada
+    senha_prefetch.esquecer(file_path)
+
+cache_sweeper = CacheSweeper(
+    cache_index,
+    {"texto": CACHE_DIR, "senha": SENHA_DIR, "guiche": GUICHE_DIR, "anuncio": ANUNCIO_DIR},
+    max_bytes=int(CACHE_MAX_MB * 1024 * 1024),
+    ttl_s=CACHE_TTL_HORAS * 3600,
+    politica=CACHE_POLITICA,
+    intervalo_s=CACHE_SWEEP_S,
+    pin_hits=CACHE_PIN_HITS,
+    extensoes=EXTENSOES_AUDIO,
+    ao_descartar=esquecer_descartado,
+    excluir=(CHIME_FILE,)
+)
+
+# Estatísticas de GET /cache mantidas pelo índice e reconciliadas com o disco em segundo plano
+CACHE_STATS_S = float(os.environ.get("TTS_CACHE_STATS_S", "600"))
+
+cache_stats = CacheStats(
+    cache_index,
+    {"texto": CACHE_DIR, "senha": SENHA_DIR, "guiche": GUICHE_DIR, "anuncio": ANUNCIO_DIR},
+    intervalo_s=CACHE_STATS_S,
+    extensoes=EXTENSOES_AUDIO
+)
+
+# Áudios na raiz dos diretórios são do layout antigo; a migração move todos (os que não podem ser migrados vão para nao_migrados)
+if any(item.path != CHIME_FILE
+       for diretorio in (CACHE_DIR, SENHA_DIR, GUICHE_DIR)
+       for item in listar_audios(diretorio, (".wav",), shards=False)):
+    log.warning("Cache no layout antigo encontrado; migre com: python cache_migrate.py")
 
 # Get device
 device = "cuda" if torch.cuda.is_available() else "cpu"
 
-# List available 🐸TTS models
-print(TTSObject().list_models())
+configurar_threads(TORCH_THREADS, TORCH_INTEROP_THREADS)
 
-# Init TTS
-tts = TTSObject("tts_models/multilingual/multi-dataset/xtts_v2").to(device)
+MODEL_NAME = "tts_models/multilingual/multi-dataset/xtts_v2"
+
+# Motor de síntese: "xtts" (modelo real), "stub" (sem modelo, para testes e benchmarks) ou "piper"
+TTS_ENGINE = os.environ.get("TTS_ENGINE", "xtts")
+TTS_STUB_RTF = float(os.environ.get("TTS_STUB_RTF", "0.05"))
+TTS_PIPER_VOZES = ler_vozes_piper(os.environ.get("TTS_PIPER_VOZES"))
+
+# Versão do modelo na chave de cache; altere para descartar os áudios de um modelo anterior
+TTS_MODELO_VERSAO = os.environ.get("TTS_MODELO_VERSAO", "")
+
+# Motor leve de reserva para textos novos quando a fila de inferências está cheia ("" = desativado)
+TTS_FALLBACK_ENGINE = os.environ.get("TTS_FALLBACK_ENGINE", "")
+TTS_FALLBACK_FILA = int(os.environ.get("TTS_FALLBACK_FILA", "4"))  # Pedidos aguardando para usar a reserva
+
+# Síntese de aquecimento logo após carregar o modelo
+TTS_WARMUP = os.environ.get("TTS_WARMUP", "1") == "1"
+# Arquivo JSON com uma lista de pedidos de /falar a gerar antes de ficar pronto
+TTS_FRASES_PRECARREGAR = os.environ.get("TTS_FRASES_PRECARREGAR")
 
 # Falantes padrão por idioma - definir falantes que soam bem para cada idioma
 DEFAULT_SPEAKERS = {
@@ -86,24 +216,473 @@ DEFAULT_SPEAKERS = {
     "default": "Nova Hogarth"  # Falante padrão para outras línguas
 }
 
-# Obter a lista de falantes disponíveis no modelo
-try:
-    available_speakers = list(tts.synthesizer.tts_model.speaker_manager.speakers.keys())
-    print(f"Falantes disponíveis: {available_speakers}")
-except Exception as e:
-    print(f"Não foi possível obter a lista de falantes: {str(e)}")
-    available_speakers = []
+class ModeloIndisponivel(Exception):
+    """O modelo ainda não foi carregado (ou falhou ao carregar)"""
+
+# O modelo é carregado em segundo plano, depois que o servidor já aceita conexões
+backend = None
+backend_reserva = None
+available_speakers = []
+pool = None  # Cliente do pool quando o modelo roda em processos separados
+servidor_pronto = threading.Event()
+estado_modelo = {"status": "carregando", "erro": None, "modelo_s": None, "pronto_s": None,
+                 "engine": TTS_ENGINE, "reserva": None, "aceleracao": None}
+
+# Fator de tempo real das sínteses (tempo de síntese / duração do áudio)
+medidor_rtf = MedidorRTF()
+
+def versao_modelo(engine):
+    """Identificação do modelo que gera os áudios de um motor, usada na chave de cache
+    
+    Não depende do modelo carregado, para que os áudios em cache sejam
+    encontrados antes de o modelo terminar de carregar.
+    """
+    if engine == "xtts":
+        versao = MODEL_NAME
+    elif engine == "piper":
+        versao = "piper:" + ",".join(f"{language}={os.path.basename(caminho)}"
+                                     for language, caminho in sorted(TTS_PIPER_VOZES.items()))
+    else:
+        versao = engine
+    return f"{versao}@{TTS_MODELO_VERSAO}" if TTS_MODELO_VERSAO else versao
+
+def novo_backend(engine):
+    """Cria um motor de síntese com as opções configuradas"""
+    return criar_backend(
+        engine,
+        model_name=MODEL_NAME,
+        device=device,
+        latents_dir=LATENTS_DIR,
+        latents_max=LATENTS_MAX_MEMORIA,
+        acelerar=CPU_ACELERADO,
+        compilar=TORCH_COMPILE,
+        stub_rtf=TTS_STUB_RTF,
+        piper_vozes=TTS_PIPER_VOZES
+    )
+
+def carregar_modelo():
+    """Carrega o motor de síntese configurado (XTTS v2 por padrão)"""
+    global backend, available_speakers
+    inicio = time.time()
+    
+    motor = novo_backend(TTS_ENGINE)
+    motor.carregar()
+    
+    if motor.aceleracao:
+        estado_modelo["aceleracao"] = motor.aceleracao
+        medidor_rtf.modo = motor.aceleracao["modo"]
+    
+    # Obter a lista de falantes disponíveis no modelo
+    available_speakers = motor.falantes()
+    log.info("Falantes disponíveis", falantes=available_speakers)
+    backend = motor
+    
+    estado_modelo["modelo_s"] = round(time.time() - inicio, 2)
+    log.info("Modelo carregado", modelo=MODEL_NAME, engine=TTS_ENGINE, duracao_s=estado_modelo["modelo_s"],
+             memoria_bytes=motor.memoria_bytes)
+
+def carregar_reserva():
+    """Carrega o motor leve de reserva; se falhar, a API segue apenas com o principal"""
+    global backend_reserva
+    try:
+        motor = novo_backend(TTS_FALLBACK_ENGINE)
+        motor.carregar()
+        backend_reserva = motor
+        estado_modelo["reserva"] = motor.nome
+        log.info("Motor de reserva carregado", engine=motor.nome)
+    except Exception as e:
+        log.error("Não foi possível carregar o motor de reserva", engine=TTS_FALLBACK_ENGINE, erro=str(e))
+
+def conectar_pool():
+    """Conecta ao pool de processos de inferência e aguarda o modelo carregar neles"""
+    global pool, available_speakers
+    inicio = time.time()
+    cliente = PoolCliente(POOL_ENDERECO, POOL_CHAVE)
+    info = cliente.aguardar_pronto()
+    available_speakers = cliente.speakers
+    pool = cliente
+    
+    estado_modelo["modelo_s"] = round(time.time() - inicio, 2)
+    prontos = sum(1 for p in info["processos"] if p["status"] == "pronto")
+    log.info("Pool de inferência pronto", prontos=prontos, processos=len(info["processos"]),
+             duracao_s=estado_modelo["modelo_s"])
+
+def taxa_amostragem():
+    """Taxa de amostragem do áudio gerado pelo modelo"""
+    if pool is not None:
+        return pool.sample_rate
+    return obter_backend().sample_rate
+
+def obter_backend():
+    """Retorna o motor de síntese carregado ou lança ModeloIndisponivel"""
+    if backend is None:
+        raise ModeloIndisponivel(f"Modelo {estado_modelo['status']}, tente novamente em instantes")
+    return backend
+
+def obter_latentes(speaker=None, reference_file=None):
+    """Prepara o condicionamento do falante ou arquivo de referência (latentes do XTTS)
+    
+    Com o pool, os latentes são calculados em um dos processos de inferência
+    (e salvos em disco para os demais) e nada é retornado.
+    """
+    if pool is not None:
+        return pool.latentes(speaker=speaker, reference_file=reference_file)
+    return obter_backend().latentes(speaker=speaker, reference_file=reference_file)
+
+def registrar_rtf(segundos_sintese, segundos_audio):
+    """Registra o fator de tempo real de uma síntese (em /jobs e em /metrics)"""
+    medidor_rtf.registrar(segundos_sintese, segundos_audio)
+    if segundos_audio > 0:
+        metrics.RTF.observe(segundos_sintese / segundos_audio)
+
+def memoria_modelo():
+    """Memória ocupada pelos pesos do modelo (somando os processos do pool)"""
+    if pool is not None:
+        return pool.memoria_bytes
+    return backend.memoria_bytes if backend is not None else None
+
+def sintetizar_arquivo(texto, file_path, language, speed, speaker=None, reference_file=None, pos=None):
+    """Sintetiza o texto em um arquivo WAV usando os latentes em cache do falante
+    
+    Com `pos`, o áudio é tratado (silêncio, nível, taxa, fades) antes de ser gravado.
+    """
+    inicio = time.perf_counter()
+    garantir_diretorio(file_path)
+    if pool is not None:
+        # O processo de inferência grava o arquivo (a etapa inclui a gravação)
+        with metrics.etapa("inferencia"):
+            pool.sintetizar(texto, file_path, language, speed, speaker=speaker, reference_file=reference_file, pos=pos)
+        hot_audio.invalidar(os.path.normpath(file_path))
+        registrar_rtf(time.perf_counter() - inicio, duracao_audio(file_path))
+        return
+    
+    motor = obter_backend()
+    with metrics.etapa("inferencia"):
+        wav = motor.sintetizar(texto, language, speed, speaker=speaker, reference_file=reference_file)
+    registrar_rtf(time.perf_counter() - inicio, len(wav) / motor.sample_rate)
+    sample_rate = None  # Taxa do motor, salvo se o pós-processamento mudar o áudio
+    if pos is not None and pos.ativo():
+        with metrics.etapa("pos_processamento"):
+            wav, sample_rate = pos.aplicar(wav, motor.sample_rate)
+    # Escrita atômica: outros processos nunca leem um WAV incompleto
+    with metrics.etapa("gravacao"):
+        motor.salvar(wav, file_path, sample_rate)
+    hot_audio.invalidar(os.path.normpath(file_path))
+
+def sintetizar_reserva(texto, file_path, language, speed, pos=None):
+    """Sintetiza com o motor leve de reserva (sem passar pela fila do modelo principal)"""
+    inicio = time.perf_counter()
+    garantir_diretorio(file_path)
+    with metrics.etapa("inferencia_reserva"):
+        wav = backend_reserva.sintetizar(texto, language, speed)
+    log.info("Áudio gerado pelo motor de reserva", engine=backend_reserva.nome,
+             duracao_s=round(time.perf_counter() - inicio, 2))
+    sample_rate = None  # Taxa do motor, salvo se o pós-processamento mudar o áudio
+    if pos is not None and pos.ativo():
+        with metrics.etapa("pos_processamento"):
+            wav, sample_rate = pos.aplicar(wav, backend_reserva.sample_rate)
+    with metrics.etapa("gravacao"):
+        backend_reserva.salvar(wav, file_path, sample_rate)
+    hot_audio.invalidar(os.path.normpath(file_path))
+
+def usar_reserva():
+    """Indica se textos novos devem ir para o motor de reserva (fila do principal cheia)"""
+    return backend_reserva is not None and scheduler.estatisticas()["fila"] >= TTS_FALLBACK_FILA
+
+def dividir_frases(texto):
+    """Divide o texto em frases para síntese incremental"""
+    frases = re.split(r'(?<=[.!?;:])\s+', texto.strip())
+    return [frase for frase in frases if frase]
+
+def sintetizar_stream(texto, file_path, language, speed, emitir, speaker=None, reference_file=None, pos=None):
+    """Sintetiza frase a frase usando a inferência em streaming do motor
+    
+    Cada trecho de áudio é entregue a `emitir` assim que produzido; ao final,
+    o áudio completo é salvo em `file_path` (com o pós-processamento `pos`,
+    que precisa do áudio inteiro e não se aplica aos trechos enviados).
+    """
+    garantir_diretorio(file_path)
+    if pool is not None:
+        pool.stream(emitir, texto, file_path, language, speed, speaker=speaker, reference_file=reference_file, pos=pos)
+        hot_audio.invalidar(os.path.normpath(file_path))
+        return
+    
+    motor = obter_backend()
+    sample_rate = motor.sample_rate
+    
+    partes = []
+    for i, frase in enumerate(dividir_frases(texto)):
+        if i > 0:
+            pausa = silencio(PAUSA_ENTRE_FRASES_MS, sample_rate)
+            emitir(pausa)
+            partes.append(pausa)
+        
+        for audio in motor.stream(frase, language, speed, speaker=speaker, reference_file=reference_file):
+            emitir(audio)
+            partes.append(audio)
+    
+    audio = np.concatenate(partes)
+    if pos is not None and pos.ativo():
+        with metrics.etapa("pos_processamento"):
+            audio, sample_rate = pos.aplicar(audio, sample_rate)
+    salvar_wav(file_path, audio, sample_rate)
+    hot_audio.invalidar(os.path.normpath(file_path))
+
+# Fila de inferências: limita a concorrência e agrupa pedidos idênticos simultâneos
+scheduler = InferenceScheduler(MAX_INFERENCIAS)
+jobs = JobRegistry(JOBS_WORKERS, max_pendentes=JOBS_MAX_PENDENTES)
+sintese_executor = ExecutorLimitado(SINTESE_WORKERS, SINTESE_FILA_MAX, "sintese")
+limitador_io = anyio.CapacityLimiter(IO_THREADS)
+
+async def em_thread(funcao, *args, **kwargs):
+    """Executa uma operação curta de arquivo ou de cache fora do event loop
+    
+    Usa threads próprias, então os acertos de cache não disputam o threadpool
+    do servidor nem esperam atrás dos pedidos que aguardam o modelo.
+    """
+    return await anyio.to_thread.run_sync(partial(funcao, *args, **kwargs), limiter=limitador_io)
+
+def verificar_capacidade(quantidade=1):
+    """Antes de aceitar pedidos que precisam do modelo: ModeloIndisponivel (503) ou FilaCheia (429)"""
+    if pool is None:
+        obter_backend()
+    sintese_executor.verificar_vagas(quantidade)
+
+async def aguardar_sintese(funcao, *args, **kwargs):
+    """Executa um pedido que precisa do modelo no executor de síntese (FilaCheia se estiver lotado)"""
+    return await asyncio.wrap_future(sintese_executor.submit(funcao, *args, **kwargs))
+
+def sintetizar_agendado(chave, texto, file_path, language, speed, speaker=None, reference_file=None, pos=None):
+    """Sintetiza pela fila de inferências
+    
+    Pedidos simultâneos com a mesma chave aguardam a mesma inferência.
+    """
+    return scheduler.executar(
+        chave,
+        sintetizar_arquivo,
+        texto,
+        file_path,
+        language,
+        speed,
+        speaker=speaker,
+        reference_file=reference_file,
+        pos=pos
+    )
+
+def sintetizar_peca(texto, file_path, language, speed, speaker=None, chave=None):
+    """Sintetiza uma peça do banco de frases pela fila de inferências (agrupada pela `chave` da peça)"""
+    sintetizar_agendado(chave or file_path, texto, file_path, language, speed, speaker=speaker)
+
+# Banco de frases para montar chamadas de guichê sem chamar o modelo
+phrase_bank = PhraseBank(BANCO_DIR, ANUNCIO_DIR, sintetizar_peca)
+
+def gerar_senha(senha, file_path, language, speaker, speed, pos=None, force_refresh=False):
+    """Gera o áudio de uma senha e o registra no índice; executada pela fila de inferências
+    
+    Pedidos que aguardam a mesma senha (inclusive uma pré-geração) compartilham
+    esta tarefa, então a senha é registrada uma única vez. Sem `force_refresh`,
+    uma senha que já está em cache não é refeita. Retorna True se gerou o áudio.
+    """
+    if os.path.exists(file_path) and not force_refresh:
+        return False
+    log.info("Gerando áudio de senha", senha=senha)
+    sintetizar_arquivo(senha, file_path, language, speed, speaker=speaker, pos=pos)
+    cache_index.registrar(file_path, senha, language, speaker, speed, file_path, tipo="senha")
+    return True
+
+senha_prefetch = TicketPrefetcher(
+    scheduler,
+    lambda senha, language, speaker, speed, pos: caminho_componente(SENHA_DIR, senha, language, speaker, speed, pos),
+    gerar_senha,
+    antecipar=SENHA_ANTECIPAR
+)
+
+def obter_chime():
+    """Retorna o caminho do aviso sonoro, gerando-o na primeira vez"""
+    if not os.path.exists(CHIME_FILE):
+        sample_rate = taxa_amostragem()
+        salvar_wav(CHIME_FILE, gerar_chime(sample_rate), sample_rate)
+    return CHIME_FILE
+
+def juntar_anuncio(componentes, chime=False):
+    """Junta os arquivos dos componentes em um único anúncio
+    
+    O resultado é cacheado por combinação de componentes, então a junção
+    acontece no máximo uma vez para cada combinação.
+    """
+    arquivos = [obter_chime()] + list(componentes) if chime else list(componentes)
+    
+    # Chave composta a partir dos arquivos (caminho, tamanho e data de modificação)
+    partes_chave = []
+    for path in arquivos:
+        stat = os.stat(path)
+        partes_chave.append(f"{path}:{stat.st_size}:{stat.st_mtime_ns}")
+    chave = hashlib.md5("|".join(partes_chave).encode('utf-8')).hexdigest()
+    
+    output_path = caminho_shard(ANUNCIO_DIR, chave)
+    if not os.path.exists(output_path):
+        garantir_diretorio(output_path)
+        with metrics.etapa("juncao"):
+            juntar_arquivos(
+                componentes,
+                output_path,
+                prefixo=CHIME_FILE if chime else None
+            )
+    return output_path
+
+def codificar(wav_path, dados):
+    """Retorna o áudio no formato pedido; a versão codificada fica em cache ao lado do WAV"""
+    if dados.format == "wav":
+        return wav_path
+    with metrics.etapa("transcodificacao"):
+        return transcodificar(wav_path, dados.format, dados.bitrate)
+
+
+def aquecer_modelo():
+    """Faz uma síntese curta para que o primeiro pedido real não pague o custo de aquecimento"""
+    inicio = time.time()
+    for speaker in set(DEFAULT_SPEAKERS.values()):
+        obter_latentes(speaker=speaker)
+    
+    warmup_file = caminho_temporario(os.path.join(CACHE_DIR, "warmup.wav"))
+    sintetizar_arquivo("Olá.", warmup_file, "pt", 1.0, speaker=DEFAULT_SPEAKERS["pt"])
+    os.remove(warmup_file)
+    log.info("Aquecimento do modelo concluído", duracao_s=round(time.time() - inicio, 2))
+
+def precarregar_frases(json_path):
+    """Gera os pedidos de /falar listados no arquivo JSON que ainda não estão em cache"""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        pedidos = json.load(f)
+    
+    inicio = time.time()
+    for pedido in pedidos:
+        resultado = processar_fala(Texto(**pedido), "")
+        if resultado.get("status") != "ok":
+            log.warning("Não foi possível pré-carregar a frase", pedido=pedido, erro=resultado.get("mensagem"))
+    log.info("Frases pré-carregadas", frases=len(pedidos), duracao_s=round(time.time() - inicio, 2))
+
+def inicializar():
+    """Carrega o modelo, aquece e pré-carrega as frases configuradas (em segundo plano)"""
+    try:
+        if POOL_ENDERECO:
+            # O modelo roda (e é aquecido) nos processos de inferência
+            conectar_pool()
+        else:
+            carregar_modelo()
+            if TTS_WARMUP:
+                aquecer_modelo()
+        if TTS_FALLBACK_ENGINE:
+            carregar_reserva()
+        if TTS_FRASES_PRECARREGAR:
+            precarregar_frases(TTS_FRASES_PRECARREGAR)
+        estado_modelo["status"] = "pronto"
+        estado_modelo["pronto_s"] = round(time.time() - INICIO_PROCESSO, 2)
+        servidor_pronto.set()
+        log.info("Servidor pronto", desde_inicio_s=estado_modelo["pronto_s"])
+    except Exception as e:
+        estado_modelo["status"] = "erro"
+        estado_modelo["erro"] = str(e)
+        log.error("Erro ao carregar o modelo", erro=str(e))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # O servidor aceita conexões imediatamente; o modelo carrega em segundo plano
+    threading.Thread(target=inicializar, name="carregar-modelo", daemon=True).start()
+    cache_sweeper.iniciar()
+    cache_stats.iniciar()
+    log.info("Servidor aceitando conexões", desde_inicio_s=round(time.time() - INICIO_PROCESSO, 2))
+    yield
+    # Grava os acessos pendentes do índice de cache ao encerrar
+    cache_sweeper.parar()
+    cache_stats.parar()
+    sintese_executor.parar()
+    cache_index.fechar()
 
 app = FastAPI(
     title="TTS API",
     description="API para síntese de voz e chamada de guichê",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
-# Montar diretórios estáticos para servir os arquivos de áudio
-app.mount("/audio", StaticFiles(directory=CACHE_DIR), name="audio")
-app.mount("/senha", StaticFiles(directory=SENHA_DIR), name="senha")
-app.mount("/guiche", StaticFiles(directory=GUICHE_DIR), name="guiche")
+# Id de requisição (X-Request-ID) nos logs e duração das requisições em /metrics
+app.add_middleware(metrics.MiddlewareRequisicoes)
+metrics.monitorar(scheduler, jobs, memoria_modelo, sintese_executor)
+
+@app.exception_handler(ModeloIndisponivel)
+async def modelo_indisponivel_handler(request: Request, exc: ModeloIndisponivel):
+    metrics.registrar_rejeicao("modelo_indisponivel")
+    return JSONResponse(
+        status_code=503,
+        content={"status": "error", "mensagem": str(exc)},
+        headers={"Retry-After": "10"}
+    )
+
+@app.exception_handler(FilaCheia)
+async def fila_cheia_handler(request: Request, exc: FilaCheia):
+    metrics.registrar_rejeicao("fila_cheia")
+    # Tempo estimado até a fila andar: a espera média atual das inferências
+    espera = max(1, round(scheduler.estatisticas()["espera_media_s"]))
+    return JSONResponse(
+        status_code=429,
+        content={"status": "error", "mensagem": str(exc)},
+        headers={"Retry-After": str(espera)}
+    )
+
+# Áudios mais acessados servidos da memória, sem ler o disco a cada requisição
+hot_audio = HotAudioCache(
+    max_bytes=int(HOT_AUDIO_MAX_MB * 1024 * 1024),
+    revalidar_s=HOT_AUDIO_REVALIDAR_S
+)
+
+async def servir_audio(diretorio, filename, request: Request, format=None, bitrate=None):
+    """Serve um arquivo de áudio do cache com ETag, Cache-Control e suporte a Range
+    
+    Com `format`, um WAV é entregue codificado nesse formato (a versão
+    codificada é gerada fora do event loop e fica em cache).
+    """
+    file_path = os.path.normpath(os.path.join(diretorio, filename))
+    if (not file_path.startswith(os.path.normpath(diretorio) + os.sep)
+            or not file_path.endswith(EXTENSOES_AUDIO)):
+        raise HTTPException(status_code=404, detail="Arquivo de áudio não encontrado")
+    
+    if format and format != "wav" and file_path.endswith(".wav"):
+        if format not in FORMATOS:
+            raise HTTPException(status_code=400, detail=f'Formato inválido, use um destes: {", ".join(FORMATOS)}')
+        try:
+            validar_bitrate(format, bitrate)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        try:
+            file_path = await em_thread(transcodificar, file_path, format, bitrate)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Arquivo de áudio não encontrado")
+    
+    entrada = hot_audio.get(file_path)
+    if entrada is None:
+        try:
+            entrada = await em_thread(hot_audio.carregar, file_path)
+        except (FileNotFoundError, IsADirectoryError):
+            raise HTTPException(status_code=404, detail="Arquivo de áudio não encontrado")
+    
+    return resposta_audio(entrada, request, AUDIO_CACHE_CONTROL)
+
+# Rotas para servir os arquivos de áudio
+@app.get("/audio/{filename:path}")
+async def get_audio(filename: str, request: Request, format: Optional[str] = None, bitrate: Optional[int] = None):
+    return await servir_audio(CACHE_DIR, filename, request, format, bitrate)
+
+@app.get("/senha/{filename:path}")
+async def get_senha(filename: str, request: Request, format: Optional[str] = None, bitrate: Optional[int] = None):
+    return await servir_audio(SENHA_DIR, filename, request, format, bitrate)
+
+@app.get("/guiche/{filename:path}")
+async def get_guiche(filename: str, request: Request, format: Optional[str] = None, bitrate: Optional[int] = None):
+    return await servir_audio(GUICHE_DIR, filename, request, format, bitrate)
+
+@app.get("/anuncio/{filename:path}")
+async def get_anuncio(filename: str, request: Request, format: Optional[str] = None, bitrate: Optional[int] = None):
+    return await servir_audio(ANUNCIO_DIR, filename, request, format, bitrate)
 
 # Função para obter a URL base a partir da requisição
 def get_base_url(request: Request) -> str:
@@ -116,24 +695,40 @@ def get_base_url(request: Request) -> str:
 def file_path_to_url(file_path):
     if file_path.startswith(SENHA_DIR):
         # É um arquivo de senha
-        filename = os.path.basename(file_path)
-        return f"/senha/{filename}"
+        return f"/senha/{caminho_relativo(file_path, SENHA_DIR)}"
     elif file_path.startswith(GUICHE_DIR):
         # É um arquivo de guichê
-        filename = os.path.basename(file_path)
-        return f"/guiche/{filename}"
+        return f"/guiche/{caminho_relativo(file_path, GUICHE_DIR)}"
+    elif file_path.startswith(ANUNCIO_DIR):
+        # É uma chamada completa montada
+        return f"/anuncio/{caminho_relativo(file_path, ANUNCIO_DIR)}"
     elif file_path.startswith(CACHE_DIR):
         # É um arquivo de cache regular
-        filename = os.path.basename(file_path)
-        return f"/audio/{filename}"
+        return f"/audio/{caminho_relativo(file_path, CACHE_DIR)}"
     else:
         # Caminho desconhecido
         return file_path
 
+class PosProcessamentoPedido(BaseModel):
+    """Opções de pós-processamento de um pedido (omitidas = padrão do servidor)"""
+    aparar: Optional[bool] = None  # Remove o silêncio do início e do fim
+    normalizar: Optional[bool] = None  # Normaliza o nível do áudio
+    loudness_db: Optional[float] = Field(None, ge=-40.0, le=-6.0)  # Nível alvo em dBFS
+    sample_rate: Optional[int] = Field(None, ge=0, le=48000)  # Taxa de amostragem final (0 = do modelo)
+    fade_ms: Optional[float] = Field(None, ge=0, le=200)  # Fade-in e fade-out em milissegundos
+    
+    @field_validator('sample_rate')
+    @classmethod
+    def sample_rate_suportado(cls, v):
+        if v and v < 8000:
+            raise ValueError('sample_rate deve ser 0 ou estar entre 8000 e 48000')
+        return v
+
 class Texto(BaseModel):
     texto: Optional[str] = None
     language: str = "pt"  # Idioma padrão: português
     reference_file: Optional[str] = None  # Arquivo de referência opcional
+    reference_id: Optional[str] = None  # Id de um áudio de referência enviado a POST /referencias
     speaker: Optional[str] = None  # Nome do falante pré-definido
     speed: float = 1.0  # Velocidade da fala (0.5 = metade da velocidade, 2.0 = dobro da velocidade)
     force_refresh: bool = False  # Força a regeneração do áudio mesmo que exista no cache
@@ -141,6 +736,25 @@ class Texto(BaseModel):
     # Parâmetros específicos para chamada de guichê
     senha: Optional[str] = None  # Senha a ser chamada (ex: "Senha 4")
     guiche: Optional[str] = None  # Guichê a ser anunciado (ex: "Guichê 6")
+    phrase_bank: bool = False  # Monta a chamada a partir do banco de frases pré-renderizadas
+    anuncio_unico: bool = False  # Retorna senha e guichê juntos em um único arquivo
+    chime: bool = False  # Toca um aviso sonoro antes da chamada (anúncio único)
+    format: str = "wav"  # Formato do áudio retornado: "wav", "ogg", "opus" ou "mp3"
+    bitrate: Optional[int] = None  # Bitrate em kbps dos formatos codificados (padrão do formato se omitido)
+    pos: Optional[PosProcessamentoPedido] = None  # Pós-processamento do áudio (padrão do servidor se omitido)
+    
+    @field_validator('format')
+    @classmethod
+    def format_suportado(cls, v):
+        if v not in FORMATOS:
+            raise ValueError(f'Formato inválido, use um destes: {", ".join(FORMATOS)}')
+        return v
+    
+    @field_validator('bitrate')
+    @classmethod
+    def bitrate_suportado(cls, v, info):
+        validar_bitrate(info.data.get('format'), v)
+        return v
     
     @field_validator('texto')
     @classmethod
@@ -149,6 +763,17 @@ class Texto(BaseModel):
         if not v and not (info.data.get('senha') and info.data.get('guiche')):
             raise ValueError('Você deve fornecer "texto" OU ambos "senha" e "guiche"')
         return v
+    
+    @model_validator(mode='after')
+    def resolver_reference_id(self):
+        # O id registrado vira o caminho do arquivo; o resto da API só conhece `reference_file`
+        if self.reference_id:
+            if self.reference_file:
+                raise ValueError('Use "reference_file" OU "reference_id", não os dois')
+            self.reference_file = referencias.caminho(self.reference_id)
+            if self.reference_file is None:
+                raise ValueError(f'Áudio de referência não encontrado: {self.reference_id}')
+        return self
 
 @app.get("/")
 async def root():
@@ -156,202 +781,559 @@ async def root():
         "mensagem": "API de síntese de voz TTS",
         "documentacao": "/docs",
         "falantes": "/speakers",
-        "cache": "/cache"
+        "cache": "/cache",
+        "jobs": "/jobs",
+        "referencias": "/referencias",
+        "saude": "/healthz",
+        "prontidao": "/readyz",
+        "metricas": "/metrics"
     }
 
+@app.get("/healthz")
+async def healthz():
+    """Liveness: o processo está respondendo"""
+    return {"status": "ok", "uptime_s": round(time.time() - INICIO_PROCESSO, 2)}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: o modelo está carregado, aquecido e as frases configuradas pré-carregadas"""
+    status_code = 200 if servidor_pronto.is_set() else 503
+    return JSONResponse(status_code=status_code, content=estado_modelo)
+
+@app.get("/metrics")
+def get_metrics():
+    """Métricas no formato do Prometheus: cache, duração das etapas, RTF, fila e memória do modelo"""
+    conteudo, content_type = metrics.exportar()
+    return Response(content=conteudo, media_type=content_type)
+
 @app.get("/speakers")
 async def get_speakers():
     """Retorna a lista de falantes disponíveis no modelo."""
-    return {"speakers": available_speakers, "default_speakers": DEFAULT_SPEAKERS}
+    return {"speakers": available_speakers, "default_speakers": DEFAULT_SPEAKERS, "modelo": estado_modelo["status"]}
+
+@app.post("/referencias")
+async def registrar_referencia(request: Request):
+    """Registra um áudio de referência (voz clonada) enviado no corpo da requisição
+    
+    O corpo é o próprio arquivo (WAV, FLAC, OGG ou MP3), gravado em blocos
+    enquanto o hash é calculado. O `reference_id` retornado substitui
+    `reference_file` nos pedidos de síntese.
+    """
+    upload = await em_thread(referencias.novo_upload)
+    try:
+        async for bloco in request.stream():
+            if bloco:
+                await em_thread(upload.escrever, bloco)
+        referencia = await em_thread(upload.concluir)
+    except BaseException as e:
+        # Inclui a desconexão do cliente no meio do upload
+        upload.descartar()
+        if isinstance(e, ReferenciaMuitoGrande):
+            raise HTTPException(status_code=413, detail=str(e))
+        if isinstance(e, ReferenciaInvalida):
+            raise HTTPException(status_code=400, detail=str(e))
+        raise
+    return {"status": "ok", **referencia}
+
+@app.get("/referencias")
+def listar_referencias():
+    """Lista os áudios de referência registrados"""
+    return {"referencias": referencias.listar()}
 
-@app.get("/audio-file/{tipo}/{filename}")
-async def get_audio_file(tipo: str, filename: str):
+@app.delete("/referencias/{reference_id}")
+def remover_referencia(reference_id: str):
+    """Remove um áudio de referência registrado (os áudios já gerados com ele continuam no cache)"""
+    if not referencias.remover(reference_id):
+        raise HTTPException(status_code=404, detail="Áudio de referência não encontrado")
+    return {"status": "ok"}
+
+@app.get("/pool")
+def get_pool_info():
+    """Estado dos processos de inferência (quando o servidor usa o pool)"""
+    if pool is None:
+        return {"ativo": False, "fila": scheduler.estatisticas()}
+    return {"ativo": True, **pool.info(), "fila_servidor": scheduler.estatisticas()}
+
+@app.get("/audio-file/{tipo}/{filename:path}")
+async def get_audio_file(tipo: str, filename: str, request: Request,
+                         format: Optional[str] = None, bitrate: Optional[int] = None):
     """Serve um arquivo de áudio específico pelo nome do arquivo e tipo"""
     if tipo == "senha":
-        file_path = os.path.join(SENHA_DIR, filename)
+        diretorio = SENHA_DIR
     elif tipo == "guiche":
-        file_path = os.path.join(GUICHE_DIR, filename)
+        diretorio = GUICHE_DIR
     elif tipo == "texto":
-        file_path = os.path.join(CACHE_DIR, filename)
+        diretorio = CACHE_DIR
+    elif tipo == "anuncio":
+        diretorio = ANUNCIO_DIR
     else:
         raise HTTPException(status_code=400, detail="Tipo de áudio inválido")
     
-    if os.path.exists(file_path):
-        return FileResponse(file_path, media_type="audio/wav")
-    
-    # Se não encontrou o arquivo
-    raise HTTPException(status_code=404, detail="Arquivo de áudio não encontrado")
+    return await servir_audio(diretorio, filename, request, format, bitrate)
 
 @app.get("/cache")
 async def get_cache_info():
-    """Retorna informações sobre o cache de áudio"""
-    cache_size = 0
-    senha_size = 0
-    guiche_size = 0
-    cache_files = 0
-    senha_files = 0
-    guiche_files = 0
-    
-    # Verificar arquivos de texto regular
-    for file in os.listdir(CACHE_DIR):
-        if file.endswith(".wav"):
-            file_path = os.path.join(CACHE_DIR, file)
-            cache_size += os.path.getsize(file_path)
-            cache_files += 1
-    
-    # Verificar arquivos de senha
-    for file in os.listdir(SENHA_DIR):
-        if file.endswith(".wav"):
-            file_path = os.path.join(SENHA_DIR, file)
-            senha_size += os.path.getsize(file_path)
-            senha_files += 1
-    
-    # Verificar arquivos de guichê
-    for file in os.listdir(GUICHE_DIR):
-        if file.endswith(".wav"):
-            file_path = os.path.join(GUICHE_DIR, file)
-            guiche_size += os.path.getsize(file_path)
-            guiche_files += 1
-    
-    total_size = cache_size + senha_size + guiche_size
-    total_files = cache_files + senha_files + guiche_files
+    """Retorna informações sobre o cache de áudio
     
+    Os totais vêm do índice de cache, sem percorrer os diretórios; arquivos
+    fora do índice e a idade dos áudios são atualizados pela reconciliação
+    periódica (`reconciliacao.quando`).
+    """
     return {
-        "texto_entries": cache_files,
-        "texto_size_mb": round(cache_size / (1024 * 1024), 2),
-        "senha_entries": senha_files,
-        "senha_size_mb": round(senha_size / (1024 * 1024), 2),
-        "guiche_entries": guiche_files,
-        "guiche_size_mb": round(guiche_size / (1024 * 1024), 2),
-        "total_entries": total_files,
-        "total_size_mb": round(total_size / (1024 * 1024), 2)
+        **await em_thread(cache_stats.estatisticas),
+        "descarte": cache_sweeper.estatisticas(),
+        "memoria": hot_audio.estatisticas()
     }
 
+@app.post("/cache/sweep")
+def sweep_cache():
+    """Executa imediatamente uma varredura de descarte do cache"""
+    return {"status": "ok", "varredura": cache_sweeper.varrer(), "descarte": cache_sweeper.estatisticas()}
+
+@app.post("/cache/reconciliar")
+def reconciliar_cache():
+    """Confere imediatamente as estatísticas do cache com os arquivos em disco"""
+    return {"status": "ok", "reconciliacao": cache_stats.reconciliar()}
+
 @app.delete("/cache")
-async def clear_cache():
+def clear_cache():
     """Limpa o cache de áudio"""
-    # Limpar cache principal (textos)
-    for file in os.listdir(CACHE_DIR):
-        if file.endswith(".wav"):
-            os.remove(os.path.join(CACHE_DIR, file))
-    
-    # Limpar cache de senhas
-    for file in os.listdir(SENHA_DIR):
-        if file.endswith(".wav"):
-            os.remove(os.path.join(SENHA_DIR, file))
-    
-    # Limpar cache de guichês
-    for file in os.listdir(GUICHE_DIR):
-        if file.endswith(".wav"):
-            os.remove(os.path.join(GUICHE_DIR, file))
-    
-    # Resetar índice de cache
-    global cache_index
-    cache_index = {}
-    save_cache_index()
+    # Textos, senhas, guichês e chamadas montadas (o banco de frases é mantido)
+    for diretorio in (CACHE_DIR, SENHA_DIR, GUICHE_DIR, ANUNCIO_DIR):
+        for item in listar_audios(diretorio, EXTENSOES_AUDIO):
+            try:
+                os.remove(item.path)
+            except FileNotFoundError:
+                pass
+    
+    # Resetar índice de cache e os áudios em memória
+    cache_index.limpar()
+    hot_audio.limpar()
+    senha_prefetch.esquecer()
+    cache_stats.reconciliar()
     
     return {"status": "ok", "message": "Cache limpo com sucesso"}
 
-def generate_cache_key(texto, language, speaker, speed, reference_file=None):
-    """Gera uma chave única para o cache com base nos parâmetros"""
-    key_parts = [
-        texto,
-        language,
-        str(speaker) if speaker else "None",
-        str(speed)
-    ]
+def resolver_falante(dados: Texto):
+    """Retorna o falante pedido ou o falante padrão do idioma"""
+    if dados.speaker:
+        return dados.speaker
+    return DEFAULT_SPEAKERS.get(dados.language, DEFAULT_SPEAKERS["default"])
+
+def resolver_pos(dados: Texto):
+    """Pós-processamento do pedido: as opções informadas em `pos` sobre o padrão do servidor"""
+    pedido = dados.pos or PosProcessamentoPedido()
     
-    # Se estiver usando um arquivo de referência, incluir seu conteúdo hash
-    if reference_file:
-        try:
-            with open(reference_file, 'rb') as f:
-                reference_hash = hashlib.md5(f.read()).hexdigest()
-            key_parts.append(reference_hash)
-        except:
-            key_parts.append("reference_error")
+    def opcao(valor, padrao):
+        return padrao if valor is None else valor
+    
+    normalizar = opcao(pedido.normalizar, POS_NORMALIZAR or pedido.loudness_db is not None)
+    return PosProcessamento(
+        aparar=opcao(pedido.aparar, POS_APARAR),
+        loudness_db=opcao(pedido.loudness_db, POS_LOUDNESS_DB) if normalizar else None,
+        sample_rate=opcao(pedido.sample_rate, POS_SAMPLE_RATE),
+        fade_ms=opcao(pedido.fade_ms, POS_FADE_MS)
+    )
+
+def limitar_velocidade(speed):
+    """Mantém a velocidade da fala entre 0.5 e 3.0"""
+    return max(0.5, min(3.0, speed))
+
+def caminho_componente(diretorio, texto, language, speaker, speed, pos=None):
+    """Caminho do arquivo de um componente de chamada (senha ou guichê)
     
-    # Gerar hash MD5 para a chave
-    key_string = "_".join(key_parts)
-    return hashlib.md5(key_string.encode('utf-8')).hexdigest()
+    Usa a mesma chave dos textos, então a voz e a velocidade fazem parte do
+    caminho e um componente nunca é reutilizado com outro falante.
+    """
+    return caminho_shard(diretorio, generate_cache_key(texto, language, speaker, speed, pos=pos))
+
+def caminho_texto(dados: Texto):
+    """Retorna (chave de cache, caminho do arquivo) de um anúncio de texto"""
+    cache_key = generate_cache_key(
+        dados.texto,
+        dados.language,
+        resolver_falante(dados),
+        limitar_velocidade(dados.speed),
+        dados.reference_file,
+        pos=resolver_pos(dados)
+    )
+    return cache_key, caminho_shard(CACHE_DIR, cache_key)
+
+def esta_em_cache(dados: Texto):
+    """Indica se todo o áudio do pedido já está no cache (sem precisar do modelo)"""
+    if dados.senha and dados.guiche and dados.phrase_bank:
+        # Com todas as peças no banco, a montagem não espera a fila do modelo
+        return phrase_bank.tem_pecas([dados.senha, dados.guiche], dados.language, resolver_falante(dados),
+                                     limitar_velocidade(dados.speed))
+    if dados.force_refresh:
+        return False
+    if dados.senha and dados.guiche:
+        speaker = resolver_falante(dados)
+        speed = limitar_velocidade(dados.speed)
+        pos = resolver_pos(dados)
+        return (os.path.exists(caminho_componente(SENHA_DIR, dados.senha, dados.language, speaker, speed, pos))
+                and os.path.exists(caminho_componente(GUICHE_DIR, dados.guiche, dados.language, speaker, speed, pos)))
+    return os.path.exists(caminho_texto(dados)[1])
+
+def registrar_no_indice(cache_key, texto, language, speaker, speed, cache_file):
+    """Registra um áudio recém-gerado no índice de cache"""
+    cache_index.registrar(cache_key, texto, language, speaker, speed, cache_file)
+
+def registrar_anuncio(anuncio_file_path, dados: Texto, speaker, speed):
+    """Contabiliza o acesso a uma chamada montada no índice de cache"""
+    cache_index.registrar_hit(
+        anuncio_file_path,
+        f"{dados.senha} / {dados.guiche}",
+        dados.language,
+        speaker,
+        speed,
+        anuncio_file_path,
+        tipo="anuncio"
+    )
+
+def generate_cache_key(texto, language, speaker, speed, reference_file=None, engine=None, pos=None):
+    """Gera uma chave única para o cache com base nos parâmetros
+    
+    Inclui a versão do modelo do motor (`engine`, o principal por padrão),
+    então os áudios do motor de reserva e de modelos anteriores nunca são
+    servidos no lugar dos do modelo atual, e o pós-processamento `pos`.
+    """
+    with metrics.etapa("chave_cache"):
+        reference_hash = None
+        # Se estiver usando um arquivo de referência, incluir o hash do seu conteúdo
+        if reference_file:
+            try:
+                reference_hash = hash_arquivo(reference_file)
+            except OSError:
+                reference_hash = "reference_error"
+        return chave_audio(texto, language, speaker, speed, reference_hash, versao_modelo(engine or TTS_ENGINE),
+                           pos.chave() if pos is not None else None)
+
+@app.post("/jobs")
+def criar_job(dados: Texto, request: Request):
+    """Agenda a síntese em segundo plano e retorna o id para acompanhamento
+    
+    Um pedido fora do cache é recusado como em /falar (503 sem o modelo, 429
+    com a fila de síntese cheia), e também com TTS_JOBS_MAX_PENDENTES jobs
+    ainda não finalizados.
+    """
+    if not esta_em_cache(dados):
+        verificar_capacidade()
+    job = jobs.criar(processar_fala, dados, get_base_url(request))
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "url": f"/jobs/{job.id}",
+        "fila": scheduler.estatisticas()
+    }
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Retorna o estado de um job e, quando concluído, o resultado da síntese"""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return {**job.to_dict(), "fila": scheduler.estatisticas()}
+
+@app.get("/jobs")
+def get_jobs_info():
+    """Retorna a profundidade da fila de inferências e tempos de espera"""
+    return {"jobs_pendentes": jobs.pendentes(), "fila": scheduler.estatisticas(),
+            "sintese": sintese_executor.estatisticas(), "antecipacao": senha_prefetch.estatisticas(),
+            "rtf": medidor_rtf.estatisticas()}
 
 @app.post("/falar")
-def falar(dados: Texto, request: Request):
+async def falar(dados: Texto, request: Request):
+    """Gera (ou obtém do cache) o áudio pedido
+    
+    Acertos de cache respondem sem passar pelo executor de síntese, então
+    continuam rápidos mesmo com o modelo ocupado.
+    """
+    base_url = get_base_url(request)
+    if await em_thread(esta_em_cache, dados):
+        return await em_thread(processar_fala, dados, base_url)
+    return await aguardar_sintese(processar_fala, dados, base_url)
+
+@app.post("/falar/batch")
+async def falar_lote(itens: List[Texto], request: Request):
+    """Processa vários pedidos de uma vez
+    
+    Responde em NDJSON, uma linha por item (com seu `indice` na lista) assim que
+    ele fica pronto: primeiro os itens já em cache, depois os gerados pelo modelo.
+    Os itens fora do cache ocupam o executor de síntese como pedidos de /falar:
+    sem o modelo carregado a resposta é 503 e, sem lugar para todos, 429, antes
+    de qualquer linha. Um item que falha vira uma linha com `status` "error".
+    """
+    base_url = get_base_url(request)
+    
+    def linha(indice, resultado):
+        return json.dumps({"indice": indice, **resultado}, ensure_ascii=False) + "\n"
+    
+    def linha_erro(indice, erro):
+        return linha(indice, {"status": "error", "mensagem": str(erro)})
+    
+    async def item_lote(indice, future):
+        try:
+            return linha(indice, await asyncio.wrap_future(future))
+        except Exception as e:
+            return linha_erro(indice, e)
+    
+    em_cache = []
+    grupos = {}
+    for indice, dados in enumerate(itens):
+        if await em_thread(esta_em_cache, dados):
+            em_cache.append((indice, dados))
+            continue
+        # Agrupar os que faltam por idioma e voz para compartilhar os latentes
+        voz = dados.reference_file or resolver_falante(dados)
+        grupos.setdefault((dados.language, voz), []).append((indice, dados))
+    
+    faltando = len(itens) - len(em_cache)
+    if faltando:
+        if faltando > SINTESE_FILA_MAX:
+            raise HTTPException(status_code=413, detail=f"O lote tem {faltando} itens fora do cache; "
+                                                        f"o máximo é {SINTESE_FILA_MAX}")
+        verificar_capacidade(faltando)
+    
+    async def gerar():
+        # 1. Itens já em cache respondem imediatamente
+        for indice, dados in em_cache:
+            try:
+                yield linha(indice, await em_thread(processar_fala, dados, base_url))
+            except Exception as e:
+                yield linha_erro(indice, e)
+        
+        # 2. Itens que precisam do modelo, grupo a grupo
+        pendentes = []
+        for (language, voz), membros in grupos.items():
+            referencia = membros[0][1].reference_file
+            try:
+                # Latentes calculados uma única vez por grupo, antes das inferências
+                await asyncio.wrap_future(scheduler.submit(
+                    f"latents_{voz}",
+                    obter_latentes,
+                    speaker=None if referencia else voz,
+                    reference_file=referencia
+                ))
+            except Exception as e:
+                log.warning("Não foi possível preparar os latentes", voz=voz, erro=str(e))
+            for indice, dados in membros:
+                try:
+                    future = sintese_executor.submit(processar_fala, dados, base_url)
+                except FilaCheia as e:
+                    # A fila encheu depois da verificação inicial
+                    yield linha_erro(indice, e)
+                    continue
+                pendentes.append(item_lote(indice, future))
+        
+        for proximo in asyncio.as_completed(pendentes):
+            yield await proximo
+    
+    return StreamingResponse(gerar(), media_type="application/x-ndjson")
+
+@app.post("/falar/stream")
+async def falar_stream(dados: Texto):
+    """Sintetiza o texto frase a frase e envia o WAV à medida que o áudio é gerado
+    
+    O áudio completo é salvo no cache normal de /falar ao final da síntese.
+    """
+    if not dados.texto:
+        raise HTTPException(status_code=400, detail="O streaming suporta apenas anúncios de texto")
+    
+    speed = limitar_velocidade(dados.speed)
+    speaker_to_use = resolver_falante(dados)
+    pos = resolver_pos(dados)
+    cache_key = await em_thread(generate_cache_key, dados.texto, dados.language, speaker_to_use, speed,
+                                dados.reference_file, pos=pos)
+    cache_file = caminho_shard(CACHE_DIR, cache_key)
+    
+    if not dados.force_refresh and await em_thread(os.path.exists, cache_file):
+        metrics.registrar_cache("texto", hit=True)
+        return FileResponse(cache_file, media_type="audio/wav", headers={"X-Cache": "hit"})
+    
+    metrics.registrar_cache("texto", hit=False)
+    sample_rate = taxa_amostragem()
+    # Os trechos chegam da thread da inferência e são consumidos pelo event loop
+    loop = asyncio.get_running_loop()
+    fila = asyncio.Queue()
+    fim = object()
+    
+    def emitir(audio):
+        loop.call_soon_threadsafe(fila.put_nowait, audio)
+    
+    def tarefa():
+        log.info("Gerando novo áudio em streaming", texto=dados.texto)
+        sintetizar_stream(
+            dados.texto,
+            cache_file,
+            dados.language,
+            speed,
+            emitir,
+            speaker=None if dados.reference_file else speaker_to_use,
+            reference_file=dados.reference_file,
+            pos=pos
+        )
+        registrar_no_indice(cache_key, dados.texto, dados.language, speaker_to_use, speed, cache_file)
+    
+    # Mesma chave de /falar: pedidos idênticos simultâneos compartilham a inferência.
+    # A espera ocupa o executor de síntese, com o mesmo limite de pedidos pendentes.
+    future = sintese_executor.submit(scheduler.executar, cache_key, tarefa)
+    future.add_done_callback(lambda _: loop.call_soon_threadsafe(fila.put_nowait, fim))
+    
+    async def gerar():
+        yield cabecalho_wav_stream(sample_rate)
+        recebeu_audio = False
+        # Todos os trechos são emitidos antes de a tarefa terminar
+        while (audio := await fila.get()) is not fim:
+            recebeu_audio = True
+            yield pcm16(audio)
+        
+        await asyncio.wrap_future(future)
+        if not recebeu_audio:
+            # Pedido agrupado com uma síntese já em andamento: enviar o arquivo pronto, na taxa
+            # do cabeçalho já enviado (o arquivo pode ter outra taxa pelo pós-processamento)
+            audio, taxa_arquivo = await em_thread(ler_wav, cache_file)
+            if taxa_arquivo != sample_rate:
+                audio = await em_thread(reamostrar_polifasico, audio, taxa_arquivo, sample_rate)
+            yield pcm16(audio)
+    
+    return StreamingResponse(gerar(), media_type="audio/wav", headers={"X-Cache": "miss"})
+
+def processar_fala(dados: Texto, base_url: str):
+    """Gera (ou obtém do cache) o áudio pedido e monta a resposta da API"""
     try:
         # Verificar se a velocidade está dentro de limites razoáveis
-        speed = max(0.5, min(3.0, dados.speed))  # Limitar entre 0.5 e 3.0
+        speed = limitar_velocidade(dados.speed)
         
         # Determinar o falante a ser usado
-        speaker_to_use = None
-        
-        if dados.speaker:
-            # Usar o falante especificado
-            speaker_to_use = dados.speaker
-        else:
-            # Usar o falante padrão para o idioma
-            speaker_to_use = DEFAULT_SPEAKERS.get(dados.language, DEFAULT_SPEAKERS["default"])
-        
-        # URL base para os arquivos de áudio (baseada na requisição atual)
-        base_url = get_base_url(request)
+        speaker_to_use = resolver_falante(dados)
+        pos = resolver_pos(dados)
         
         # Verificar se é uma chamada de guichê
-        if dados.senha and dados.guiche:
+        if dados.senha and dados.guiche and dados.phrase_bank:
+            # Montar a chamada completa a partir das peças pré-renderizadas
+            anuncio_file_path = phrase_bank.montar(
+                [dados.senha, dados.guiche],
+                dados.language,
+                speaker_to_use,
+                speed,
+                force_refresh=dados.force_refresh,
+                pos=pos
+            )
+            if dados.force_refresh:
+                hot_audio.invalidar(os.path.normpath(anuncio_file_path))
+            
+            # O banco já gera um arquivo único; aplicar o chime se pedido
+            if dados.chime:
+                anuncio_file_path = juntar_anuncio([anuncio_file_path], dados.chime)
+            
+            registrar_anuncio(anuncio_file_path, dados, speaker_to_use, speed)
+            anuncio_file_path = codificar(anuncio_file_path, dados)
+            
+            return {
+                "status": "ok",
+                "tipo": "guiche",
+                "modo": "phrase_bank",
+                "senha": dados.senha,
+                "guiche": dados.guiche,
+                "arquivo": anuncio_file_path,
+                "url": base_url + file_path_to_url(anuncio_file_path),
+                "format": dados.format,
+                "language": dados.language,
+                "speaker": speaker_to_use,
+                "speed": speed
+            }
+        
+        elif dados.senha and dados.guiche:
             # Verificar se os arquivos já existem antes de gerar
             componentes = {}
             componentes_urls = {}
             
             # 1. Verificar/Gerar arquivo de senha
-            senha_safe_name = dados.senha.replace(" ", "_").replace("/", "_").lower()
-            senha_file_name = f"{senha_safe_name}_{dados.language}.wav"
-            senha_file_path = os.path.join(SENHA_DIR, senha_file_name)
+            senha_file_path = caminho_componente(SENHA_DIR, dados.senha, dados.language, speaker_to_use, speed, pos)
             
             if not os.path.exists(senha_file_path) or dados.force_refresh:
                 # Só gera o áudio se não existir ou force_refresh=True
-                print(f"Gerando áudio de senha: {dados.senha}")
-                tts.tts_to_file(
-                    text=dados.senha, 
-                    file_path=senha_file_path,
-                    speaker=speaker_to_use,
-                    language=dados.language,
-                    speed=speed
+                metrics.registrar_cache("senha", hit=False)
+                # Com force_refresh, outra chave: uma pré-geração na fila manteria o áudio antigo
+                chave = f"{senha_file_path}#refresh" if dados.force_refresh else senha_file_path
+                scheduler.executar(
+                    chave,
+                    gerar_senha,
+                    dados.senha,
+                    senha_file_path,
+                    dados.language,
+                    speaker_to_use,
+                    speed,
+                    pos=pos,
+                    force_refresh=dados.force_refresh
                 )
             else:
-                print(f"Usando áudio de senha em cache: {senha_file_path}")
+                log.debug("Usando áudio de senha em cache", arquivo=senha_file_path)
+                metrics.registrar_cache("senha", hit=True)
+                cache_index.registrar_hit(senha_file_path, dados.senha, dados.language, speaker_to_use, speed,
+                                          senha_file_path, tipo="senha")
                 
             componentes["senha"] = senha_file_path
-            componentes_urls["senha"] = base_url + f"/senha/{senha_file_name}"
+            componentes_urls["senha"] = base_url + file_path_to_url(codificar(senha_file_path, dados))
             
             # 2. Verificar/Gerar arquivo de guichê
-            guiche_safe_name = dados.guiche.replace(" ", "_").replace("/", "_").lower()
-            guiche_file_name = f"{guiche_safe_name}_{dados.language}.wav"
-            guiche_file_path = os.path.join(GUICHE_DIR, guiche_file_name)
+            guiche_file_path = caminho_componente(GUICHE_DIR, dados.guiche, dados.language, speaker_to_use, speed, pos)
             
             if not os.path.exists(guiche_file_path) or dados.force_refresh:
                 # Só gera o áudio se não existir ou force_refresh=True
-                print(f"Gerando áudio de guichê: {dados.guiche}")
-                tts.tts_to_file(
-                    text=dados.guiche, 
-                    file_path=guiche_file_path,
+                metrics.registrar_cache("guiche", hit=False)
+                log.info("Gerando áudio de guichê", guiche=dados.guiche)
+                sintetizar_agendado(
+                    guiche_file_path,
+                    dados.guiche,
+                    guiche_file_path,
+                    dados.language,
+                    speed,
                     speaker=speaker_to_use,
-                    language=dados.language,
-                    speed=speed
+                    pos=pos
                 )
+                cache_index.registrar(guiche_file_path, dados.guiche, dados.language, speaker_to_use, speed,
+                                      guiche_file_path, tipo="guiche")
             else:
-                print(f"Usando áudio de guichê em cache: {guiche_file_path}")
+                log.debug("Usando áudio de guichê em cache", arquivo=guiche_file_path)
+                metrics.registrar_cache("guiche", hit=True)
+                cache_index.registrar_hit(guiche_file_path, dados.guiche, dados.language, speaker_to_use, speed,
+                                          guiche_file_path, tipo="guiche")
                 
             componentes["guiche"] = guiche_file_path
-            componentes_urls["guiche"] = base_url + f"/guiche/{guiche_file_name}"
+            componentes_urls["guiche"] = base_url + file_path_to_url(codificar(guiche_file_path, dados))
             
-            return {
+            resposta = {
                 "status": "ok",
                 "tipo": "guiche",
                 "senha": dados.senha,
                 "guiche": dados.guiche,
                 "componentes": componentes,
                 "urls": componentes_urls,
+                "format": dados.format,
                 "language": dados.language,
                 "speaker": speaker_to_use,
                 "speed": speed
             }
+            
+            # 3. Juntar senha e guichê em um único arquivo, se solicitado
+            if dados.anuncio_unico or dados.chime:
+                anuncio_file_path = juntar_anuncio(
+                    [senha_file_path, guiche_file_path],
+                    dados.chime
+                )
+                registrar_anuncio(anuncio_file_path, dados, speaker_to_use, speed)
+                anuncio_file_path = codificar(anuncio_file_path, dados)
+                resposta["arquivo"] = anuncio_file_path
+                resposta["url"] = base_url + file_path_to_url(anuncio_file_path)
+            
+            # As próximas senhas da sequência ficam prontas antes de serem chamadas. Agendadas
+            # só agora, para não ocupar o modelo antes do guichê deste pedido.
+            if servidor_pronto.is_set():
+                senha_prefetch.observar(dados.senha, dados.language, speaker_to_use, speed, pos)
+            
+            return resposta
         
         # Para anúncios regulares (não guichê)
         else:
@@ -361,66 +1343,64 @@ def falar(dados: Texto, request: Request):
                 dados.language, 
                 speaker_to_use, 
                 speed, 
-                dados.reference_file
+                dados.reference_file,
+                pos=pos
             )
             
             # Nome do arquivo de cache
-            cache_file = os.path.join(CACHE_DIR, f"{cache_key}.wav")
+            cache_file = caminho_shard(CACHE_DIR, cache_key)
+            engine = TTS_ENGINE
+            
+            # Fila do motor principal cheia: textos novos vão para o motor de reserva
+            if (not os.path.exists(cache_file) or dados.force_refresh) and usar_reserva():
+                engine = backend_reserva.nome
+                cache_key = generate_cache_key(dados.texto, dados.language, speaker_to_use, speed,
+                                               dados.reference_file, engine=engine, pos=pos)
+                cache_file = caminho_shard(CACHE_DIR, cache_key)
             
             # Verificar se já existe no cache
             if os.path.exists(cache_file) and not dados.force_refresh:
-                print(f"Usando arquivo em cache: {cache_file}")
-                # Registrar no índice de cache para fins estatísticos
-                if cache_key not in cache_index:
-                    cache_index[cache_key] = {
-                        "texto": dados.texto,
-                        "language": dados.language,
-                        "speaker": speaker_to_use,
-                        "speed": speed,
-                        "hits": 1,
-                        "created": os.path.getctime(cache_file)
-                    }
-                else:
-                    cache_index[cache_key]["hits"] = cache_index[cache_key].get("hits", 0) + 1
-                
-                save_cache_index()
+                log.debug("Usando arquivo em cache", arquivo=cache_file)
+                metrics.registrar_cache("texto", hit=True)
+                # Registrar o acesso no índice de cache para fins estatísticos
+                cache_index.registrar_hit(cache_key, dados.texto, dados.language, speaker_to_use, speed, cache_file)
+            elif engine != TTS_ENGINE:
+                log.info("Fila cheia, gerando com o motor de reserva", engine=engine, texto=dados.texto)
+                metrics.registrar_cache("texto", hit=False)
+                sintetizar_reserva(dados.texto, cache_file, dados.language, speed, pos=pos)
+                registrar_no_indice(cache_key, dados.texto, dados.language, speaker_to_use, speed, cache_file)
             else:
                 # Gerar novo áudio apenas se não existir ou force_refresh=True
-                print(f"Gerando novo áudio para: {dados.texto}")
+                log.info("Gerando novo áudio", texto=dados.texto, speaker=speaker_to_use,
+                         reference_file=dados.reference_file, speed=speed)
+                metrics.registrar_cache("texto", hit=False)
                 
                 if dados.reference_file:
-                    print(f"Usando arquivo de referência: {dados.reference_file}, velocidade: {speed}")
-                    tts.tts_to_file(
-                        text=dados.texto, 
-                        file_path=cache_file,
-                        speaker_wav=dados.reference_file,
-                        language=dados.language,
-                        speed=speed
+                    sintetizar_agendado(
+                        cache_key,
+                        dados.texto,
+                        cache_file,
+                        dados.language,
+                        speed,
+                        reference_file=dados.reference_file,
+                        pos=pos
                     )
                 else:
-                    print(f"Usando falante: {speaker_to_use}, velocidade: {speed}")
-                    tts.tts_to_file(
-                        text=dados.texto, 
-                        file_path=cache_file,
+                    sintetizar_agendado(
+                        cache_key,
+                        dados.texto,
+                        cache_file,
+                        dados.language,
+                        speed,
                         speaker=speaker_to_use,
-                        language=dados.language,
-                        speed=speed
+                        pos=pos
                     )
                 
                 # Registrar no índice de cache
-                cache_index[cache_key] = {
-                    "texto": dados.texto,
-                    "language": dados.language,
-                    "speaker": speaker_to_use,
-                    "speed": speed,
-                    "hits": 1,
-                    "created": os.path.getctime(cache_file)
-                }
-                
-                save_cache_index()
+                registrar_no_indice(cache_key, dados.texto, dados.language, speaker_to_use, speed, cache_file)
             
-            # Gerar URL para o arquivo
-            cache_url = base_url + file_path_to_url(cache_file)
+            # Gerar URL para o arquivo (no formato pedido)
+            cache_url = base_url + file_path_to_url(codificar(cache_file, dados))
             
             return {
                 "status": "ok", 
@@ -432,7 +1412,11 @@ def falar(dados: Texto, request: Request):
                 "speed": speed,
                 "cache_file": cache_file,
                 "url": cache_url,
+                "format": dados.format,
+                "engine": engine,
                 "cached": os.path.exists(cache_file) and not dados.force_refresh
             }
+    except ModeloIndisponivel:
+        raise
     except Exception as e:
         return {"status": "error", "mensagem": str(e)}
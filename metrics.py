@@ -0,0 +1,108 @@
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+from structured_log import novo_request_id, obter_logger, request_id_var
+
+log = obter_logger("http")
+
+# Faixas de tempo das etapas: do hash da chave (microssegundos) à inferência (segundos)
+_FAIXAS_ETAPAS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+CACHE_HITS = Counter("tts_cache_hits_total", "Pedidos atendidos pelo cache de áudio", ["tipo"])
+CACHE_MISSES = Counter("tts_cache_misses_total", "Pedidos que precisaram gerar o áudio", ["tipo"])
+REJEITADOS = Counter("tts_pedidos_rejeitados_total", "Pedidos recusados com 429 ou 503", ["motivo"])
+
+ETAPAS = Histogram("tts_etapa_segundos", "Duração de cada etapa do atendimento",
+                   ["etapa"], buckets=_FAIXAS_ETAPAS)
+REQUISICOES = Histogram("tts_requisicao_segundos", "Duração total das requisições HTTP",
+                        ["metodo", "rota", "status"], buckets=_FAIXAS_ETAPAS)
+RTF = Histogram("tts_inferencia_rtf", "Fator de tempo real das sínteses (tempo de síntese / duração do áudio)",
+                buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 3, 5))
+
+FILA = Gauge("tts_fila_inferencias", "Pedidos aguardando na fila de inferências")
+FILA_PREGERACAO = Gauge("tts_fila_pregeracao", "Pré-gerações aguardando o modelo ocioso")
+EXECUTANDO = Gauge("tts_inferencias_executando", "Inferências em execução")
+JOBS_PENDENTES = Gauge("tts_jobs_pendentes", "Jobs assíncronos ainda não finalizados")
+SINTESE_PENDENTES = Gauge("tts_sintese_pendentes", "Pedidos HTTP aguardando o modelo no executor de síntese")
+MEMORIA_MODELO = Gauge("tts_modelo_memoria_bytes", "Memória ocupada pelos pesos do modelo carregado")
+
+
+def etapa(nome):
+    """Mede o bloco como uma etapa: `with etapa("inferencia"): ...`"""
+    return ETAPAS.labels(nome).time()
+
+
+def registrar_cache(tipo, hit):
+    (CACHE_HITS if hit else CACHE_MISSES).labels(tipo).inc()
+
+
+def registrar_rejeicao(motivo):
+    REJEITADOS.labels(motivo).inc()
+
+
+def monitorar(scheduler, jobs, memoria_modelo, sintese):
+    """Liga os medidores aos componentes; os valores são lidos a cada coleta"""
+    FILA.set_function(lambda: scheduler.estatisticas()["fila"])
+    FILA_PREGERACAO.set_function(lambda: scheduler.estatisticas()["fila_baixa_prioridade"])
+    EXECUTANDO.set_function(lambda: scheduler.estatisticas()["executando"])
+    JOBS_PENDENTES.set_function(jobs.pendentes)
+    SINTESE_PENDENTES.set_function(sintese.pendentes)
+    MEMORIA_MODELO.set_function(lambda: memoria_modelo() or 0)
+
+
+def exportar():
+    """Retorna (conteúdo, content-type) no formato de texto do Prometheus"""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class MiddlewareRequisicoes:
+    """Middleware ASGI que identifica e mede cada requisição HTTP
+
+    Usa o X-Request-ID recebido (ou cria um), devolve-o na resposta e o deixa
+    disponível aos logs da requisição. O tempo vai até o último trecho do
+    corpo, então respostas em streaming são medidas por inteiro.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for nome, valor in scope.get("headers", []):
+            if nome == b"x-request-id":
+                request_id = valor.decode("latin-1")[:64]
+                break
+        request_id = request_id or novo_request_id()
+        token = request_id_var.set(request_id)
+        inicio = time.perf_counter()
+        status = {"codigo": 500, "registrado": False}
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                status["codigo"] = mensagem["status"]
+                mensagem.setdefault("headers", []).append((b"x-request-id", request_id.encode("latin-1")))
+            await send(mensagem)
+            if mensagem["type"] == "http.response.body" and not mensagem.get("more_body", False):
+                status["registrado"] = True
+                self._registrar(scope, status["codigo"], time.perf_counter() - inicio)
+
+        try:
+            await self.app(scope, receive, enviar)
+        except Exception:
+            if not status["registrado"]:
+                self._registrar(scope, 500, time.perf_counter() - inicio)
+            raise
+        finally:
+            request_id_var.reset(token)
+
+    def _registrar(self, scope, status, duracao):
+        # Rota com parâmetros (ex.: /audio/{filename:path}) para não criar uma série por arquivo
+        rota = getattr(scope.get("route"), "path", None) or "desconhecida"
+        REQUISICOES.labels(scope["method"], rota, str(status)).observe(duracao)
+        log.info("Requisição atendida", metodo=scope["method"], caminho=scope["path"], rota=rota,
+                 status=status, duracao_ms=round(duracao * 1000, 1))
@@ -0,0 +1,231 @@
+import argparse
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from audio_utils import caminho_temporario, ler_wav, salvar_wav, silencio, aparar_silencio, normalizar_rms, concatenar
+from cache_layout import caminho_shard, garantir_diretorio
+from structured_log import obter_logger
+
+log = obter_logger("banco")
+
+
+# Maior número pré-renderizado no banco
+NUMERO_MAXIMO = 999
+
+# Palavras de apoio (senha) e rótulos de guichê pré-renderizados por idioma
+PALAVRAS_PADRAO = {
+    "pt": ["Senha", "Guichê", "Caixa", "Mesa", "Sala", "Consultório"],
+    "en": ["Ticket", "Number", "Counter", "Desk", "Room"],
+    "es": ["Turno", "Número", "Ventanilla", "Caja", "Mesa", "Sala"],
+    "fr": ["Ticket", "Numéro", "Guichet", "Caisse", "Bureau", "Salle"],
+    "de": ["Nummer", "Schalter", "Kasse", "Platz", "Raum"],
+    "it": ["Numero", "Sportello", "Cassa", "Tavolo", "Sala"],
+}
+
+PAUSA_ENTRE_FRASES_MS = 350  # Pausa entre "Senha 42" e "Guichê 7"
+CROSSFADE_MS = 20  # Crossfade entre as peças de uma mesma frase
+VOLUME_ALVO_DB = -20.0  # Nível RMS comum a todas as peças (casamento de volume)
+
+
+def _slug(texto):
+    """Nome de arquivo seguro (ASCII) para uma palavra, sem perder a distinção de acentos"""
+    ascii_texto = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+    base = re.sub(r"[^a-z0-9]+", "_", ascii_texto.lower()).strip("_") or "x"
+    sufixo = hashlib.md5(texto.lower().encode("utf-8")).hexdigest()[:8]
+    return f"{base}_{sufixo}"
+
+
+class PhraseBank:
+    """Banco de peças de áudio pré-renderizadas para montar chamadas de guichê.
+
+    Cada palavra de apoio, rótulo de guichê e número é sintetizado uma única vez
+    por idioma, falante e velocidade. Uma chamada é montada concatenando as peças,
+    sem chamar o modelo.
+    """
+
+    def __init__(self, bank_dir, output_dir, sintetizar, max_pecas_memoria=512):
+        # sintetizar(texto, file_path, language, speed, speaker=..., chave=...) gera um WAV com o modelo;
+        # `chave` identifica a peça (o caminho final), para agrupar pedidos simultâneos da mesma peça
+        self.bank_dir = bank_dir
+        self.output_dir = output_dir
+        self.sintetizar = sintetizar
+        self.max_pecas_memoria = max_pecas_memoria
+        self._pecas = OrderedDict()
+        self._renderizando = {}  # caminho da peça -> Future da renderização em andamento
+        self._lock = threading.Lock()
+
+        for d in (self.bank_dir, self.output_dir):
+            if not os.path.exists(d):
+                os.makedirs(d)
+
+    def dir_voz(self, language, speaker, speed):
+        """Diretório das peças de uma combinação idioma/falante/velocidade"""
+        voz = hashlib.md5(f"{speaker}_{speed}".encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.bank_dir, language, voz)
+
+    def pecas_da_frase(self, frase):
+        """Divide uma frase ("Senha 42") em peças: (id da peça, texto a sintetizar)"""
+        pecas = []
+        for token in frase.split():
+            if token.isdigit():
+                numero = int(token)
+                pecas.append((f"num_{numero}", str(numero)))
+            else:
+                pecas.append((f"pal_{_slug(token)}", token))
+        return pecas
+
+    def caminho_peca(self, language, speaker, speed, peca_id):
+        return os.path.join(self.dir_voz(language, speaker, speed), f"{peca_id}.wav")
+
+    def tem_pecas(self, frases, language, speaker, speed):
+        """Indica se todas as peças das frases já estão no banco (a montagem não vai precisar do modelo)"""
+        return all(os.path.exists(self.caminho_peca(language, speaker, speed, peca_id))
+                   for frase in frases for peca_id, _ in self.pecas_da_frase(frase))
+
+    def renderizar_peca(self, language, speaker, speed, peca_id, texto, force=False):
+        """Garante que a peça existe no banco, sintetizando-a se necessário"""
+        path = self.caminho_peca(language, speaker, speed, peca_id)
+        if os.path.exists(path) and not force:
+            return path
+
+        # Pedidos simultâneos da mesma peça aguardam a mesma renderização
+        with self._lock:
+            future = self._renderizando.get(path)
+            if future is not None:
+                em_andamento = True
+            else:
+                em_andamento = False
+                future = self._renderizando[path] = Future()
+        if em_andamento:
+            return future.result()
+
+        try:
+            self._renderizar(path, language, speaker, speed, texto)
+            future.set_result(path)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._renderizando.pop(path, None)
+        return path
+
+    def _renderizar(self, path, language, speaker, speed, texto):
+        pasta = os.path.dirname(path)
+        if not os.path.exists(pasta):
+            os.makedirs(pasta)
+
+        # Sintetiza, remove o silêncio das bordas e normaliza o volume uma única vez
+        tmp_path = caminho_temporario(path + ".raw")
+        self.sintetizar(texto, tmp_path, language, speed, speaker=speaker, chave=path)
+        audio, sample_rate = ler_wav(tmp_path)
+        audio = normalizar_rms(aparar_silencio(audio, sample_rate), VOLUME_ALVO_DB)
+        salvar_wav(path, audio, sample_rate)
+        os.remove(tmp_path)
+
+        with self._lock:
+            self._pecas.pop(path, None)
+
+    def _carregar_peca(self, path):
+        with self._lock:
+            if path in self._pecas:
+                self._pecas.move_to_end(path)
+                return self._pecas[path]
+
+        peca = ler_wav(path)
+
+        with self._lock:
+            self._pecas[path] = peca
+            while len(self._pecas) > self.max_pecas_memoria:
+                self._pecas.popitem(last=False)
+        return peca
+
+    def montar(self, frases, language, speaker, speed, force_refresh=False, pos=None):
+        """Monta um único WAV a partir das frases (ex: ["Senha 42", "Guichê 7"])
+
+        Retorna o caminho do arquivo gerado. Peças ausentes no banco são
+        sintetizadas sob demanda e ficam disponíveis para as próximas chamadas.
+        O pós-processamento `pos` é aplicado à chamada montada (as peças do
+        banco são as mesmas para qualquer tratamento) e faz parte da chave.
+        """
+        pecas_por_frase = [self.pecas_da_frase(frase) for frase in frases]
+
+        ids = "|".join(",".join(peca_id for peca_id, _ in pecas) for pecas in pecas_por_frase)
+        identificacao = f"{ids}_{language}_{speaker}_{speed}"
+        if pos is not None and pos.ativo():
+            identificacao += f"_{pos.chave()}"
+        chave = hashlib.md5(identificacao.encode("utf-8")).hexdigest()
+        output_path = caminho_shard(self.output_dir, chave)
+        if os.path.exists(output_path) and not force_refresh:
+            return output_path
+
+        segmentos_frases = []
+        sample_rate = None
+        for pecas in pecas_por_frase:
+            segmentos = []
+            for peca_id, texto in pecas:
+                path = self.renderizar_peca(language, speaker, speed, peca_id, texto)
+                audio, sample_rate = self._carregar_peca(path)
+                segmentos.append(audio)
+            segmentos_frases.append(concatenar(segmentos, sample_rate, CROSSFADE_MS))
+
+        if sample_rate is None:
+            raise ValueError("Nenhuma peça para montar a chamada")
+
+        # Frases separadas por uma pausa curta
+        partes = []
+        for i, segmento in enumerate(segmentos_frases):
+            if i > 0:
+                partes.append(silencio(PAUSA_ENTRE_FRASES_MS, sample_rate))
+            partes.append(segmento)
+
+        audio = concatenar(partes, sample_rate, crossfade_ms=0)
+        if pos is not None and pos.ativo():
+            audio, sample_rate = pos.aplicar(audio, sample_rate)
+        garantir_diretorio(output_path)
+        salvar_wav(output_path, audio, sample_rate)
+        return output_path
+
+    def aquecer(self, language, speaker, speed=1.0, numero_maximo=NUMERO_MAXIMO, palavras=None, force=False):
+        """Pré-renderiza todas as palavras e números de uma voz no banco"""
+        if palavras is None:
+            palavras = PALAVRAS_PADRAO.get(language, [])
+
+        pecas = []
+        for palavra in palavras:
+            pecas.extend(self.pecas_da_frase(palavra))
+        pecas.extend((f"num_{n}", str(n)) for n in range(numero_maximo + 1))
+
+        total = len(pecas)
+        for i, (peca_id, texto) in enumerate(pecas, start=1):
+            self.renderizar_peca(language, speaker, speed, peca_id, texto, force=force)
+            if i % 50 == 0 or i == total:
+                log.info("Banco de frases", language=language, speaker=speaker, pecas=i, total=total)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pré-renderiza o banco de frases para chamadas de guichê")
+    parser.add_argument("--language", type=str, action="append",
+                        help="Idioma a aquecer (pode ser repetido; padrão: todos de PALAVRAS_PADRAO)")
+    parser.add_argument("--speaker", type=str, default=None,
+                        help="Falante (padrão: falante padrão do idioma)")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Velocidade da fala")
+    parser.add_argument("--max-numero", type=int, default=NUMERO_MAXIMO,
+                        help="Maior número a pré-renderizar")
+    parser.add_argument("--force", action="store_true",
+                        help="Regenera as peças mesmo que já existam")
+    args = parser.parse_args()
+
+    # Importado aqui para carregar o modelo apenas ao executar o aquecimento
+    import main
+    main.carregar_modelo()
+
+    for language in args.language or list(PALAVRAS_PADRAO.keys()):
+        speaker = args.speaker or main.DEFAULT_SPEAKERS.get(language, main.DEFAULT_SPEAKERS["default"])
+        main.phrase_bank.aquecer(language, speaker, args.speed, args.max_numero, force=args.force)
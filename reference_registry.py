@@ -0,0 +1,179 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+
+import soundfile as sf
+
+from structured_log import obter_logger
+
+log = obter_logger("referencias")
+
+# Leitura em blocos: o arquivo de referência nunca é carregado inteiro na memória
+TAMANHO_BLOCO = 1024 * 1024
+
+# Hashes já calculados, por (caminho, tamanho, mtime, inode)
+MAX_HASHES = 1024
+_hashes = OrderedDict()
+_hashes_lock = threading.Lock()
+
+# Extensão gravada para cada formato aceito no upload (o arquivo é mantido como enviado)
+EXTENSOES_FORMATO = {"WAV": ".wav", "FLAC": ".flac", "OGG": ".ogg", "MP3": ".mp3"}
+
+_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+def _identidade(file_path, info=None):
+    info = info or os.stat(file_path)
+    return os.path.abspath(file_path), info.st_size, info.st_mtime_ns, info.st_ino
+
+
+def _memorizar(identidade, digest):
+    with _hashes_lock:
+        _hashes[identidade] = digest
+        _hashes.move_to_end(identidade)
+        while len(_hashes) > MAX_HASHES:
+            _hashes.popitem(last=False)
+
+
+def hash_arquivo(file_path):
+    """Calcula o hash MD5 do conteúdo de um arquivo
+
+    O conteúdo é lido em blocos e o resultado fica memorizado pelo caminho,
+    tamanho, mtime e inode: enquanto o arquivo não muda, basta um `stat`.
+    """
+    identidade = _identidade(file_path)
+    with _hashes_lock:
+        digest = _hashes.get(identidade)
+        if digest is not None:
+            _hashes.move_to_end(identidade)
+            return digest
+
+    md5 = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for bloco in iter(lambda: f.read(TAMANHO_BLOCO), b""):
+            md5.update(bloco)
+    digest = md5.hexdigest()
+    _memorizar(identidade, digest)
+    return digest
+
+
+class ReferenciaInvalida(ValueError):
+    """Arquivo enviado não é um áudio de referência aceito"""
+
+
+class ReferenciaMuitoGrande(ValueError):
+    """Arquivo enviado excede o tamanho máximo"""
+
+
+class UploadReferencia:
+    """Recebe um upload em blocos, calculando o hash enquanto grava em disco"""
+
+    def __init__(self, registro):
+        self.registro = registro
+        # Nome exclusivo por upload: as threads do servidor atendem vários uploads intercalados
+        descritor, self.tmp_path = tempfile.mkstemp(prefix="upload.", suffix=".tmp", dir=registro.diretorio)
+        self.tamanho = 0
+        self._md5 = hashlib.md5()
+        self._arquivo = os.fdopen(descritor, "wb")
+
+    def escrever(self, bloco):
+        self.tamanho += len(bloco)
+        if self.tamanho > self.registro.max_bytes:
+            raise ReferenciaMuitoGrande(
+                f"Arquivo de referência maior que {self.registro.max_bytes // (1024 * 1024)} MB")
+        self._md5.update(bloco)
+        self._arquivo.write(bloco)
+
+    def concluir(self):
+        """Valida o áudio e o registra; retorna os dados da referência"""
+        try:
+            return self._registrar()
+        except BaseException:
+            self.descartar()
+            raise
+
+    def _registrar(self):
+        self._arquivo.close()
+        try:
+            info = sf.info(self.tmp_path)
+        except Exception:
+            raise ReferenciaInvalida("O arquivo enviado não é um áudio suportado (WAV, FLAC, OGG ou MP3)")
+        extensao = EXTENSOES_FORMATO.get(info.format)
+        if extensao is None or info.frames == 0:
+            raise ReferenciaInvalida("O arquivo enviado não é um áudio suportado (WAV, FLAC, OGG ou MP3)")
+
+        reference_id = self._md5.hexdigest()
+        file_path = os.path.join(self.registro.diretorio, f"{reference_id}{extensao}")
+        if os.path.exists(file_path):
+            # Mesmo conteúdo já registrado
+            self.descartar()
+        else:
+            os.replace(self.tmp_path, file_path)
+            log.info("Áudio de referência registrado", reference_id=reference_id, bytes=self.tamanho,
+                     duracao_s=round(info.duration, 2))
+        # O hash já é conhecido: o primeiro pedido com esta referência não relê o arquivo
+        _memorizar(_identidade(file_path), reference_id)
+        return self.registro.descrever(reference_id, file_path)
+
+    def descartar(self):
+        """Remove o arquivo temporário (pode ser chamado mais de uma vez)"""
+        self._arquivo.close()
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+class ReferenceRegistry:
+    """Áudios de referência enviados uma vez e usados depois pelo `reference_id`
+
+    O id é o hash do conteúdo, o mesmo usado nas chaves do cache, então enviar
+    o mesmo arquivo de novo devolve o mesmo id.
+    """
+
+    def __init__(self, diretorio, max_bytes=20 * 1024 * 1024):
+        self.diretorio = diretorio
+        self.max_bytes = max_bytes
+        os.makedirs(self.diretorio, exist_ok=True)
+
+    def novo_upload(self):
+        return UploadReferencia(self)
+
+    def caminho(self, reference_id):
+        """Caminho do áudio registrado, ou None se o id não existir"""
+        if not reference_id or not _ID.match(reference_id):
+            return None
+        for extensao in EXTENSOES_FORMATO.values():
+            file_path = os.path.join(self.diretorio, f"{reference_id}{extensao}")
+            if os.path.exists(file_path):
+                return file_path
+        return None
+
+    def descrever(self, reference_id, file_path):
+        info = os.stat(file_path)
+        return {
+            "reference_id": reference_id,
+            "arquivo": file_path,
+            "bytes": info.st_size,
+            "criado_em": info.st_mtime
+        }
+
+    def listar(self):
+        referencias = []
+        with os.scandir(self.diretorio) as itens:
+            for item in itens:
+                reference_id, extensao = os.path.splitext(item.name)
+                if _ID.match(reference_id) and extensao in EXTENSOES_FORMATO.values() and item.is_file():
+                    referencias.append(self.descrever(reference_id, item.path))
+        return sorted(referencias, key=lambda r: r["criado_em"])
+
+    def remover(self, reference_id):
+        """Remove o áudio registrado; retorna False se o id não existir"""
+        file_path = self.caminho(reference_id)
+        if file_path is None:
+            return False
+        os.remove(file_path)
+        return True
@@ -1,7 +1,12 @@
 import uvicorn
 import argparse
+import multiprocessing
+import os
 
 if __name__ == "__main__":
+    # Necessário para iniciar os processos de inferência no executável gerado pelo PyInstaller
+    multiprocessing.freeze_support()
+    
     # Configurar argumentos de linha de comando
     parser = argparse.ArgumentParser(description="Servidor de API TTS")
     parser.add_argument("--host", type=str, default="0.0.0.0", 
@@ -12,6 +17,19 @@ if __name__ == "__main__":
                         help="Recarregar automaticamente em alterações de código")
     parser.add_argument("--workers", type=int, default=1, 
                         help="Número de workers (1 é recomendado para aplicações com GPU)")
+    parser.add_argument("--inference-workers", type=int, default=0,
+                        help="Processos de inferência, cada um com uma cópia do modelo, compartilhados "
+                             "por todos os workers HTTP (0 = modelo carregado em cada worker)")
+    parser.add_argument("--torch-threads", type=int, default=None,
+                        help="Threads do torch por processo de inferência (padrão: núcleos do processo)")
+    parser.add_argument("--torch-interop-threads", type=int, default=None,
+                        help="Threads do torch entre operações (padrão: definido pelo torch)")
+    parser.add_argument("--cpu-acelerado", action="store_true",
+                        help="Modo acelerado de CPU: quantização int8 das camadas lineares do modelo")
+    parser.add_argument("--torch-compile", action="store_true",
+                        help="No modo acelerado, também compila o decodificador com torch.compile")
+    parser.add_argument("--log-formato", choices=["json", "texto"], default=None,
+                        help="Formato dos logs da aplicação (padrão: json, ou TTS_LOG_FORMATO)")
     
     args = parser.parse_args()
     
@@ -32,8 +50,36 @@ if __name__ == "__main__":
     print(f"- Documentação: http://localhost:{args.port}/docs")
     print(f"- Lista de falantes: http://localhost:{args.port}/speakers")
     print(f"- Status do cache: http://localhost:{args.port}/cache")
+    print(f"- Prontidão do modelo: http://localhost:{args.port}/readyz")
+    print(f"- Métricas (Prometheus): http://localhost:{args.port}/metrics")
     print("\nPara parar o servidor: CTRL+C\n")
     
+    # Repassadas ao processo que carrega o modelo (workers do uvicorn ou processos de inferência)
+    if args.torch_interop_threads:
+        os.environ["TTS_TORCH_INTEROP_THREADS"] = str(args.torch_interop_threads)
+    if args.cpu_acelerado:
+        os.environ["TTS_CPU_ACELERADO"] = "1"
+    if args.torch_compile:
+        os.environ["TTS_TORCH_COMPILE"] = "1"
+    if args.log_formato:
+        os.environ["TTS_LOG_FORMATO"] = args.log_formato
+    
+    from structured_log import configurar_logs
+    configurar_logs()
+    
+    pool = None
+    if args.inference_workers > 0:
+        # Os processos carregam o modelo em segundo plano; os workers HTTP se conectam a eles
+        from inference_pool import iniciar_pool, ENV_ENDERECO, ENV_CHAVE, ENV_PROCESSOS
+        pool, endereco, chave = iniciar_pool(args.inference_workers, args.torch_threads)
+        os.environ[ENV_ENDERECO] = endereco
+        os.environ[ENV_CHAVE] = chave
+        os.environ[ENV_PROCESSOS] = str(args.inference_workers)
+        print(f"Pool de inferência: {args.inference_workers} processos em {endereco}")
+        print(f"- Estado do pool: http://localhost:{args.port}/pool\n")
+    elif args.torch_threads:
+        os.environ["TTS_TORCH_THREADS"] = str(args.torch_threads)
+    
     # Iniciar o servidor
     uvicorn.run(
         "main:app", 
@@ -41,4 +87,7 @@ if __name__ == "__main__":
         port=args.port, 
         reload=args.reload,
         workers=args.workers
-    ) 
\ No newline at end of file
+    )
+    
+    if pool is not None:
+        pool.parar()
@@ -0,0 +1,110 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import torch
+
+from audio_utils import caminho_temporario
+from reference_registry import hash_arquivo
+from structured_log import obter_logger
+
+log = obter_logger("latentes")
+
+
+class SpeakerLatentsStore:
+    """Armazena os latentes de condicionamento do XTTS por falante.
+
+    Para cada falante pré-definido ou arquivo de referência, o latente do GPT
+    e o speaker embedding são calculados uma única vez, mantidos em memória
+    (com descarte LRU) e salvos em disco para sobreviver a reinícios.
+    """
+
+    def __init__(self, model, cache_dir, max_entries=32):
+        self.model = model
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._memoria = OrderedDict()
+        self._lock = threading.Lock()
+
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    def chave_falante(self, speaker):
+        """Chave de cache para um falante pré-definido do modelo"""
+        return hashlib.md5(f"speaker_{speaker}".encode('utf-8')).hexdigest()
+
+    def chave_referencia(self, reference_file):
+        """Chave de cache para um arquivo de referência (hash do conteúdo)"""
+        return hashlib.md5(f"reference_{hash_arquivo(reference_file)}".encode('utf-8')).hexdigest()
+
+    def get(self, speaker=None, reference_file=None):
+        """Retorna (gpt_cond_latent, speaker_embedding) para o falante ou arquivo de referência"""
+        if reference_file:
+            key = self.chave_referencia(reference_file)
+            return self._obter(key, lambda: self._calcular_referencia(reference_file))
+
+        if not speaker:
+            raise ValueError("É necessário informar um falante ou um arquivo de referência")
+
+        key = self.chave_falante(speaker)
+        return self._obter(key, lambda: self._calcular_falante(speaker))
+
+    def _obter(self, key, calcular):
+        with self._lock:
+            if key in self._memoria:
+                self._memoria.move_to_end(key)
+                return self._memoria[key]
+
+        latents = self._carregar_disco(key)
+        if latents is None:
+            latents = calcular()
+            self._salvar_disco(key, latents)
+
+        with self._lock:
+            self._memoria[key] = latents
+            self._memoria.move_to_end(key)
+            while len(self._memoria) > self.max_entries:
+                self._memoria.popitem(last=False)
+
+        return latents
+
+    def _calcular_falante(self, speaker):
+        speakers = self.model.speaker_manager.speakers
+        if speaker not in speakers:
+            raise ValueError(f"Falante não encontrado no modelo: {speaker}")
+        dados = speakers[speaker]
+        return dados["gpt_cond_latent"], dados["speaker_embedding"]
+
+    def _calcular_referencia(self, reference_file):
+        log.info("Calculando latentes do arquivo de referência", reference_file=reference_file)
+        return self.model.get_conditioning_latents(audio_path=[reference_file])
+
+    def _caminho(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pt")
+
+    def _carregar_disco(self, key):
+        path = self._caminho(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            dados = torch.load(path, map_location=self.model.device)
+            return dados["gpt_cond_latent"], dados["speaker_embedding"]
+        except Exception as e:
+            log.warning("Não foi possível carregar latentes do disco", arquivo=path, erro=str(e))
+            return None
+
+    def _salvar_disco(self, key, latents):
+        gpt_cond_latent, speaker_embedding = latents
+        path = self._caminho(key)
+        tmp_path = caminho_temporario(path)
+        torch.save({
+            "gpt_cond_latent": gpt_cond_latent.cpu(),
+            "speaker_embedding": speaker_embedding.cpu()
+        }, tmp_path)
+        os.replace(tmp_path, path)
+
+    def clear(self):
+        """Limpa os latentes em memória (os arquivos em disco são mantidos)"""
+        with self._lock:
+            self._memoria.clear()
@@ -0,0 +1,84 @@
+import contextvars
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+
+# Nível e formato ("json" ou "texto") dos logs, lidos também pelos processos de inferência
+ENV_NIVEL = "TTS_LOG_NIVEL"
+ENV_FORMATO = "TTS_LOG_FORMATO"
+
+# Id da requisição HTTP atual; propagado às threads que atendem o pedido
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+_ATRIBUTOS_LOGGING = ("exc_info", "stack_info", "stacklevel", "extra")
+
+
+def novo_request_id():
+    return uuid.uuid4().hex[:16]
+
+
+class FormatoJSON(logging.Formatter):
+    """Uma linha JSON por evento, com o id da requisição e os campos do evento"""
+
+    def format(self, record):
+        dados = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensagem": record.getMessage(),
+        }
+        request_id = request_id_var.get()
+        if request_id:
+            dados["request_id"] = request_id
+        dados.update(getattr(record, "campos", None) or {})
+        if record.exc_info:
+            dados["erro"] = self.formatException(record.exc_info)
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+class FormatoTexto(logging.Formatter):
+    """Formato legível para desenvolvimento: mensagem seguida dos campos"""
+
+    def format(self, record):
+        linha = f"{self.formatTime(record, '%H:%M:%S')} {record.levelname:<7} {record.getMessage()}"
+        campos = dict(getattr(record, "campos", None) or {})
+        request_id = request_id_var.get()
+        if request_id:
+            campos["request_id"] = request_id
+        if campos:
+            linha += " " + " ".join(f"{chave}={valor}" for chave, valor in campos.items())
+        if record.exc_info:
+            linha += "\n" + self.formatException(record.exc_info)
+        return linha
+
+
+class LoggerCampos(logging.LoggerAdapter):
+    """Logger que aceita os campos do evento como argumentos nomeados
+
+    log.info("Áudio gerado", texto="Senha 4", duracao_s=1.2)
+    """
+
+    def process(self, msg, kwargs):
+        campos = {chave: kwargs.pop(chave) for chave in list(kwargs) if chave not in _ATRIBUTOS_LOGGING}
+        if campos:
+            kwargs.setdefault("extra", {})["campos"] = campos
+        return msg, kwargs
+
+
+def obter_logger(nome):
+    return LoggerCampos(logging.getLogger(f"tts.{nome}"), {})
+
+
+def configurar_logs(nivel=None, formato=None):
+    """Configura os logs da aplicação (logger "tts") na saída padrão"""
+    nivel = nivel or os.environ.get(ENV_NIVEL, "INFO")
+    formato = formato or os.environ.get(ENV_FORMATO, "json")
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(FormatoTexto() if formato == "texto" else FormatoJSON())
+    logger = logging.getLogger("tts")
+    logger.handlers = [handler]
+    logger.setLevel(nivel.upper())
+    logger.propagate = False
@@ -0,0 +1,106 @@
+import re
+import threading
+from collections import OrderedDict
+
+from structured_log import obter_logger
+
+log = obter_logger("antecipacao")
+
+# "Senha 41" -> ("Senha ", "41", ""); "A-007" -> ("A-", "007", "")
+_NUMERO = re.compile(r"^(.*?)(\d+)(\D*)$")
+
+
+def proximas_senhas(senha, quantidade):
+    """As `quantidade` senhas seguintes, mantendo prefixo, sufixo e zeros à esquerda"""
+    encontrado = _NUMERO.match(senha.strip())
+    if not encontrado or quantidade <= 0:
+        return []
+    prefixo, numero, sufixo = encontrado.groups()
+    largura = len(numero) if numero.startswith("0") else 0
+    inicio = int(numero)
+    return [f"{prefixo}{str(inicio + i).zfill(largura)}{sufixo}" for i in range(1, quantidade + 1)]
+
+
+class TicketPrefetcher:
+    """Pré-gera as próximas senhas enquanto o modelo está ocioso.
+
+    A cada senha chamada, as `antecipar` seguintes da mesma sequência (mesmo
+    prefixo, idioma, falante, velocidade e pós-processamento) são agendadas em
+    baixa prioridade na fila de inferências; as que já estão em cache não
+    chegam ao modelo. Elas só ocupam o modelo quando não há pedidos normais
+    aguardando, e um pedido que chega para uma senha ainda na fila promove a
+    pré-geração em vez de duplicá-la.
+    """
+
+    def __init__(self, scheduler, caminho, gerar, antecipar=3, max_pendentes=32, max_recentes=4096):
+        self.scheduler = scheduler
+        self.caminho = caminho  # (senha, language, speaker, speed, pos) -> arquivo da senha
+        self.gerar = gerar  # (senha, arquivo, language, speaker, speed, pos) -> True se gerou o áudio
+        self.antecipar = antecipar
+        self.max_pendentes = max_pendentes
+        self.max_recentes = max_recentes
+
+        self._lock = threading.Lock()
+        self._pendentes = set()
+        # Arquivos já agendados ou encontrados em cache, para não repetir a verificação
+        self._recentes = OrderedDict()
+        self._agendadas = 0
+        self._geradas = 0
+        self._falhas = 0
+
+    def observar(self, senha, language, speaker, speed, pos=None):
+        """Registra a senha chamada e agenda a pré-geração das seguintes"""
+        if self.antecipar <= 0:
+            return
+        for proxima in proximas_senhas(senha, self.antecipar):
+            file_path = self.caminho(proxima, language, speaker, speed, pos)
+            with self._lock:
+                if file_path in self._recentes:
+                    self._recentes.move_to_end(file_path)
+                    continue
+                if len(self._pendentes) >= self.max_pendentes:
+                    return
+                self._lembrar(file_path)
+                self._pendentes.add(file_path)
+                self._agendadas += 1
+
+            future = self.scheduler.submit_baixa_prioridade(
+                file_path, self.gerar, proxima, file_path, language, speaker, speed, pos)
+            future.add_done_callback(lambda f, file_path=file_path: self._concluir(file_path, f))
+
+    def _lembrar(self, file_path):
+        self._recentes[file_path] = True
+        while len(self._recentes) > self.max_recentes:
+            self._recentes.popitem(last=False)
+
+    def _concluir(self, file_path, future):
+        erro = future.exception()
+        with self._lock:
+            self._pendentes.discard(file_path)
+            if erro is None:
+                # False: a senha já estava em cache
+                self._geradas += 1 if future.result() else 0
+            else:
+                self._falhas += 1
+                # Tentar de novo na próxima chamada da sequência
+                self._recentes.pop(file_path, None)
+        if erro is not None:
+            log.warning("Falha ao pré-gerar senha", arquivo=file_path, erro=str(erro))
+
+    def esquecer(self, file_path=None):
+        """Descarta os arquivos lembrados (ex: depois de limpar o cache), ou só `file_path`"""
+        with self._lock:
+            if file_path is None:
+                self._recentes.clear()
+            else:
+                self._recentes.pop(file_path, None)
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "antecipar": self.antecipar,
+                "pendentes": len(self._pendentes),
+                "agendadas": self._agendadas,
+                "geradas": self._geradas,
+                "falhas": self._falhas
+            }
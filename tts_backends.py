@@ -0,0 +1,274 @@
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+import torch
+
+from audio_utils import caminho_temporario, reamostrar, salvar_wav
+from speaker_latents import SpeakerLatentsStore
+from structured_log import obter_logger
+
+log = obter_logger("motor")
+
+
+class SynthesisBackend:
+    """Interface dos motores de síntese usados pela API.
+
+    Um motor carrega seu modelo em `carregar()` e depois sintetiza texto em
+    amostras float32 mono na taxa `sample_rate`, inteiro (`sintetizar`) ou
+    em trechos à medida que são gerados (`stream`).
+    """
+
+    nome = "base"
+    sample_rate = 24000
+    aceleracao = None  # Resumo do modo acelerado de CPU, quando aplicado
+    memoria_bytes = None  # Memória ocupada pelos pesos do modelo, quando conhecida
+
+    def carregar(self):
+        """Carrega o modelo (chamado uma vez, em segundo plano)"""
+
+    def falantes(self):
+        """Nomes dos falantes pré-definidos do modelo"""
+        return []
+
+    def latentes(self, speaker=None, reference_file=None):
+        """Prepara (e retorna) o condicionamento do falante ou arquivo de referência, se o motor usar"""
+        return None
+
+    def sintetizar(self, texto, language, speed, speaker=None, reference_file=None):
+        """Sintetiza o texto inteiro; retorna as amostras float32"""
+        raise NotImplementedError
+
+    def stream(self, texto, language, speed, speaker=None, reference_file=None):
+        """Gera as amostras em trechos; por padrão, um único trecho com o áudio inteiro"""
+        yield self.sintetizar(texto, language, speed, speaker=speaker, reference_file=reference_file)
+
+    def salvar(self, wav, file_path, sample_rate=None):
+        """Grava o áudio sintetizado em WAV (escrita atômica)
+
+        `sample_rate` é informada quando o áudio foi pós-processado (pode
+        diferir da taxa do motor); omitida, usa a do motor.
+        """
+        salvar_wav(file_path, np.asarray(wav, dtype=np.float32), sample_rate or self.sample_rate)
+
+
+def _bytes_tensores(valores):
+    # Camadas quantizadas guardam os pesos empacotados em tuplas de tensores
+    total = 0
+    for valor in valores:
+        if isinstance(valor, torch.Tensor):
+            total += valor.numel() * valor.element_size()
+        elif isinstance(valor, (tuple, list)):
+            total += _bytes_tensores(valor)
+    return total
+
+
+class XttsBackend(SynthesisBackend):
+    """XTTS v2 do Coqui TTS, com os latentes dos falantes em cache"""
+
+    nome = "xtts"
+
+    def __init__(self, model_name, device, latents_dir, latents_max=32, acelerar=False, compilar=False):
+        self.model_name = model_name
+        self.device = device
+        self.latents_dir = latents_dir
+        self.latents_max = latents_max
+        self.acelerar = acelerar
+        self.compilar = compilar
+        self.tts = None
+        self.model = None
+        self.speaker_latents = None
+
+    def carregar(self):
+        from TTS.api import TTS as TTSObject
+        from torch.serialization import add_safe_globals
+        from TTS.tts.configs.xtts_config import XttsConfig
+        from TTS.tts.models.xtts import XttsAudioConfig, XttsArgs
+        from TTS.config.shared_configs import BaseDatasetConfig
+
+        # Adicionar todas as classes conhecidas aos globais seguros
+        add_safe_globals([
+            XttsConfig,
+            XttsAudioConfig,
+            BaseDatasetConfig,
+            XttsArgs
+        ])
+
+        self.tts = TTSObject(self.model_name).to(self.device)
+        self.model = self.tts.synthesizer.tts_model
+        self.sample_rate = self.tts.synthesizer.output_sample_rate
+
+        if self.acelerar:
+            if self.device == "cpu":
+                from cpu_accel import acelerar_modelo
+                self.aceleracao = acelerar_modelo(self.model, compilar=self.compilar)
+            else:
+                log.warning("TTS_CPU_ACELERADO ignorado: o modelo está na GPU")
+
+        self.memoria_bytes = _bytes_tensores(self.model.state_dict().values())
+
+        # Latentes de condicionamento calculados uma vez por falante/arquivo de referência
+        self.speaker_latents = SpeakerLatentsStore(self.model, self.latents_dir, self.latents_max)
+
+    def falantes(self):
+        try:
+            return list(self.model.speaker_manager.speakers.keys())
+        except Exception as e:
+            log.warning("Não foi possível obter a lista de falantes", erro=str(e))
+            return []
+
+    def latentes(self, speaker=None, reference_file=None):
+        return self.speaker_latents.get(speaker=speaker, reference_file=reference_file)
+
+    def _parametros(self):
+        # Mesmos parâmetros de amostragem usados por tts_to_file (definidos na config do XTTS)
+        return {
+            "temperature": self.model.config.temperature,
+            "length_penalty": self.model.config.length_penalty,
+            "repetition_penalty": self.model.config.repetition_penalty,
+            "top_k": self.model.config.top_k,
+            "top_p": self.model.config.top_p,
+        }
+
+    def sintetizar(self, texto, language, speed, speaker=None, reference_file=None):
+        gpt_cond_latent, speaker_embedding = self.latentes(speaker=speaker, reference_file=reference_file)
+        with torch.inference_mode():
+            out = self.model.inference(
+                text=texto,
+                language=language,
+                gpt_cond_latent=gpt_cond_latent,
+                speaker_embedding=speaker_embedding,
+                speed=speed,
+                enable_text_splitting=True,
+                **self._parametros()
+            )
+        return np.asarray(out["wav"], dtype=np.float32)
+
+    def stream(self, texto, language, speed, speaker=None, reference_file=None):
+        gpt_cond_latent, speaker_embedding = self.latentes(speaker=speaker, reference_file=reference_file)
+        with torch.inference_mode():
+            chunks = self.model.inference_stream(
+                texto,
+                language,
+                gpt_cond_latent,
+                speaker_embedding,
+                speed=speed,
+                **self._parametros()
+            )
+            for chunk in chunks:
+                yield chunk.cpu().numpy().astype(np.float32)
+
+    def salvar(self, wav, file_path, sample_rate=None):
+        if sample_rate is not None:
+            # Áudio já pós-processado: nível e taxa finais, que o save_wav do Coqui alteraria
+            salvar_wav(file_path, np.asarray(wav, dtype=np.float32), sample_rate)
+            return
+        # save_wav do Coqui normaliza o pico, como em tts_to_file
+        tmp_path = caminho_temporario(file_path)
+        self.tts.synthesizer.save_wav(wav, tmp_path)
+        os.replace(tmp_path, file_path)
+
+
+class StubBackend(SynthesisBackend):
+    """Motor determinístico e sem modelo, para testes e benchmarks (TTS_ENGINE=stub)
+
+    Gera um tom com duração proporcional ao texto (a frequência depende do
+    texto) e espera o tempo que um modelo real levaria pelo fator de tempo
+    real `rtf`.
+    """
+
+    nome = "stub"
+    caracteres_por_segundo = 14.0
+
+    def __init__(self, rtf=0.05, sample_rate=24000):
+        self.rtf = rtf
+        self.sample_rate = sample_rate
+
+    def falantes(self):
+        return ["Alma María", "Nova Hogarth", "Alison Dietlinde", "Ana Florence", "Claribel Dervla"]
+
+    def _gerar(self, texto, speed):
+        duracao = max(0.3, len(texto) / self.caracteres_por_segundo / max(speed, 0.1))
+        t = np.arange(int(duracao * self.sample_rate)) / self.sample_rate
+        frequencia = 180 + int(hashlib.md5(texto.encode("utf-8")).hexdigest()[:4], 16) % 200
+        envelope = np.minimum(1.0, np.minimum(t, t[-1] - t) / 0.02)
+        return (0.3 * envelope * np.sin(2 * np.pi * frequencia * t)).astype(np.float32)
+
+    def sintetizar(self, texto, language, speed, speaker=None, reference_file=None):
+        wav = self._gerar(texto, speed)
+        time.sleep(self.rtf * len(wav) / self.sample_rate)
+        return wav
+
+    def stream(self, texto, language, speed, speaker=None, reference_file=None):
+        wav = self._gerar(texto, speed)
+        tamanho = self.sample_rate // 5
+        for i in range(0, len(wav), tamanho):
+            trecho = wav[i:i + tamanho]
+            time.sleep(self.rtf * len(trecho) / self.sample_rate)
+            yield trecho
+
+
+class PiperBackend(SynthesisBackend):
+    """Modelo leve Piper (VITS em ONNX), usado como reserva quando a fila do XTTS está cheia
+
+    Requer o pacote opcional `piper-tts` e uma voz .onnx por idioma. Não
+    suporta falantes do XTTS nem arquivos de referência: cada idioma usa sua voz.
+    """
+
+    nome = "piper"
+
+    def __init__(self, vozes, sample_rate=24000):
+        self.caminhos_vozes = vozes  # {idioma: caminho do .onnx}
+        self.sample_rate = sample_rate
+        self._vozes = {}
+        self._lock = threading.Lock()
+
+    def carregar(self):
+        try:
+            from piper.voice import PiperVoice
+        except ImportError:
+            raise RuntimeError("O motor piper requer o pacote piper-tts (pip install piper-tts)")
+        if not self.caminhos_vozes:
+            raise RuntimeError("Nenhuma voz configurada para o motor piper (TTS_PIPER_VOZES)")
+        for language, caminho in self.caminhos_vozes.items():
+            self._vozes[language] = PiperVoice.load(caminho)
+
+    def sintetizar(self, texto, language, speed, speaker=None, reference_file=None):
+        voz = self._vozes.get(language)
+        if voz is None:
+            raise ValueError(f"Sem voz piper para o idioma: {language}")
+        # Cada voz ONNX atende um pedido por vez
+        with self._lock:
+            pcm = b"".join(voz.synthesize_stream_raw(texto, length_scale=1.0 / speed))
+        wav = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        return reamostrar(wav, voz.config.sample_rate, self.sample_rate)
+
+
+def ler_vozes_piper(valor):
+    """Interpreta TTS_PIPER_VOZES ("pt=/vozes/pt.onnx,en=/vozes/en.onnx")"""
+    vozes = {}
+    for item in (valor or "").split(","):
+        language, _, caminho = item.partition("=")
+        if language.strip() and caminho.strip():
+            vozes[language.strip()] = caminho.strip()
+    return vozes
+
+
+def criar_backend(engine, **opcoes):
+    """Cria o motor de síntese pelo nome ("xtts", "stub" ou "piper")"""
+    if engine == "xtts":
+        return XttsBackend(
+            opcoes["model_name"],
+            opcoes["device"],
+            opcoes["latents_dir"],
+            opcoes.get("latents_max", 32),
+            acelerar=opcoes.get("acelerar", False),
+            compilar=opcoes.get("compilar", False)
+        )
+    if engine == "stub":
+        return StubBackend(rtf=opcoes.get("stub_rtf", 0.05))
+    if engine == "piper":
+        return PiperBackend(opcoes.get("piper_vozes", {}))
+    raise ValueError(f"Motor de síntese desconhecido: {engine}")